@@ -0,0 +1,42 @@
+"""product search_text column and search indexes
+
+Revision ID: a1c3e5f70b21
+Revises: 4dcc51a5d9f6
+Create Date: 2026-10-16 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f70b21'
+down_revision = '4dcc51a5d9f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('search_text', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS ix_products_search_text_trgm '
+            'ON products USING gin (search_text gin_trgm_ops)'
+        )
+    # search_text se rellena al arrancar (backend.core.product_search.init_product_search),
+    # que también crea la tabla FTS5 en SQLite
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search_text_trgm')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ai')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_au')
+        op.execute('DROP TABLE IF EXISTS products_fts')
+    op.drop_column('products', 'search_text')
@@ -0,0 +1,24 @@
+"""index products by tenant and barcode
+
+Revision ID: b7d24e9c1f03
+Revises: a1c3e5f70b21
+Create Date: 2026-10-16 10:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d24e9c1f03'
+down_revision = 'a1c3e5f70b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_products_tenant_barcode', 'products', ['tenant_id', 'barcode'])
+
+
+def downgrade():
+    op.drop_index('ix_products_tenant_barcode', table_name='products')
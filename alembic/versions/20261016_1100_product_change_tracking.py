@@ -0,0 +1,57 @@
+"""product change tracking for incremental catalog sync
+
+Revision ID: c4e8a2d61b57
+Revises: b7d24e9c1f03
+Create Date: 2026-10-16 11:00:00.000000+00:00
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2d61b57'
+down_revision = 'b7d24e9c1f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('inventory', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Las filas existentes cuentan como modificadas ahora (la primera sincronización las trae todas)
+    now = datetime.utcnow()
+    for table_name in ('products', 'inventory'):
+        table = sa.table(table_name, sa.column('updated_at', sa.DateTime()))
+        op.execute(table.update().values(updated_at=now))
+
+    op.create_index('ix_products_tenant_updated', 'products', ['tenant_id', 'updated_at', 'id'])
+    op.create_index('ix_inventory_tenant_updated', 'inventory', ['tenant_id', 'updated_at', 'product_id'])
+
+    op.create_table(
+        'product_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('barcode', sa.String(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_product_tombstones_id', 'product_tombstones', ['id'])
+    op.create_index(
+        'ix_product_tombstones_tenant_deleted', 'product_tombstones', ['tenant_id', 'deleted_at', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_tombstones_tenant_deleted', table_name='product_tombstones')
+    op.drop_index('ix_product_tombstones_id', table_name='product_tombstones')
+    op.drop_table('product_tombstones')
+    op.drop_index('ix_inventory_tenant_updated', table_name='inventory')
+    op.drop_index('ix_products_tenant_updated', table_name='products')
+    op.drop_column('inventory', 'updated_at')
+    op.drop_column('products', 'updated_at')
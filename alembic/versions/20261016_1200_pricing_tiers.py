@@ -0,0 +1,38 @@
+"""per-tenant pricing tier tables
+
+Revision ID: d2f9b7c3e815
+Revises: c4e8a2d61b57
+Create Date: 2026-10-16 12:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f9b7c3e815'
+down_revision = 'c4e8a2d61b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'pricing_tiers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('max_purchase_price', sa.Float(), nullable=True),
+        sa.Column('multiplier', sa.Float(), nullable=False),
+        sa.Column('round_to', sa.Float(), nullable=True),
+        sa.Column('round_mode', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_pricing_tiers_id', 'pricing_tiers', ['id'])
+    op.create_index('ix_pricing_tiers_tenant_id', 'pricing_tiers', ['tenant_id'])
+
+
+def downgrade():
+    op.drop_index('ix_pricing_tiers_tenant_id', table_name='pricing_tiers')
+    op.drop_index('ix_pricing_tiers_id', table_name='pricing_tiers')
+    op.drop_table('pricing_tiers')
@@ -0,0 +1,26 @@
+"""index product tags by tag for tag-filtered listings
+
+Revision ID: e5a1c8f4d923
+Revises: d2f9b7c3e815
+Create Date: 2026-10-16 13:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c8f4d923'
+down_revision = 'd2f9b7c3e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_product_tag_association_tag_product', 'product_tag_association', ['tag_id', 'product_id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_tag_association_tag_product', table_name='product_tag_association')
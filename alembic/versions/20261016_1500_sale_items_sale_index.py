@@ -0,0 +1,24 @@
+"""index sale items by sale for summary counts and selectin loads
+
+Revision ID: a8c4e1f6b392
+Revises: f3b6d2a9c174
+Create Date: 2026-10-16 15:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c4e1f6b392'
+down_revision = 'f3b6d2a9c174'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_sale_items_sale_id', 'sale_items', ['sale_id'])
+
+
+def downgrade():
+    op.drop_index('ix_sale_items_sale_id', table_name='sale_items')
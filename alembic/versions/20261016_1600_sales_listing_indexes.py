@@ -0,0 +1,30 @@
+"""composite indexes for filtered sales listings
+
+Revision ID: b2d7f4a1c865
+Revises: a8c4e1f6b392
+Create Date: 2026-10-16 16:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d7f4a1c865'
+down_revision = 'a8c4e1f6b392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_sales_tenant_date', 'sales', ['tenant_id', 'sale_date', 'id'])
+    op.create_index('ix_sales_tenant_payment_date', 'sales', ['tenant_id', 'payment_status', 'sale_date'])
+    op.create_index('ix_sales_tenant_shipping_date', 'sales', ['tenant_id', 'shipping_status', 'sale_date'])
+    op.create_index('ix_sales_tenant_client_date', 'sales', ['tenant_id', 'client_id', 'sale_date'])
+
+
+def downgrade():
+    op.drop_index('ix_sales_tenant_client_date', table_name='sales')
+    op.drop_index('ix_sales_tenant_shipping_date', table_name='sales')
+    op.drop_index('ix_sales_tenant_payment_date', table_name='sales')
+    op.drop_index('ix_sales_tenant_date', table_name='sales')
@@ -0,0 +1,58 @@
+"""stock ledger and on-hand snapshots
+
+Revision ID: c9e3a7d5f418
+Revises: b2d7f4a1c865
+Create Date: 2026-10-16 17:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e3a7d5f418'
+down_revision = 'b2d7f4a1c865'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stock_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity_change', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('reference_id', sa.String(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_ledger_id', 'stock_ledger', ['id'])
+    op.create_index('ix_stock_ledger_product_created', 'stock_ledger', ['product_id', 'created_at', 'id'])
+    op.create_index('ix_stock_ledger_tenant_created', 'stock_ledger', ['tenant_id', 'created_at', 'id'])
+
+    op.create_table(
+        'stock_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_snapshots_id', 'stock_snapshots', ['id'])
+    op.create_index('ix_stock_snapshots_product_taken', 'stock_snapshots', ['product_id', 'taken_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_snapshots_product_taken', table_name='stock_snapshots')
+    op.drop_index('ix_stock_snapshots_id', table_name='stock_snapshots')
+    op.drop_table('stock_snapshots')
+    op.drop_index('ix_stock_ledger_tenant_created', table_name='stock_ledger')
+    op.drop_index('ix_stock_ledger_product_created', table_name='stock_ledger')
+    op.drop_index('ix_stock_ledger_id', table_name='stock_ledger')
+    op.drop_table('stock_ledger')
@@ -0,0 +1,44 @@
+"""partial expiry indexes on product batches
+
+Revision ID: d4f8b2e6a937
+Revises: c9e3a7d5f418
+Create Date: 2026-10-16 18:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8b2e6a937'
+down_revision = 'c9e3a7d5f418'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los lotes creados por la API no guardaban tenant: se toma del producto
+    op.execute(
+        'UPDATE product_batches SET tenant_id = '
+        '(SELECT products.tenant_id FROM products WHERE products.id = product_batches.product_id) '
+        'WHERE tenant_id IS NULL'
+    )
+    op.create_index(
+        'ix_product_batches_tenant_expiry_active',
+        'product_batches',
+        ['tenant_id', 'expiration_date', 'id'],
+        postgresql_where=sa.text('quantity_remaining > 0'),
+        sqlite_where=sa.text('quantity_remaining > 0'),
+    )
+    op.create_index(
+        'ix_product_batches_product_expiry_active',
+        'product_batches',
+        ['product_id', 'expiration_date', 'id'],
+        postgresql_where=sa.text('quantity_remaining > 0'),
+        sqlite_where=sa.text('quantity_remaining > 0'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_batches_product_expiry_active', table_name='product_batches')
+    op.drop_index('ix_product_batches_tenant_expiry_active', table_name='product_batches')
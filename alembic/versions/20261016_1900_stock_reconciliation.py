@@ -0,0 +1,55 @@
+"""dirty product set and stock discrepancies for inventory reconciliation
+
+Revision ID: e7a1c5d9b240
+Revises: d4f8b2e6a937
+Create Date: 2026-10-16 19:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a1c5d9b240'
+down_revision = 'd4f8b2e6a937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stock_dirty_products',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('marked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_dirty_products_id', 'stock_dirty_products', ['id'])
+    op.create_index('ix_stock_dirty_products_tenant_product', 'stock_dirty_products', ['tenant_id', 'product_id'])
+
+    op.create_table(
+        'stock_discrepancies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('inventory_quantity', sa.Integer(), nullable=False),
+        sa.Column('batch_quantity', sa.Integer(), nullable=False),
+        sa.Column('difference', sa.Integer(), nullable=False),
+        sa.Column('corrected', sa.Boolean(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_stock_discrepancies_id', 'stock_discrepancies', ['id'])
+    op.create_index('ix_stock_discrepancies_tenant_detected', 'stock_discrepancies', ['tenant_id', 'detected_at'])
+
+
+def downgrade():
+    op.drop_index('ix_stock_discrepancies_tenant_detected', table_name='stock_discrepancies')
+    op.drop_index('ix_stock_discrepancies_id', table_name='stock_discrepancies')
+    op.drop_table('stock_discrepancies')
+    op.drop_index('ix_stock_dirty_products_tenant_product', table_name='stock_dirty_products')
+    op.drop_index('ix_stock_dirty_products_id', table_name='stock_dirty_products')
+    op.drop_table('stock_dirty_products')
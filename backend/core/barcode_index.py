@@ -0,0 +1,139 @@
+"""
+Índice en memoria para búsqueda parcial de códigos de barras.
+
+``barcode ILIKE '%xyz%'`` no puede usar un índice B-tree, así que por cada
+tenant se mantiene (por worker) una estructura construida una sola vez:
+
+* arreglo ordenado de códigos: los prefijos se resuelven con búsqueda binaria;
+* arreglo ordenado de códigos invertidos: los sufijos también;
+* un bloque de texto con todos los códigos para coincidencias intermedias,
+  recorrido con ``str.find`` (en C) y mapeado al registro con búsqueda binaria.
+
+El índice se invalida al cambiar el catálogo y se reconstruye en la siguiente
+consulta; además expira tras ``BARCODE_CACHE_TTL_SECONDS`` para acotar lo
+desactualizado que puede estar en otros workers.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+
+from backend.core import models
+from backend.core.config import settings
+
+# Orden de relevancia de las coincidencias
+MATCH_RANKS = {"exact": 0, "prefix": 1, "suffix": 2, "contains": 3}
+
+_SEPARATOR = "\n"
+_MAX_CHAR = "\U0010ffff"
+
+
+class BarcodeMatch(NamedTuple):
+    product_id: int
+    barcode: str
+    name: str
+    match: str
+
+
+class BarcodeIndex:
+    """Índice inmutable de los códigos de barras de un tenant"""
+
+    def __init__(self, entries: list[tuple[str, int, str]]):
+        # entries: (barcode, product_id, name)
+        self._entries = sorted(entries)
+        self._barcodes = [barcode for barcode, _, _ in self._entries]
+
+        reversed_entries = sorted((barcode[::-1], i) for i, barcode in enumerate(self._barcodes))
+        self._reversed = [barcode for barcode, _ in reversed_entries]
+        self._reversed_pos = [i for _, i in reversed_entries]
+
+        # Bloque "\ncod1\ncod2\n..." y posición inicial de cada código dentro de él
+        self._starts = []
+        offset = 1
+        for barcode in self._barcodes:
+            self._starts.append(offset)
+            offset += len(barcode) + 1
+        self._blob = _SEPARATOR + _SEPARATOR.join(self._barcodes) + _SEPARATOR
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _range(keys: list[str], fragment: str) -> range:
+        return range(bisect_left(keys, fragment), bisect_right(keys, fragment + _MAX_CHAR))
+
+    def search(self, fragment: str, limit: int = 10) -> list[BarcodeMatch]:
+        """Candidatos ordenados: exacto, prefijo, sufijo y contiene"""
+        if not fragment or _SEPARATOR in fragment:
+            return []
+
+        found: dict[int, str] = {}
+
+        def collect(positions, match: str) -> bool:
+            for pos in positions:
+                if len(found) >= limit:
+                    return True
+                found.setdefault(pos, match)
+            return len(found) >= limit
+
+        prefix_range = self._range(self._barcodes, fragment)
+        exact = [pos for pos in prefix_range if self._barcodes[pos] == fragment]
+        done = collect(exact, "exact") or collect(prefix_range, "prefix")
+
+        if not done:
+            suffix_range = self._range(self._reversed, fragment[::-1])
+            done = collect((self._reversed_pos[i] for i in suffix_range), "suffix")
+
+        if not done:
+            done = collect(self._find_contains(fragment), "contains")
+
+        results = []
+        for pos, match in found.items():
+            barcode, product_id, name = self._entries[pos]
+            results.append(BarcodeMatch(product_id, barcode, name, match))
+        results.sort(key=lambda result: MATCH_RANKS[result.match])
+        return results
+
+    def _find_contains(self, fragment: str):
+        start = self._blob.find(fragment)
+        while start != -1:
+            pos = bisect_right(self._starts, start) - 1
+            yield pos
+            # Saltar al siguiente código para no repetir el mismo registro
+            start = self._blob.find(fragment, self._starts[pos] + len(self._barcodes[pos]) + 1)
+
+
+_indexes: dict[int | None, tuple[BarcodeIndex, float]] = {}
+_lock = threading.Lock()
+
+
+def build_barcode_index(db: Session, tenant_id: int | None) -> BarcodeIndex:
+    """Construye el índice con una sola consulta de (barcode, id, name) del tenant"""
+    query = db.query(models.Product.barcode, models.Product.id, models.Product.name).filter(
+        models.Product.barcode.isnot(None), models.Product.barcode != ""
+    )
+    if tenant_id:
+        query = query.filter(models.Product.tenant_id == tenant_id)
+    return BarcodeIndex([(barcode.strip(), product_id, name or "") for barcode, product_id, name in query.all()])
+
+
+def get_barcode_index(db: Session, tenant_id: int | None) -> BarcodeIndex:
+    """Índice del tenant; se construye de forma perezosa si no existe o expiró"""
+    with _lock:
+        cached = _indexes.get(tenant_id)
+    if cached and time.monotonic() - cached[1] < settings.BARCODE_CACHE_TTL_SECONDS:
+        return cached[0]
+
+    index = build_barcode_index(db, tenant_id)
+    with _lock:
+        _indexes[tenant_id] = (index, time.monotonic())
+    return index
+
+
+def invalidate_barcode_index(tenant_id: int | None) -> None:
+    """Descarta el índice del tenant tras altas, bajas o cambios de código de barras"""
+    with _lock:
+        _indexes.pop(tenant_id, None)
@@ -0,0 +1,92 @@
+"""
+Cachés en memoria por proceso (por worker de Gunicorn/Uvicorn).
+
+Cada tenant tiene su propio espacio LRU acotado, de modo que un tenant con un
+catálogo grande no desaloja las entradas de los demás. Los valores pueden tener
+un TTL opcional que acota cuánto tiempo puede estar desactualizada una entrada
+en workers que no recibieron la invalidación.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+_MISSING = object()
+
+
+class TenantLRUCache:
+    """Caché LRU por tenant, thread-safe, con TTL opcional y contadores de aciertos/fallos"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._tenants: dict[int | None, OrderedDict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, tenant_id: int | None, key: Hashable, default: Any = None) -> Any:
+        """Obtiene un valor y lo marca como usado recientemente"""
+        with self._lock:
+            entries = self._tenants.get(tenant_id)
+            item = entries.get(key, _MISSING) if entries is not None else _MISSING
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, tenant_id: int | None, key: Hashable, value: Any) -> None:
+        """Guarda un valor, desalojando el menos usado del tenant si se excede ``maxsize``"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            entries = self._tenants.setdefault(tenant_id, OrderedDict())
+            entries[key] = (value, expires_at)
+            entries.move_to_end(key)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, tenant_id: int | None, key: Hashable) -> None:
+        """Elimina una entrada si existe"""
+        with self._lock:
+            entries = self._tenants.get(tenant_id)
+            if entries is not None:
+                entries.pop(key, None)
+
+    def clear_tenant(self, tenant_id: int | None) -> None:
+        """Elimina todas las entradas de un tenant"""
+        with self._lock:
+            self._tenants.pop(tenant_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tenants.clear()
+
+    def size(self, tenant_id: int | None = None) -> int:
+        with self._lock:
+            if tenant_id is not None:
+                return len(self._tenants.get(tenant_id, ()))
+            return sum(len(entries) for entries in self._tenants.values())
+
+    def stats(self, tenant_id: int | None = None) -> dict:
+        """Contadores de uso del caché (globales del worker) y tamaño actual"""
+        lookups = self.hits + self.misses
+        return {
+            "cache": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": self.size(tenant_id),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+        }
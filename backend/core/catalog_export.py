@@ -0,0 +1,133 @@
+"""
+Exportación del catálogo en streaming.
+
+Las filas se leen con un cursor del lado del servidor (``stream_results``) y sólo
+con las columnas necesarias, en bloques de ``EXPORT_CHUNK_SIZE``; nunca se tiene
+el catálogo completo en memoria.
+
+* CSV y NDJSON se escriben bloque a bloque directamente en la respuesta.
+* XLSX usa el modo ``write_only`` de openpyxl sobre un archivo temporal (un XLSX
+  es un ZIP y no puede enviarse antes de cerrarlo); después se envía en trozos.
+
+La respuesta se sigue transmitiendo después de que el endpoint retorna, así que
+``stream_catalog`` abre y cierra su propia sesión en vez de usar la de la petición.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from collections.abc import Callable, Iterator
+
+from openpyxl import Workbook
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.core import models
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Tamaño de los trozos enviados al cliente al transmitir el XLSX
+XLSX_STREAM_CHUNK_BYTES = 64 * 1024
+
+# A partir de este tamaño el XLSX temporal pasa de memoria a disco
+XLSX_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+EXPORT_HEADERS = ("CODIGO DE BARRAS", "NOMBRE", "INGREDIENTE ACTIVO", "LABORATORIO", "PRECIO", "IVA")
+
+EXPORT_SHEET_NAME = "Catálogo de Medicamentos"
+
+EXPORT_MEDIA_TYPES = {
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_EXTENSIONS = {"excel": "xlsx", "csv": "csv", "ndjson": "ndjson"}
+
+
+def _catalog_row(barcode, name, active_substance, laboratory, sale_price, iva_rate) -> tuple:
+    return (
+        barcode or "",
+        name,
+        active_substance or "",
+        laboratory or "",
+        round(sale_price, 2) if sale_price else 0,
+        "16%" if iva_rate and iva_rate > 0 else "Exento",
+    )
+
+
+def iter_catalog_chunks(db: Session, tenant_id: int = None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[list]:
+    """Bloques de filas del catálogo (ya formateadas) leídos con un cursor del servidor"""
+    product = models.Product
+    query = (
+        select(
+            product.barcode,
+            product.name,
+            product.active_substance,
+            product.laboratory,
+            product.sale_price,
+            product.iva_rate,
+        )
+        .where(product.tenant_id == tenant_id)
+        .order_by(product.id)
+    )
+    result = db.execute(query, execution_options={"stream_results": True})
+    try:
+        for partition in result.partitions(chunk_size):
+            yield [_catalog_row(*row) for row in partition]
+    finally:
+        result.close()
+
+
+def stream_catalog_csv(db: Session, tenant_id: int = None) -> Iterator[bytes]:
+    # BOM para que Excel reconozca UTF-8 al abrir el CSV
+    yield "\ufeff".encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    for chunk in iter_catalog_chunks(db, tenant_id):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def stream_catalog_ndjson(db: Session, tenant_id: int = None) -> Iterator[bytes]:
+    for chunk in iter_catalog_chunks(db, tenant_id):
+        lines = (json.dumps(dict(zip(EXPORT_HEADERS, row, strict=True)), ensure_ascii=False) for row in chunk)
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def stream_catalog_xlsx(db: Session, tenant_id: int = None) -> Iterator[bytes]:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(EXPORT_SHEET_NAME)
+    sheet.append(EXPORT_HEADERS)
+    for chunk in iter_catalog_chunks(db, tenant_id):
+        for row in chunk:
+            sheet.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_BYTES) as output:
+        workbook.save(output)
+        output.seek(0)
+        while data := output.read(XLSX_STREAM_CHUNK_BYTES):
+            yield data
+
+
+CATALOG_EXPORTERS = {
+    "excel": stream_catalog_xlsx,
+    "csv": stream_catalog_csv,
+    "ndjson": stream_catalog_ndjson,
+}
+
+
+def stream_catalog(
+    export_format: str, tenant_id: int | None, session_factory: Callable[[], Session]
+) -> Iterator[bytes]:
+    """Transmite el catálogo con una sesión propia que se cierra al terminar (o al cortarse) la respuesta"""
+    db = session_factory()
+    try:
+        yield from CATALOG_EXPORTERS[export_format](db, tenant_id)
+    finally:
+        db.close()
@@ -11,6 +11,27 @@ class Settings(BaseSettings):
     # DATABASE
     DATABASE_URL: str = "sqlite:///./vanpos.db"
 
+    # SEARCH
+    # "auto" elige según el motor: pg_trgm en PostgreSQL, FTS5 en SQLite, LIKE en otros
+    PRODUCT_SEARCH_BACKEND: str = "auto"
+
+    # CACHE (en memoria, por worker)
+    BARCODE_CACHE_SIZE: int = 5000  # entradas por tenant
+    BARCODE_CACHE_TTL_SECONDS: int = 300
+    PRICING_CACHE_TTL_SECONDS: int = 300  # tabla de márgenes compilada por tenant
+
+    # IMPORT JOBS (importaciones de Excel en segundo plano, estado en la tabla import_jobs)
+    IMPORT_JOB_WORKERS: int = 2  # hilos por proceso
+    IMPORT_JOB_TTL_SECONDS: int = 7 * 24 * 3600  # tiempo que se conservan los resultados
+    IMPORT_JOB_STALE_SECONDS: int = 6 * 3600  # un job sin terminar tras este tiempo se da por interrumpido
+
+    # SYNC (sincronización incremental del catálogo en las terminales)
+    PRODUCT_TOMBSTONE_RETENTION_DAYS: int = 30  # una terminal sin sincronizar más tiempo recarga todo
+    PRODUCT_SYNC_OVERLAP_SECONDS: int = 60  # ventana que se vuelve a enviar en cada sincronización
+
+    # IDEMPOTENCY (reintentos de ventas, gastos y facturas con Idempotency-Key)
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+
     # SECURITY (these map to your existing .env variables)
     SECRET_KEY: str = "YOUR_SUPER_SECRET_KEY_CHANGE_ME_IN_PROD"
     JWT_SECRET_KEY: str = ""  # From your existing .env
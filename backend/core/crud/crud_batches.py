@@ -1,16 +1,34 @@
-from datetime import date, timedelta
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import case, desc, func, insert, select, update
+from sqlalchemy.orm import Session, joinedload
 
+from backend.core.cache import TenantLRUCache
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, chunked
+from backend.core.crud.crud_stock_ledger import mark_products_dirty
 from backend.core.logging_config import log_user_action
-from backend.core.models import BatchStockMovement, ProductBatch
+from backend.core.models import BatchStockMovement, Product, ProductBatch, Supplier
+from backend.core.pagination import paginate_by_cursor
 from backend.core.schemas import (
     BatchStockMovementCreate,
     ProductBatchCreate,
     ProductBatchUpdate,
 )
 
+# Resumen y valuación de lotes por tenant; se descartan con cada movimiento de lote y
+# el TTL acota lo desactualizado en otros workers
+BATCH_SUMMARY_CACHE_TTL_SECONDS = 300
+_batch_summary_cache = TenantLRUCache("batch_summary", maxsize=8, ttl=BATCH_SUMMARY_CACHE_TTL_SECONDS)
+
+# Límites (días) de los rangos de caducidad de la valuación
+EXPIRY_BUCKET_DAYS = (7, 30, 90)
+
+# Motivos de los movimientos de lote de una venta: salida al venderla, entradas al editarla o cancelarla
+SALE_MOVEMENT_REASONS = ("sale", "sale_update", "sale_delete")
+
 
 def get_product_batches(db: Session, product_id: int | None = None) -> list[ProductBatch]:
     """Obtener lotes de medicamentos, opcionalmente filtrados por medicamento"""
@@ -25,27 +43,33 @@ def get_product_batch(db: Session, batch_id: int) -> ProductBatch | None:
     return db.query(ProductBatch).filter(ProductBatch.id == batch_id).first()
 
 
-def create_product_batch(db: Session, batch: ProductBatchCreate, user_id: int) -> ProductBatch:
+def create_product_batch(db: Session, batch: ProductBatchCreate, user_id: int, tenant_id: int = None) -> ProductBatch:
     """Crear un nuevo lote de medicamento"""
-    db_batch = ProductBatch(**batch.model_dump())
+    db_batch = ProductBatch(**batch.model_dump(), tenant_id=tenant_id)
     db.add(db_batch)
-    db.commit()
-    db.refresh(db_batch)
 
-    # Registrar movimiento inicial de entrada
+    # Registrar movimiento inicial de entrada; la existencia ya viene en el lote
     if batch.quantity_received > 0:
-        create_batch_movement(
-            db,
-            BatchStockMovementCreate(
+        db.flush()
+        db.add(
+            BatchStockMovement(
+                tenant_id=tenant_id,
                 batch_id=db_batch.id,
                 movement_type="in",
                 quantity=batch.quantity_received,
                 previous_quantity=0,
-                new_quantity=batch.quantity_received,
+                new_quantity=db_batch.quantity_remaining,
                 reason="batch_creation",
+                movement_date=datetime.now(),
                 user_id=user_id,
-            ),
+            )
         )
+    if db_batch.quantity_remaining:
+        mark_products_dirty(db, [db_batch.product_id], tenant_id)
+
+    db.commit()
+    invalidate_batch_summary(tenant_id)
+    db.refresh(db_batch)
 
     # Log de auditoría
     log_user_action(
@@ -54,7 +78,7 @@ def create_product_batch(db: Session, batch: ProductBatchCreate, user_id: int) -
         action="create",
         resource="product_batch",
         resource_id=str(db_batch.id),
-        new_values=batch.model_dump(),
+        new_values=batch.model_dump(mode="json"),
     )
 
     return db_batch
@@ -73,10 +97,29 @@ def update_product_batch(
         }
 
         update_data = batch_update.model_dump(exclude_unset=True)
+        previous_quantity = db_batch.quantity_remaining
+        previous_product_id = db_batch.product_id
         for key, value in update_data.items():
             setattr(db_batch, key, value)
+        # Un cambio manual de existencia queda como ajuste en el historial del lote
+        if update_data.get("quantity_remaining", previous_quantity) != previous_quantity:
+            db.add(
+                BatchStockMovement(
+                    tenant_id=db_batch.tenant_id,
+                    batch_id=batch_id,
+                    movement_type="adjustment",
+                    quantity=db_batch.quantity_remaining - (previous_quantity or 0),
+                    previous_quantity=previous_quantity,
+                    new_quantity=db_batch.quantity_remaining,
+                    reason="manual_update",
+                    user_id=user_id,
+                )
+            )
+        if db_batch.quantity_remaining != previous_quantity or db_batch.product_id != previous_product_id:
+            mark_products_dirty(db, [previous_product_id, db_batch.product_id], db_batch.tenant_id)
 
         db.commit()
+        invalidate_batch_summary(db_batch.tenant_id)
         db.refresh(db_batch)
 
         # Log de auditoría
@@ -102,8 +145,12 @@ def delete_product_batch(db: Session, batch_id: int, user_id: int) -> bool:
         if movements_count > 0:
             return False  # No se puede eliminar si tiene movimientos
 
+        if db_batch.quantity_remaining:
+            mark_products_dirty(db, [db_batch.product_id], db_batch.tenant_id)
+        tenant_id = db_batch.tenant_id
         db.delete(db_batch)
         db.commit()
+        invalidate_batch_summary(tenant_id)
 
         # Log de auditoría
         log_user_action(
@@ -137,22 +184,57 @@ def create_batch_movement(db: Session, movement: BatchStockMovementCreate) -> Ba
             db_batch.quantity_remaining -= movement.quantity
         elif movement.movement_type == "adjustment":
             db_batch.quantity_remaining = movement.new_quantity
+        mark_products_dirty(db, [db_batch.product_id], db_batch.tenant_id)
 
     db.commit()
+    if db_batch:
+        invalidate_batch_summary(db_batch.tenant_id)
     db.refresh(db_movement)
     return db_movement
 
 
 # Advanced batch operations
-def get_expiring_batches(db: Session, days_ahead: int = 30) -> list[ProductBatch]:
-    """Obtener lotes próximos a expirar"""
+def get_expiring_batches(db: Session, days_ahead: int = 30, tenant_id: int = None) -> list[ProductBatch]:
+    """Obtener lotes próximos a expirar (incluye los ya caducados), con su medicamento"""
     cutoff_date = date.today() + timedelta(days=days_ahead)
-    return (
-        db.query(ProductBatch)
-        .filter(ProductBatch.expiration_date <= cutoff_date, ProductBatch.quantity_remaining > 0)
-        .order_by(ProductBatch.expiration_date)
-        .all()
+    query = db.query(ProductBatch).options(joinedload(ProductBatch.product))
+    query = query.filter(ProductBatch.expiration_date <= cutoff_date, ProductBatch.quantity_remaining > 0)
+    if tenant_id:
+        query = query.filter(ProductBatch.tenant_id == tenant_id)
+    return query.order_by(ProductBatch.expiration_date, ProductBatch.id).all()
+
+
+def get_expiring_batches_by_cursor(
+    db: Session, tenant_id: int = None, days_ahead: int = 30, cursor: str = None, page_size: int = 50
+) -> dict:
+    """
+    Lotes con existencia que caducan en ``days_ahead`` días (o ya caducaron), paginados
+    por (expiration_date, id) sobre ``ix_product_batches_tenant_expiry_active``. El
+    nombre del medicamento y el valor de la existencia vienen en la misma consulta.
+    """
+    today = date.today()
+    query = (
+        db.query(
+            ProductBatch.id,
+            ProductBatch.product_id,
+            Product.name.label("product_name"),
+            ProductBatch.batch_number,
+            ProductBatch.expiration_date,
+            ProductBatch.quantity_remaining,
+            ProductBatch.unit_cost,
+            (ProductBatch.quantity_remaining * func.coalesce(ProductBatch.unit_cost, 0.0)).label("stock_value"),
+        )
+        .join(Product, Product.id == ProductBatch.product_id)
+        .filter(
+            ProductBatch.quantity_remaining > 0,
+            ProductBatch.expiration_date <= today + timedelta(days=days_ahead),
+        )
     )
+    if tenant_id:
+        query = query.filter(ProductBatch.tenant_id == tenant_id)
+    page = paginate_by_cursor(query, [ProductBatch.expiration_date, ProductBatch.id], cursor, page_size)
+    page["items"] = [dict(row._mapping, days_until_expiry=(row.expiration_date - today).days) for row in page["items"]]
+    return page
 
 
 def get_batches_by_product(db: Session, product_id: int) -> list[ProductBatch]:
@@ -165,89 +247,322 @@ def get_batches_by_product(db: Session, product_id: int) -> list[ProductBatch]:
     )
 
 
-def allocate_batch_for_sale(db: Session, product_id: int, quantity_needed: int, user_id: int) -> list[dict]:
+class BatchDemand(NamedTuple):
+    """Cantidad a surtir de un producto; ``reference_id`` identifica la venta en los movimientos"""
+
+    product_id: int
+    quantity: int
+    reference_id: str | None = None
+    user_id: int | None = None
+
+
+def allocate_batches(
+    db: Session, demands: Sequence[BatchDemand], tenant_id: int = None, strict: bool = False
+) -> list[dict]:
     """
-    Asignar lotes para una venta usando FIFO (First In, First Out)
-    Retorna lista de asignaciones: [{"batch_id": id, "quantity": qty}, ...]
+    Asigna lotes FEFO (primero el que caduca antes; se omiten los caducados) a
+    todas las demandas en una sola pasada, sin commit:
+
+    1. Los lotes con existencia de todos los productos se bloquean con un
+       ``SELECT ... FOR UPDATE`` por bloque de ``IN``.
+    2. Las asignaciones se calculan en memoria, en el orden de ``demands``.
+    3. Los movimientos de salida se escriben con un INSERT de varias filas y
+       ``quantity_remaining`` con un UPDATE ``CASE`` por bloque.
+
+    Lo que no alcanza a cubrirse con lotes queda sin asignar (productos sin
+    control de lotes); con ``strict`` lanza ValueError. El llamador invalida el
+    resumen de lotes (``invalidate_batch_summary``) después del commit. Retorna
+    ``[{"batch_id", "product_id", "quantity", "batch_number", "expiration_date", "reference_id"}, ...]``.
     """
-    batches = get_batches_by_product(db, product_id)
-    allocations = []
-    remaining_needed = quantity_needed
-
-    for batch in batches:
-        if remaining_needed <= 0:
-            break
-
-        available_qty = min(batch.quantity_remaining, remaining_needed)
-
-        if available_qty > 0:
-            # Crear movimiento de salida
-            create_batch_movement(
-                db,
-                BatchStockMovementCreate(
-                    batch_id=batch.id,
-                    movement_type="out",
-                    quantity=available_qty,
-                    previous_quantity=batch.quantity_remaining,
-                    new_quantity=batch.quantity_remaining - available_qty,
-                    reason="sale",
-                    user_id=user_id,
-                ),
+    batches = ProductBatch.__table__
+    product_ids = sorted({demand.product_id for demand in demands if demand.quantity > 0})
+    available = defaultdict(list)
+    for chunk in chunked(product_ids, IN_CHUNK_SIZE):
+        rows = db.execute(
+            select(
+                batches.c.id,
+                batches.c.product_id,
+                batches.c.batch_number,
+                batches.c.expiration_date,
+                batches.c.quantity_remaining,
+            )
+            .where(
+                batches.c.product_id.in_(chunk),
+                batches.c.quantity_remaining > 0,
+                batches.c.expiration_date >= date.today(),
+            )
+            .order_by(batches.c.product_id, batches.c.expiration_date, batches.c.id)
+            .with_for_update()
+        )
+        for row in rows:
+            available[row.product_id].append(row._asdict())
+
+    allocations, movements = [], []
+    taken = defaultdict(int)
+    for demand in demands:
+        remaining_needed = demand.quantity
+        for batch in available[demand.product_id]:
+            if remaining_needed <= 0:
+                break
+            previous_quantity = batch["quantity_remaining"]
+            quantity = min(previous_quantity, remaining_needed)
+            if quantity <= 0:
+                continue
+            batch["quantity_remaining"] -= quantity
+            taken[batch["id"]] += quantity
+            remaining_needed -= quantity
+            movements.append(
+                {
+                    "tenant_id": tenant_id,
+                    "batch_id": batch["id"],
+                    "movement_type": "out",
+                    "quantity": quantity,
+                    "previous_quantity": previous_quantity,
+                    "new_quantity": batch["quantity_remaining"],
+                    "reason": "sale",
+                    "reference_id": demand.reference_id,
+                    "user_id": demand.user_id,
+                }
             )
-
             allocations.append(
                 {
-                    "batch_id": batch.id,
-                    "quantity": available_qty,
-                    "batch_number": batch.batch_number,
-                    "expiration_date": batch.expiration_date.isoformat(),
+                    "batch_id": batch["id"],
+                    "product_id": demand.product_id,
+                    "quantity": quantity,
+                    "batch_number": batch["batch_number"],
+                    "expiration_date": batch["expiration_date"].isoformat(),
+                    "reference_id": demand.reference_id,
                 }
             )
+        if remaining_needed > 0 and strict:
+            raise ValueError(
+                f"Insufficient stock for product {demand.product_id}. Needed: {demand.quantity}, Available: {demand.quantity - remaining_needed}"
+            )
 
-            remaining_needed -= available_qty
+    if movements:
+        db.execute(insert(BatchStockMovement.__table__), movements)
+        mark_products_dirty(db, (allocation["product_id"] for allocation in allocations), tenant_id)
+    for chunk in chunked(sorted(taken), IN_CHUNK_SIZE):
+        quantities = case({batch_id: taken[batch_id] for batch_id in chunk}, value=batches.c.id)
+        db.execute(
+            update(batches)
+            .where(batches.c.id.in_(chunk))
+            .values(quantity_remaining=batches.c.quantity_remaining - quantities)
+        )
+    return allocations
+
+
+def release_batches(
+    db: Session,
+    reference_id: str,
+    quantities: dict[int, int] | None = None,
+    tenant_id: int = None,
+    reason: str = "sale_delete",
+    user_id: int | None = None,
+) -> dict[int, int]:
+    """
+    Devuelve a sus lotes lo que la venta ``reference_id`` tomó con
+    ``allocate_batches`` (al editarla o cancelarla), sin commit:
+
+    1. Lo asignado por lote es la suma de las salidas menos las devoluciones de
+       la venta, en una consulta agrupada.
+    2. Esos lotes se bloquean con ``SELECT ... FOR UPDATE`` por bloque de ``IN`` y
+       se devuelve primero al que caduca más tarde, de modo que lo que sigue
+       asignado queda en los que caducan antes.
+    3. Las entradas se escriben con un INSERT de varias filas y
+       ``quantity_remaining`` con un UPDATE ``CASE`` por bloque.
+
+    ``quantities`` (``{product_id: cantidad}``) limita lo devuelto por producto;
+    sin él se devuelve todo. Como en ``allocate_batches``, el resumen de lotes se
+    invalida después del commit. Retorna ``{product_id: cantidad devuelta}``.
+    """
+    batches, movements = ProductBatch.__table__, BatchStockMovement.__table__
+    net = func.sum(case((movements.c.movement_type == "out", movements.c.quantity), else_=-movements.c.quantity))
+    allocated = db.execute(
+        select(movements.c.batch_id, net)
+        .where(
+            movements.c.reference_id == reference_id,
+            movements.c.reason.in_(SALE_MOVEMENT_REASONS),
+            movements.c.movement_type.in_(("out", "in")),
+        )
+        .group_by(movements.c.batch_id)
+    )
+    allocated = {batch_id: quantity for batch_id, quantity in allocated if quantity > 0}
+
+    locked = []
+    for chunk in chunked(sorted(allocated), IN_CHUNK_SIZE):
+        locked.extend(
+            db.execute(
+                select(
+                    batches.c.id,
+                    batches.c.product_id,
+                    batches.c.expiration_date,
+                    batches.c.quantity_remaining,
+                )
+                .where(batches.c.id.in_(chunk))
+                .order_by(batches.c.id)
+                .with_for_update()
+            )
+        )
+    locked.sort(key=lambda batch: (batch.expiration_date, batch.id), reverse=True)
+
+    pending = None if quantities is None else dict(quantities)
+    released, returned, rows = defaultdict(int), {}, []
+    for batch in locked:
+        quantity = allocated[batch.id]
+        if pending is not None:
+            quantity = min(quantity, pending.get(batch.product_id, 0))
+            if quantity <= 0:
+                continue
+            pending[batch.product_id] -= quantity
+        returned[batch.id] = quantity
+        released[batch.product_id] += quantity
+        rows.append(
+            {
+                "tenant_id": tenant_id,
+                "batch_id": batch.id,
+                "movement_type": "in",
+                "quantity": quantity,
+                "previous_quantity": batch.quantity_remaining,
+                "new_quantity": batch.quantity_remaining + quantity,
+                "reason": reason,
+                "reference_id": reference_id,
+                "user_id": user_id,
+            }
+        )
 
-    if remaining_needed > 0:
-        raise ValueError(
-            f"Insufficient stock for product {product_id}. Needed: {quantity_needed}, Available: {quantity_needed - remaining_needed}"
+    if rows:
+        db.execute(insert(movements), rows)
+        mark_products_dirty(db, released, tenant_id)
+    for chunk in chunked(sorted(returned), IN_CHUNK_SIZE):
+        quantities = case({batch_id: returned[batch_id] for batch_id in chunk}, value=batches.c.id)
+        db.execute(
+            update(batches)
+            .where(batches.c.id.in_(chunk))
+            .values(quantity_remaining=batches.c.quantity_remaining + quantities)
         )
+    return dict(released)
 
+
+def allocate_batch_for_sale(db: Session, product_id: int, quantity_needed: int, user_id: int) -> list[dict]:
+    """
+    Asignar lotes para una venta usando FEFO (First Expired, First Out)
+    Retorna lista de asignaciones: [{"batch_id": id, "quantity": qty}, ...]
+    """
+    allocations = allocate_batches(db, [BatchDemand(product_id, quantity_needed, user_id=user_id)], strict=True)
+    db.commit()
+    invalidate_batch_summary()
     return allocations
 
 
-def get_batch_inventory_summary(db: Session) -> dict:
-    """Obtener resumen de inventario por lotes"""
-    # Total de lotes activos
-    total_batches = db.query(ProductBatch).filter(ProductBatch.quantity_remaining > 0).count()
+def invalidate_batch_summary(tenant_id: int = None) -> None:
+    """Descarta el resumen y la valuación de lotes en caché (sin tenant: los de todos)"""
+    if tenant_id is None:
+        _batch_summary_cache.clear()
+    else:
+        _batch_summary_cache.clear_tenant(tenant_id)
 
-    # Lotes próximos a expirar (30 días)
-    expiring_soon = len(get_expiring_batches(db, 30))
 
-    # Valor total del inventario por lotes
-    batches = db.query(ProductBatch).filter(ProductBatch.quantity_remaining > 0).all()
-    total_value = sum(batch.quantity_remaining * (batch.unit_cost or 0) for batch in batches)
+def _active_batches(columns: Sequence, tenant_id: int = None):
+    """Lotes con existencia del tenant (índice parcial ``ix_product_batches_tenant_expiry_active``)"""
+    query = select(*columns).select_from(ProductBatch).where(ProductBatch.quantity_remaining > 0)
+    if tenant_id:
+        query = query.where(ProductBatch.tenant_id == tenant_id)
+    return query
 
-    # Lotes por medicamento
-    product_batch_counts = (
-        db.query(
-            ProductBatch.product_id,
-            func.count(ProductBatch.id).label("batch_count"),
-            func.sum(ProductBatch.quantity_remaining).label("total_quantity"),
-        )
-        .filter(ProductBatch.quantity_remaining > 0)
-        .group_by(ProductBatch.product_id)
-        .all()
+
+def _batch_totals() -> tuple:
+    value = func.sum(ProductBatch.quantity_remaining * func.coalesce(ProductBatch.unit_cost, 0.0))
+    return (
+        func.count(ProductBatch.id).label("batch_count"),
+        func.coalesce(func.sum(ProductBatch.quantity_remaining), 0).label("total_quantity"),
+        func.coalesce(value, 0.0).label("total_value"),
     )
 
-    return {
-        "total_active_batches": total_batches,
-        "expiring_within_30_days": expiring_soon,
-        "total_inventory_value": total_value,
-        "products_with_batches": len(product_batch_counts),
+
+def _expiry_bucket(today: date):
+    """Rango de caducidad del lote: expired, 0-7, 8-30, 31-90 o 91+ días"""
+    whens = [(ProductBatch.expiration_date < today, "expired")]
+    lower = 0
+    for days in EXPIRY_BUCKET_DAYS:
+        whens.append((ProductBatch.expiration_date <= today + timedelta(days=days), f"{lower}-{days}"))
+        lower = days + 1
+    return case(*whens, else_=f"{lower}+")
+
+
+def get_batch_inventory_summary(db: Session, tenant_id: int = None) -> dict:
+    """
+    Resumen de inventario por lotes con una sola consulta agrupada por producto
+    (COUNT, SUM y COUNT ... FILTER para los que caducan en 30 días); los totales se
+    suman de los grupos. Se guarda en caché por tenant hasta el siguiente movimiento.
+    """
+    today = date.today()
+    key = ("summary", today)
+    summary = _batch_summary_cache.get(tenant_id, key)
+    if summary is not None:
+        return summary
+
+    expiring = func.count(ProductBatch.id).filter(ProductBatch.expiration_date <= today + timedelta(days=30))
+    query = _active_batches([ProductBatch.product_id, *_batch_totals(), expiring.label("expiring")], tenant_id)
+    rows = db.execute(query.group_by(ProductBatch.product_id)).all()
+
+    summary = {
+        "total_active_batches": sum(row.batch_count for row in rows),
+        "expiring_within_30_days": sum(row.expiring for row in rows),
+        "total_inventory_value": sum(row.total_value for row in rows),
+        "products_with_batches": len(rows),
         "batch_distribution": [
-            {"product_id": row.product_id, "batch_count": row.batch_count, "total_quantity": row.total_quantity or 0}
-            for row in product_batch_counts
+            {"product_id": row.product_id, "batch_count": row.batch_count, "total_quantity": row.total_quantity}
+            for row in rows
         ],
     }
+    _batch_summary_cache.set(tenant_id, key, summary)
+    return summary
+
+
+def get_batch_valuation(db: Session, tenant_id: int = None, group_by: str = "product") -> list[dict]:
+    """
+    Valuación de los lotes con existencia (``quantity_remaining * unit_cost``) agrupada
+    por ``product``, ``supplier`` o ``expiry`` (rango de días a la caducidad).
+    """
+    today = date.today()
+    key = ("valuation", group_by, today)
+    groups = _batch_summary_cache.get(tenant_id, key)
+    if groups is not None:
+        return groups
+
+    if group_by == "product":
+        columns = [ProductBatch.product_id.label("key"), Product.name.label("name")]
+        query = (
+            _active_batches([*columns, *_batch_totals()], tenant_id)
+            .join(Product, Product.id == ProductBatch.product_id)
+            .group_by(ProductBatch.product_id, Product.name)
+        )
+    elif group_by == "supplier":
+        columns = [ProductBatch.supplier_id.label("key"), Supplier.name.label("name")]
+        query = (
+            _active_batches([*columns, *_batch_totals()], tenant_id)
+            .outerjoin(Supplier, Supplier.id == ProductBatch.supplier_id)
+            .group_by(ProductBatch.supplier_id, Supplier.name)
+        )
+    elif group_by == "expiry":
+        bucket = _expiry_bucket(today)
+        query = _active_batches([bucket.label("key"), *_batch_totals()], tenant_id).group_by(bucket)
+    else:
+        raise ValueError(f"Agrupación no soportada: {group_by}")
+
+    groups = [
+        {
+            "key": row.key,
+            "name": getattr(row, "name", None),
+            "batch_count": row.batch_count,
+            "total_quantity": row.total_quantity,
+            "total_value": row.total_value,
+        }
+        for row in db.execute(query.order_by(desc("total_value")))
+    ]
+    _batch_summary_cache.set(tenant_id, key, groups)
+    return groups
 
 
 def validate_batch_expiration(db: Session, batch_id: int) -> dict:
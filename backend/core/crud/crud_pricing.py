@@ -0,0 +1,117 @@
+"""
+Tablas de márgenes por tenant.
+
+Los rangos se guardan en ``pricing_tiers`` y se compilan a un ``PricingTable``
+(arreglos NumPy) la primera vez que se necesitan; la tabla compilada se guarda
+en caché por worker, así que calcular precios (previsualización de Excel,
+recálculo masivo, alta de productos) no consulta la base de datos. Un tenant
+sin rangos usa ``DEFAULT_PRICING_TABLE``.
+"""
+
+from itertools import pairwise
+
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.cache import TenantLRUCache
+from backend.core.config import settings
+from backend.utils.pricing_formula import DEFAULT_PRICING_TABLE, ROUND_MODES, PricingTable, format_tier_label
+
+_pricing_cache = TenantLRUCache("pricing", maxsize=1, ttl=settings.PRICING_CACHE_TTL_SECONDS)
+_TABLE_KEY = "table"
+
+
+class InvalidPricingTableError(ValueError):
+    """Los rangos recibidos no forman una tabla de márgenes válida"""
+
+
+def get_pricing_tiers(db: Session, tenant_id: int = None) -> list[models.PricingTier]:
+    """Rangos guardados del tenant, ordenados por límite (el rango sin límite al final)"""
+    query = db.query(models.PricingTier)
+    if tenant_id:
+        query = query.filter(models.PricingTier.tenant_id == tenant_id)
+    tiers = query.all()
+    return sorted(tiers, key=lambda tier: (tier.max_purchase_price is None, tier.max_purchase_price or 0))
+
+
+def compile_pricing_table(tiers: list) -> PricingTable:
+    """Compila rangos ordenados (modelos o schemas) a un ``PricingTable``"""
+    compiled = []
+    lower = None
+    for tier in tiers:
+        upper = tier.max_purchase_price
+        label = format_tier_label(lower, upper, tier.multiplier)
+        compiled.append(
+            (float("inf") if upper is None else upper, tier.multiplier, label, tier.round_to, tier.round_mode)
+        )
+        lower = upper
+    return PricingTable(tuple(compiled))
+
+
+def get_pricing_table(db: Session, tenant_id: int = None) -> PricingTable:
+    """Tabla compilada del tenant, desde caché; se compila si no existe o expiró"""
+    table = _pricing_cache.get(tenant_id, _TABLE_KEY)
+    if table is None:
+        tiers = get_pricing_tiers(db, tenant_id)
+        table = compile_pricing_table(tiers) if tiers else DEFAULT_PRICING_TABLE
+        _pricing_cache.set(tenant_id, _TABLE_KEY, table)
+    return table
+
+
+def invalidate_pricing_table(tenant_id: int = None) -> None:
+    """Descarta la tabla compilada del tenant tras cambiar sus rangos"""
+    _pricing_cache.clear_tenant(tenant_id)
+
+
+def validate_pricing_tiers(tiers: list[schemas.PricingTierBase]) -> None:
+    """Los límites deben ser crecientes y sólo el último rango puede no tener límite"""
+    if not tiers:
+        raise InvalidPricingTableError("La tabla debe tener al menos un rango")
+    if tiers[-1].max_purchase_price is not None:
+        raise InvalidPricingTableError("El último rango no debe tener límite")
+    limits = [tier.max_purchase_price for tier in tiers[:-1]]
+    if any(limit is None for limit in limits):
+        raise InvalidPricingTableError("Sólo el último rango puede no tener límite")
+    if any(limit <= 0 for limit in limits) or any(a >= b for a, b in pairwise(limits)):
+        raise InvalidPricingTableError("Los límites deben ser positivos y crecientes")
+    for tier in tiers:
+        if tier.multiplier <= 0:
+            raise InvalidPricingTableError("El multiplicador debe ser mayor que cero")
+        if tier.round_to is not None and tier.round_to <= 0:
+            raise InvalidPricingTableError("El redondeo debe ser mayor que cero")
+        if tier.round_mode not in ROUND_MODES:
+            raise InvalidPricingTableError(f"Modo de redondeo inválido: {tier.round_mode}")
+
+
+def replace_pricing_tiers(
+    db: Session, tiers: list[schemas.PricingTierBase], tenant_id: int = None
+) -> list[models.PricingTier]:
+    """Reemplaza la tabla de márgenes del tenant. Raises InvalidPricingTableError."""
+    validate_pricing_tiers(tiers)
+    db.query(models.PricingTier).filter(models.PricingTier.tenant_id == tenant_id).delete(synchronize_session=False)
+    db_tiers = [models.PricingTier(tenant_id=tenant_id, **tier.model_dump()) for tier in tiers]
+    db.add_all(db_tiers)
+    db.commit()
+    invalidate_pricing_table(tenant_id)
+    return get_pricing_tiers(db, tenant_id)
+
+
+def reset_pricing_tiers(db: Session, tenant_id: int = None) -> None:
+    """Elimina los rangos del tenant para volver a la tabla por defecto"""
+    db.query(models.PricingTier).filter(models.PricingTier.tenant_id == tenant_id).delete(synchronize_session=False)
+    db.commit()
+    invalidate_pricing_table(tenant_id)
+
+
+def describe_pricing_table(table: PricingTable) -> list[dict]:
+    """Rangos de una tabla compilada en el formato de ``schemas.PricingTier``"""
+    return [
+        {
+            "max_purchase_price": None if limit == float("inf") else limit,
+            "multiplier": multiplier,
+            "round_to": round_to,
+            "round_mode": round_mode,
+            "label": label,
+        }
+        for limit, multiplier, label, round_to, round_mode in table.tiers
+    ]
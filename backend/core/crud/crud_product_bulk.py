@@ -0,0 +1,302 @@
+"""
+Alta/actualización masiva de productos (upsert por código de barras).
+
+En lugar de un ``create_product`` (dos commits) por producto, el lote se valida
+en una sola pasada y se escribe por bloques con sentencias de varias filas:
+
+1. Validación de cada fila (``ProductCreate``), duplicados dentro del lote y
+   etiquetas inexistentes -> errores por fila, el resto continúa.
+2. Una consulta ``barcode IN (...)`` por bloque para saber qué productos ya existen.
+3. Por bloque, dentro de un SAVEPOINT: INSERT de varias filas para productos
+   nuevos e inventario, UPDATE ``executemany`` para los existentes y
+   asociaciones de etiquetas. Si el bloque falla se reintenta fila por fila
+   para aislar las filas con error.
+4. Un solo commit al final e invalidación de cachés del tenant.
+
+No se usa ``INSERT ... ON CONFLICT`` porque ``products`` no tiene restricción
+única (tenant_id, barcode); la existencia se resuelve con la pre-consulta.
+"""
+
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.crud.crud_pricing import get_pricing_table
+from backend.core.crud.crud_products import invalidate_barcode_cache, invalidate_product_facets, normalize_barcode
+from backend.core.crud.crud_stock_ledger import ledger_rows, record_stock_movements
+from backend.core.pagination import invalidate_counts
+from backend.core.product_search import SEARCH_FIELDS, build_product_search_text
+
+BULK_CHUNK_SIZE = 500
+
+# Máximo de parámetros por ``IN (...)`` (SQLite admite 999 en versiones antiguas)
+IN_CHUNK_SIZE = 500
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _row_error(index: int, barcode: str | None, error: str) -> dict:
+    return {"index": index, "barcode": barcode, "error": error}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in error.errors())
+
+
+def fetch_existing_by_barcode(db: Session, barcodes: list[str], tenant_id: int = None) -> dict[str, dict]:
+    """
+    Productos existentes del tenant por código de barras, con los campos buscables
+    y la cantidad en inventario (``None`` si no tiene fila de inventario).
+    """
+    product = models.Product
+    existing = {}
+    for chunk in chunked(barcodes, IN_CHUNK_SIZE):
+        query = (
+            select(product.id, *(getattr(product, field) for field in SEARCH_FIELDS), models.Inventory.quantity)
+            .outerjoin(models.Inventory, models.Inventory.product_id == product.id)
+            .where(product.barcode.in_(chunk))
+        )
+        if tenant_id:
+            query = query.where(product.tenant_id == tenant_id)
+        for row in db.execute(query).mappings():
+            existing.setdefault(row["barcode"], dict(row))
+    return existing
+
+
+def _tenant_tag_ids(db: Session, tag_ids: set[int], tenant_id: int = None) -> set[int]:
+    found = set()
+    for chunk in chunked(sorted(tag_ids), IN_CHUNK_SIZE):
+        query = select(models.ProductTag.id).where(models.ProductTag.id.in_(chunk))
+        if tenant_id:
+            query = query.where(models.ProductTag.tenant_id == tenant_id)
+        found.update(db.execute(query).scalars())
+    return found
+
+
+def _insert_products(db: Session, inserts: list[dict], tenant_id: int | None) -> None:
+    """
+    INSERT de varias filas; asigna ``id`` en cada dict. Los ids de los productos con código
+    de barras se recuperan con una sola consulta, porque no todos los motores garantizan el
+    orden de ``RETURNING`` en un insert de varias filas (SQLite lo haría fila por fila).
+    """
+    with_barcode = [data for data in inserts if data["barcode"]]
+    without_barcode = [data for data in inserts if not data["barcode"]]
+
+    if with_barcode:
+        db.execute(insert(models.Product.__table__), with_barcode)
+        ids = {}
+        for chunk in chunked([data["barcode"] for data in with_barcode], IN_CHUNK_SIZE):
+            query = (
+                select(models.Product.barcode, models.Product.id)
+                .where(models.Product.barcode.in_(chunk), models.Product.tenant_id == tenant_id)
+                .order_by(models.Product.id)
+            )
+            ids.update(db.execute(query).all())
+        for data in with_barcode:
+            data["id"] = ids[data["barcode"]]
+
+    if without_barcode:
+        db.bulk_insert_mappings(models.Product, without_barcode, return_defaults=True)
+
+
+def _write_chunk(
+    db: Session,
+    chunk: Sequence[tuple[int, schemas.ProductCreate, str | None]],
+    existing: dict[str, dict],
+    tenant_id: int | None,
+    inventory_mode: str,
+    update_fields: set[str] | None,
+) -> tuple[int, int]:
+    """Escribe un bloque con sentencias de varias filas. Retorna (creados, actualizados)."""
+    inserts, insert_items = [], []
+    updates, retagged = [], []
+    inventory_set, inventory_add, inventory_new = [], [], []
+    stock_changes = {}
+    tag_links = []
+
+    for _, item, barcode in chunk:
+        current = existing.get(barcode) if barcode else None
+        if current is None:
+            data = item.model_dump(exclude={"inventory", "tags"})
+            data.update(tenant_id=tenant_id, barcode=barcode)
+            data["search_text"] = build_product_search_text(*(data[field] for field in SEARCH_FIELDS))
+            inserts.append(data)
+            insert_items.append(item)
+            continue
+
+        data = item.model_dump(exclude_unset=True, include=update_fields, exclude={"inventory", "tags"})
+        data.pop("barcode", None)
+        if data.get("sale_price", 0) is None:
+            del data["sale_price"]
+        merged = {field: data.get(field, current[field]) for field in SEARCH_FIELDS}
+        data.update(id=current["id"], search_text=build_product_search_text(*merged.values()))
+        updates.append(data)
+
+        if item.inventory is not None:
+            quantity = item.inventory.quantity
+            if current["quantity"] is None:
+                inventory_new.append({"product_id": current["id"], "tenant_id": tenant_id, "quantity": quantity})
+                stock_changes[current["id"]] = quantity
+            elif inventory_mode == "add":
+                inventory_add.append({"pid": current["id"], "delta": quantity})
+                stock_changes[current["id"]] = quantity
+            else:
+                inventory_set.append({"pid": current["id"], "qty": quantity})
+                stock_changes[current["id"]] = quantity - current["quantity"]
+
+        if "tags" in item.model_fields_set:
+            retagged.append(current["id"])
+            tag_links.extend({"product_id": current["id"], "tag_id": tag_id} for tag_id in set(item.tags or []))
+
+    unpriced = [data for data in inserts if data["sale_price"] is None]
+    if unpriced:
+        # Productos nuevos sin precio de venta: precio sugerido por la tabla de márgenes del tenant
+        if any(data["purchase_price"] is None for data in unpriced):
+            raise ValueError("Se requiere sale_price o purchase_price")
+        prices = get_pricing_table(db, tenant_id).sale_prices([data["purchase_price"] for data in unpriced])
+        for data, price in zip(unpriced, prices.tolist(), strict=True):
+            data["sale_price"] = price
+
+    if inserts:
+        _insert_products(db, inserts, tenant_id)
+        for data, item in zip(inserts, insert_items, strict=True):
+            quantity = item.inventory.quantity if item.inventory else 0
+            inventory_new.append({"product_id": data["id"], "tenant_id": tenant_id, "quantity": quantity})
+            stock_changes[data["id"]] = quantity
+            tag_links.extend({"product_id": data["id"], "tag_id": tag_id} for tag_id in set(item.tags or []))
+
+    if updates:
+        db.bulk_update_mappings(models.Product, updates)
+
+    inventory = models.Inventory.__table__
+    if inventory_new:
+        db.execute(insert(inventory), inventory_new)
+    if inventory_set:
+        db.execute(
+            update(inventory).where(inventory.c.product_id == bindparam("pid")).values(quantity=bindparam("qty")),
+            inventory_set,
+        )
+    if inventory_add:
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id == bindparam("pid"))
+            .values(quantity=inventory.c.quantity + bindparam("delta")),
+            inventory_add,
+        )
+    record_stock_movements(db, ledger_rows(stock_changes, "import"), tenant_id)
+
+    links = models.product_tag_association
+    if retagged:
+        db.execute(delete(links).where(links.c.product_id.in_(retagged)))
+    if tag_links:
+        db.execute(insert(links), tag_links)
+
+    return len(inserts), len(updates)
+
+
+def bulk_upsert_products(
+    db: Session,
+    rows: Sequence[dict[str, Any] | schemas.ProductCreate],
+    tenant_id: int = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    inventory_mode: str = "set",
+    update_fields: set[str] | None = None,
+    commit_each_chunk: bool = False,
+    on_progress: ProgressCallback | None = None,
+) -> dict:
+    """
+    Crea o actualiza productos por código de barras en una sola transacción.
+
+    - Los productos existentes sólo actualizan los campos enviados; ``tags`` reemplaza
+      las etiquetas si viene en la fila.
+    - ``inventory_mode``: "set" fija la cantidad, "add" la suma a la existente.
+    - ``update_fields`` limita las columnas que se actualizan en productos existentes.
+    - ``commit_each_chunk`` confirma cada bloque por separado (importaciones largas)
+      en lugar de una sola transacción.
+    - ``on_progress(procesadas, total)`` se llama tras cada bloque.
+
+    Retorna ``{"created", "updated", "errors", "total_processed"}``; cada error
+    indica ``index`` (posición en ``rows``), ``barcode`` y ``error``.
+    """
+    errors = []
+    items: list[tuple[int, schemas.ProductCreate, str | None]] = []
+    seen_barcodes = set()
+
+    # 1. Validación en una pasada
+    for index, row in enumerate(rows):
+        raw_barcode = row.get("barcode") if isinstance(row, dict) else getattr(row, "barcode", None)
+        try:
+            item = row if isinstance(row, schemas.ProductCreate) else schemas.ProductCreate.model_validate(row)
+        except ValidationError as e:
+            errors.append(_row_error(index, raw_barcode, _validation_message(e)))
+            continue
+
+        barcode = normalize_barcode(item.barcode) or None
+        if barcode in seen_barcodes:
+            errors.append(_row_error(index, barcode, "Código de barras duplicado en el lote"))
+            continue
+        if barcode:
+            seen_barcodes.add(barcode)
+        items.append((index, item, barcode))
+
+    requested_tags = {tag_id for _, item, _ in items for tag_id in item.tags or []}
+    if requested_tags:
+        valid_tags = _tenant_tag_ids(db, requested_tags, tenant_id)
+        valid_items = []
+        for index, item, barcode in items:
+            unknown = set(item.tags or []) - valid_tags
+            if unknown:
+                errors.append(_row_error(index, barcode, f"Etiquetas inexistentes: {sorted(unknown)}"))
+            else:
+                valid_items.append((index, item, barcode))
+        items = valid_items
+
+    # 2 y 3. Pre-consulta de existentes y escritura por bloques
+    created = updated = processed = 0
+    for chunk in chunked(items, chunk_size):
+        existing = fetch_existing_by_barcode(db, [barcode for _, _, barcode in chunk if barcode], tenant_id)
+        try:
+            with db.begin_nested():
+                chunk_created, chunk_updated = _write_chunk(
+                    db, chunk, existing, tenant_id, inventory_mode, update_fields
+                )
+        except Exception:
+            # Aislar las filas con error: reintentar el bloque fila por fila
+            chunk_created = chunk_updated = 0
+            for entry in chunk:
+                try:
+                    with db.begin_nested():
+                        row_created, row_updated = _write_chunk(
+                            db, [entry], existing, tenant_id, inventory_mode, update_fields
+                        )
+                except Exception as e:
+                    errors.append(_row_error(entry[0], entry[2], str(e)))
+                    continue
+                chunk_created += row_created
+                chunk_updated += row_updated
+
+        created += chunk_created
+        updated += chunk_updated
+        processed += len(chunk)
+        if commit_each_chunk:
+            db.commit()
+        if on_progress:
+            on_progress(processed, len(items))
+
+    # 4. Un solo commit (o el del último bloque)
+    db.commit()
+    invalidate_barcode_cache(tenant_id)
+    invalidate_counts(tenant_id)
+    invalidate_product_facets(tenant_id)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"created": created, "updated": updated, "errors": errors, "total_processed": len(rows)}
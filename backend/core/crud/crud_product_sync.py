@@ -0,0 +1,128 @@
+"""
+Sincronización incremental del catálogo para las terminales POS.
+
+Cada terminal guarda el ``next_since`` de su última sincronización y pide sólo lo
+que cambió después, en tres flujos recorridos por keyset:
+
+* productos modificados o creados (``products.updated_at``, ``id``);
+* existencias modificadas (``inventory.updated_at``, ``product_id``);
+* productos eliminados (``product_tombstones.deleted_at``, ``id``).
+
+``next_since`` es un cursor opaco con la última posición de cada flujo y el
+momento en que se emitió. Si es más antiguo que ``PRODUCT_TOMBSTONE_RETENTION_DAYS``
+las eliminaciones pudieron purgarse, así que se responde con una sincronización
+completa (``reset``).
+
+Las fechas las pone el reloj de la aplicación al escribir, no la base de datos al
+hacer commit: una transacción que sella antes pero confirma después de que otra
+terminal ya avanzó su cursor quedaría atrás para siempre. Por eso, al terminar
+una sincronización (``has_more`` en False) cada flujo se retrocede
+``PRODUCT_SYNC_OVERLAP_SECONDS`` y la siguiente vuelve a enviar esa ventana; la
+terminal aplica los cambios por id, así que los repetidos no tienen efecto.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Query, Session, selectinload
+
+from backend.core import models
+from backend.core.config import settings
+from backend.core.pagination import decode_cursor, encode_cursor, keyset_filter
+
+SYNC_PAGE_SIZE = 500
+
+_PRODUCT_KEY = [models.Product.updated_at, models.Product.id]
+_INVENTORY_KEY = [models.Inventory.updated_at, models.Inventory.product_id]
+_TOMBSTONE_KEY = [models.ProductTombstone.deleted_at, models.ProductTombstone.id]
+# Token: posición de los tres flujos + fecha de emisión
+_TOKEN_KEY = [*_PRODUCT_KEY, *_INVENTORY_KEY, *_TOMBSTONE_KEY, models.ProductTombstone.deleted_at]
+
+
+def _changed_after(query: Query, key: list, position: list, limit: int) -> tuple[list, bool]:
+    """Filas posteriores a ``position`` en el orden de ``key``; retorna (filas, hay_más)"""
+    if position[0] is not None:
+        query = query.filter(keyset_filter(key, position))
+    rows = query.order_by(*key).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def _last_position(rows: list, key: list, position: list) -> list:
+    if not rows:
+        return position
+    return [getattr(rows[-1], column.key) for column in key]
+
+
+def _with_overlap(position: list) -> list:
+    """Retrocede la posición de un flujo la ventana de seguridad (desde el primer id de ese instante)"""
+    overlap = timedelta(seconds=settings.PRODUCT_SYNC_OVERLAP_SECONDS)
+    if position[0] is None or not overlap:
+        return position
+    return [position[0] - overlap, 0]
+
+
+def purge_product_tombstones(db: Session, retention_days: int = None, dry_run: bool = False) -> int:
+    """Elimina los tombstones más antiguos que la retención; retorna cuántos había"""
+    retention_days = retention_days or settings.PRODUCT_TOMBSTONE_RETENTION_DAYS
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    query = db.query(models.ProductTombstone).filter(models.ProductTombstone.deleted_at < cutoff)
+    count = query.count()
+    if not dry_run and count:
+        query.delete(synchronize_session=False)
+        db.commit()
+    return count
+
+
+def get_product_changes(db: Session, tenant_id: int = None, since: str = None, limit: int = SYNC_PAGE_SIZE) -> dict:
+    """
+    Cambios del catálogo posteriores al token ``since`` (o el catálogo completo sin token).
+    Retorna un dict compatible con ``schemas.ProductChanges``. Raises InvalidCursorError.
+    """
+    now = datetime.utcnow()
+    positions = [None] * 6
+    reset = False
+    if since:
+        *positions, issued_at = decode_cursor(since, _TOKEN_KEY)
+        reset = issued_at < now - timedelta(days=settings.PRODUCT_TOMBSTONE_RETENTION_DAYS)
+        if reset:
+            positions = [None] * 6
+
+    products_query = db.query(models.Product).options(
+        selectinload(models.Product.tags), selectinload(models.Product.inventory)
+    )
+    inventory_query = db.query(models.Inventory)
+    tombstones_query = db.query(models.ProductTombstone)
+    if tenant_id:
+        products_query = products_query.filter(models.Product.tenant_id == tenant_id)
+        inventory_query = inventory_query.filter(models.Inventory.tenant_id == tenant_id)
+        tombstones_query = tombstones_query.filter(models.ProductTombstone.tenant_id == tenant_id)
+
+    products, more_products = _changed_after(products_query, _PRODUCT_KEY, positions[0:2], limit)
+    inventory, more_inventory = _changed_after(inventory_query, _INVENTORY_KEY, positions[2:4], limit)
+
+    tombstone_position = positions[4:6]
+    if not since or reset:
+        # Sincronización completa: no hay nada que borrar, se parte del último tombstone
+        tombstones, more_deleted = [], False
+        latest = tombstones_query.order_by(*(column.desc() for column in _TOMBSTONE_KEY)).first()
+        if latest:
+            tombstone_position = [latest.deleted_at, latest.id]
+    else:
+        tombstones, more_deleted = _changed_after(tombstones_query, _TOMBSTONE_KEY, tombstone_position, limit)
+
+    has_more = more_products or more_inventory or more_deleted
+    next_positions = [
+        _last_position(products, _PRODUCT_KEY, positions[0:2]),
+        _last_position(inventory, _INVENTORY_KEY, positions[2:4]),
+        _last_position(tombstones, _TOMBSTONE_KEY, tombstone_position),
+    ]
+    if not has_more:
+        # Las páginas siguen el keyset exacto; la siguiente sincronización repasa la ventana
+        next_positions = [_with_overlap(position) for position in next_positions]
+    return {
+        "products": products,
+        "inventory": inventory,
+        "deleted": [tombstone.product_id for tombstone in tombstones],
+        "next_since": encode_cursor([value for position in next_positions for value in position] + [now]),
+        "has_more": has_more,
+        "reset": reset,
+    }
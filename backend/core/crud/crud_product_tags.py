@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 
 from backend.core import models, schemas
+from backend.core.crud.crud_products import invalidate_product_facets
 
 
 def get_product_tag(db: Session, tag_id: int) -> models.ProductTag | None:
@@ -32,6 +33,7 @@ def create_product_tag(db: Session, tag: schemas.ProductTagCreate, tenant_id: in
     db.add(db_tag)
     db.commit()
     db.refresh(db_tag)
+    invalidate_product_facets(tenant_id)
     return db_tag
 
 
@@ -47,6 +49,7 @@ def update_product_tag(db: Session, tag_id: int, tag: schemas.ProductTagUpdate)
 
     db.commit()
     db.refresh(db_tag)
+    invalidate_product_facets(db_tag.tenant_id)
     return db_tag
 
 
@@ -58,4 +61,5 @@ def delete_product_tag(db: Session, tag_id: int) -> models.ProductTag | None:
 
     db.delete(db_tag)
     db.commit()
+    invalidate_product_facets(db_tag.tenant_id)
     return db_tag
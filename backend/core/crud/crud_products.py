@@ -3,10 +3,32 @@ CRUD operations for Products with multi-tenant support.
 All queries are filtered by tenant_id to ensure data isolation.
 """
 
-from sqlalchemy import or_
+from datetime import datetime
+
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 
 from backend.core import models, schemas
+from backend.core.barcode_index import BarcodeMatch, get_barcode_index, invalidate_barcode_index
+from backend.core.cache import TenantLRUCache
+from backend.core.config import settings
+from backend.core.crud.crud_pricing import get_pricing_table
+from backend.core.crud.crud_stock_ledger import ledger_rows, record_stock_movements
+from backend.core.pagination import cached_count, invalidate_counts, paginate_by_cursor
+from backend.core.product_search import get_product_search_backend
+
+# Caché barcode -> producto para el escaneo en caja (por worker y por tenant)
+_barcode_cache = TenantLRUCache("barcode", maxsize=settings.BARCODE_CACHE_SIZE, ttl=settings.BARCODE_CACHE_TTL_SECONDS)
+
+# Conteos de la barra de filtros (etiquetas, laboratorios, existencias); se recalculan al
+# cambiar el catálogo o al vencer el TTL (las existencias cambian con cada venta)
+FACET_CACHE_TTL_SECONDS = 60
+_facet_cache = TenantLRUCache("facets", maxsize=1, ttl=FACET_CACHE_TTL_SECONDS)
+
+
+def normalize_barcode(barcode: str | None) -> str:
+    """Normaliza un código de barras para usarlo como llave (sin espacios)"""
+    return "".join((barcode or "").split())
 
 
 def get_product(db: Session, product_id: int, tenant_id: int = None) -> models.Product | None:
@@ -25,6 +47,47 @@ def get_product_by_barcode(db: Session, barcode: str, tenant_id: int = None) ->
     return query.first()
 
 
+def resolve_barcode(db: Session, barcode: str, tenant_id: int = None) -> schemas.Product | None:
+    """
+    Resuelve un código de barras escaneado usando el caché en memoria.
+    Solo consulta la base de datos en un fallo de caché.
+    """
+    key = normalize_barcode(barcode)
+    if not key:
+        return None
+
+    cached = _barcode_cache.get(tenant_id, key)
+    if cached is not None:
+        return cached
+
+    db_product = get_product_by_barcode(db, barcode=key, tenant_id=tenant_id)
+    if db_product is None:
+        return None
+
+    product = schemas.Product.model_validate(db_product)
+    _barcode_cache.set(tenant_id, key, product)
+    return product
+
+
+def invalidate_barcode_cache(tenant_id: int = None, barcodes: list[str | None] | None = None) -> None:
+    """
+    Invalida códigos de barras concretos, o todo el caché del tenant si no se indican
+    (en ese caso también el índice de búsqueda parcial, p. ej. tras una importación).
+    """
+    if barcodes is None:
+        _barcode_cache.clear_tenant(tenant_id)
+        invalidate_barcode_index(tenant_id)
+        return
+    for barcode in barcodes:
+        if barcode:
+            _barcode_cache.discard(tenant_id, normalize_barcode(barcode))
+
+
+def get_barcode_cache_stats(tenant_id: int = None) -> dict:
+    """Contadores de aciertos/fallos del caché de códigos de barras de este worker"""
+    return _barcode_cache.stats(tenant_id)
+
+
 def get_products(db: Session, tenant_id: int = None, skip: int = 0, limit: int = 100) -> list[models.Product]:
     """Get list of products with pagination, filtered by tenant"""
     query = db.query(models.Product)
@@ -33,31 +96,38 @@ def get_products(db: Session, tenant_id: int = None, skip: int = 0, limit: int =
     return query.offset(skip).limit(limit).all()
 
 
-def get_products_paginated(
+def _filter_by_tags(query, tag_ids: list[int], tag_match: str = "any"):
+    """
+    Products with any (or all) of ``tag_ids``, resolved on the association table
+    through its (tag_id, product_id) index.
+    """
+    links = models.product_tag_association
+    tag_ids = sorted(set(tag_ids))
+    tagged = select(links.c.product_id).where(links.c.tag_id.in_(tag_ids))
+    if tag_match == "all":
+        tagged = tagged.group_by(links.c.product_id).having(func.count(links.c.tag_id) == len(tag_ids))
+    return query.filter(models.Product.id.in_(tagged))
+
+
+def _filter_products(
     db: Session,
     tenant_id: int = None,
-    page: int = 1,
-    page_size: int = 50,
     search: str = None,
     stock_filter: str = "all",
-) -> schemas.ProductPaginatedResponse:
-    """Get paginated products with search and stock filtering"""
+    ranked: bool = True,
+    tag_ids: list[int] | None = None,
+    tag_match: str = "any",
+):
+    """Base query for product listings with search, stock and tag filters"""
     query = db.query(models.Product)
 
     if tenant_id:
         query = query.filter(models.Product.tenant_id == tenant_id)
 
-    # Apply search filter
+    # Apply search filter (indexed; ranked by relevance unless the caller imposes its own order)
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Product.name.ilike(search_term),
-                models.Product.barcode.ilike(search_term),
-                models.Product.laboratory.ilike(search_term),
-                models.Product.active_substance.ilike(search_term),
-            )
-        )
+        backend = get_product_search_backend()
+        query = backend.apply(query, search) if ranked else backend.filter(query, search)
 
     # Apply stock filter
     if stock_filter == "in-stock":
@@ -65,8 +135,83 @@ def get_products_paginated(
     elif stock_filter == "out-of-stock":
         query = query.join(models.Inventory).filter(models.Inventory.quantity <= 0)
 
-    # Get total count
-    total = query.count()
+    if tag_ids:
+        query = _filter_by_tags(query, tag_ids, tag_match)
+
+    return query
+
+
+def _listing_key(search: str | None, stock_filter: str, tag_ids: list[int] | None, tag_match: str) -> tuple:
+    tags = tuple(sorted(set(tag_ids or [])))
+    return ("products", search or "", stock_filter, tags, tag_match if tags else "")
+
+
+def _compute_product_facets(db: Session, tenant_id: int = None) -> dict:
+    product, inventory, tag = models.Product, models.Inventory, models.ProductTag
+    links = models.product_tag_association
+
+    tags_query = (
+        select(tag.id, tag.name, func.count(links.c.product_id))
+        .outerjoin(links, links.c.tag_id == tag.id)
+        .group_by(tag.id, tag.name)
+        .order_by(tag.name)
+    )
+    labs_query = (
+        select(product.laboratory, func.count(product.id))
+        .where(product.laboratory.isnot(None), product.laboratory != "")
+        .group_by(product.laboratory)
+        .order_by(product.laboratory)
+    )
+    stock_query = select(
+        func.coalesce(func.sum(case((inventory.quantity > 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((inventory.quantity <= 0, 1), else_=0)), 0),
+    )
+    if tenant_id:
+        tags_query = tags_query.where(tag.tenant_id == tenant_id)
+        labs_query = labs_query.where(product.tenant_id == tenant_id)
+        stock_query = stock_query.where(inventory.tenant_id == tenant_id)
+
+    in_stock, out_of_stock = db.execute(stock_query).one()
+    return {
+        "tags": [{"id": id_, "name": name, "count": count} for id_, name, count in db.execute(tags_query)],
+        "laboratories": [{"value": value, "count": count} for value, count in db.execute(labs_query)],
+        "in_stock": in_stock,
+        "out_of_stock": out_of_stock,
+    }
+
+
+def get_product_facets(db: Session, tenant_id: int = None) -> dict:
+    """Per-tag, per-laboratory and stock counts for the filter sidebar, cached per tenant"""
+    facets = _facet_cache.get(tenant_id, "facets")
+    if facets is None:
+        facets = _compute_product_facets(db, tenant_id)
+        _facet_cache.set(tenant_id, "facets", facets)
+    return facets
+
+
+def invalidate_product_facets(tenant_id: int = None) -> None:
+    """Drop the tenant's cached facet counts (products, tags or laboratories changed)"""
+    _facet_cache.clear_tenant(tenant_id)
+
+
+def get_products_paginated(
+    db: Session,
+    tenant_id: int = None,
+    page: int = 1,
+    page_size: int = 50,
+    search: str = None,
+    stock_filter: str = "all",
+    tag_ids: list[int] | None = None,
+    tag_match: str = "any",
+    include_facets: bool = False,
+) -> schemas.ProductPaginatedResponse:
+    """Get paginated products with search, stock and tag filtering"""
+    query = _filter_products(
+        db, tenant_id=tenant_id, search=search, stock_filter=stock_filter, tag_ids=tag_ids, tag_match=tag_match
+    )
+
+    # Total served from the per-tenant count cache instead of a COUNT per page
+    total = cached_count(query, tenant_id, _listing_key(search, stock_filter, tag_ids, tag_match))
 
     # Apply pagination
     offset = (page - 1) * page_size
@@ -76,41 +221,84 @@ def get_products_paginated(
     total_pages = (total + page_size - 1) // page_size
 
     return schemas.ProductPaginatedResponse(
-        items=products, total=total, page=page, page_size=page_size, total_pages=total_pages
+        items=products,
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=total_pages,
+        facets=get_product_facets(db, tenant_id) if include_facets else None,
     )
 
 
-def search_products(db: Session, query: str, tenant_id: int = None) -> list[models.Product]:
-    """Search products by name, barcode, or active substance"""
-    search_term = f"%{query}%"
-    db_query = db.query(models.Product).filter(
-        or_(
-            models.Product.name.ilike(search_term),
-            models.Product.barcode.ilike(search_term),
-            models.Product.active_substance.ilike(search_term),
-        )
+def get_products_by_cursor(
+    db: Session,
+    tenant_id: int = None,
+    cursor: str = None,
+    page_size: int = 50,
+    search: str = None,
+    stock_filter: str = "all",
+    tag_ids: list[int] | None = None,
+    tag_match: str = "any",
+) -> dict:
+    """Keyset-paginated products ordered by id. Raises InvalidCursorError on a malformed cursor."""
+    query = _filter_products(
+        db,
+        tenant_id=tenant_id,
+        search=search,
+        stock_filter=stock_filter,
+        ranked=False,
+        tag_ids=tag_ids,
+        tag_match=tag_match,
     )
+    total = cached_count(query, tenant_id, _listing_key(search, stock_filter, tag_ids, tag_match))
+    return paginate_by_cursor(query, [models.Product.id], cursor, page_size, total_estimate=total)
+
+
+def search_products(db: Session, query: str, tenant_id: int = None) -> list[models.Product]:
+    """Search products by name, barcode, laboratory or active substance, ranked by relevance"""
+    db_query = db.query(models.Product)
     if tenant_id:
         db_query = db_query.filter(models.Product.tenant_id == tenant_id)
-    return db_query.limit(50).all()
+    return get_product_search_backend().apply(db_query, query).limit(50).all()
+
+
+def search_barcode_candidates(db: Session, barcode: str, tenant_id: int = None, limit: int = 10) -> list[BarcodeMatch]:
+    """Ranked partial barcode candidates (exact, prefix, suffix, contains) from the in-memory index"""
+    return get_barcode_index(db, tenant_id).search(normalize_barcode(barcode), limit=limit)
 
 
-def search_products_by_barcode(db: Session, barcode: str, tenant_id: int = None) -> list[models.Product]:
-    """Search products by partial barcode match"""
-    search_term = f"%{barcode}%"
-    query = db.query(models.Product).filter(models.Product.barcode.ilike(search_term))
+def search_products_by_barcode(
+    db: Session, barcode: str, tenant_id: int = None, limit: int = 10
+) -> list[models.Product]:
+    """Search products by partial barcode match, ranked by match type"""
+    candidates = search_barcode_candidates(db, barcode, tenant_id, limit)
+    if not candidates:
+        return []
+    products = db.query(models.Product).filter(models.Product.id.in_([c.product_id for c in candidates])).all()
+    by_id = {product.id: product for product in products}
+    return [by_id[c.product_id] for c in candidates if c.product_id in by_id]
+
+
+def get_tags_by_ids(db: Session, tag_ids: list[int] | None, tenant_id: int = None) -> list[models.ProductTag]:
+    """Load the tenant's tags for the given ids (unknown ids are ignored)"""
+    if not tag_ids:
+        return []
+    query = db.query(models.ProductTag).filter(models.ProductTag.id.in_(set(tag_ids)))
     if tenant_id:
-        query = query.filter(models.Product.tenant_id == tenant_id)
-    return query.limit(10).all()
+        query = query.filter(models.ProductTag.tenant_id == tenant_id)
+    return query.all()
 
 
 def create_product(db: Session, product: schemas.ProductCreate, tenant_id: int = None) -> models.Product:
     """Create a new product"""
-    product_data = product.model_dump(exclude={"inventory"})
+    product_data = product.model_dump(exclude={"inventory", "tags"})
     if tenant_id:
         product_data["tenant_id"] = tenant_id
+    if product.sale_price is None and product.purchase_price is not None:
+        product_data["sale_price"] = get_pricing_table(db, tenant_id).sale_price(product.purchase_price)
 
     db_product = models.Product(**product_data)
+    db_product.tags = get_tags_by_ids(db, product.tags, tenant_id)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
@@ -123,8 +311,13 @@ def create_product(db: Session, product: schemas.ProductCreate, tenant_id: int =
             quantity=product.inventory.quantity if product.inventory else 0,
         )
         db.add(inventory)
+        record_stock_movements(db, ledger_rows({db_product.id: inventory.quantity}, "adjustment"), tenant_id)
         db.commit()
 
+    invalidate_barcode_cache(tenant_id, [db_product.barcode])
+    invalidate_barcode_index(tenant_id)
+    invalidate_counts(tenant_id)
+    invalidate_product_facets(tenant_id)
     return db_product
 
 
@@ -136,22 +329,38 @@ def update_product(
     if not db_product:
         return None
 
-    update_data = product.model_dump(exclude_unset=True, exclude={"inventory"})
+    previous_barcode, previous_name, previous_lab = db_product.barcode, db_product.name, db_product.laboratory
+    update_data = product.model_dump(exclude_unset=True, exclude={"inventory", "tags"})
     for key, value in update_data.items():
         setattr(db_product, key, value)
+    if "tags" in product.model_fields_set:
+        db_product.tags = get_tags_by_ids(db, product.tags, tenant_id)
+        # Cambiar sólo las etiquetas no modifica la fila del producto
+        db_product.updated_at = datetime.utcnow()
 
     # Update inventory if provided
     if hasattr(product, "inventory") and product.inventory is not None:
+        previous_quantity = 0
         if db_product.inventory:
+            previous_quantity = db_product.inventory.quantity or 0
             db_product.inventory.quantity = product.inventory.quantity
         else:
             inventory = models.Inventory(
                 product_id=db_product.id, tenant_id=tenant_id, quantity=product.inventory.quantity
             )
             db.add(inventory)
+        change = {db_product.id: product.inventory.quantity - previous_quantity}
+        record_stock_movements(db, ledger_rows(change, "adjustment"), tenant_id)
 
     db.commit()
     db.refresh(db_product)
+    invalidate_barcode_cache(tenant_id, [previous_barcode, db_product.barcode])
+    if (previous_barcode, previous_name) != (db_product.barcode, db_product.name):
+        invalidate_barcode_index(tenant_id)
+    if "tags" in product.model_fields_set:
+        invalidate_counts(tenant_id)
+    if "tags" in product.model_fields_set or previous_lab != db_product.laboratory:
+        invalidate_product_facets(tenant_id)
     return db_product
 
 
@@ -162,5 +371,13 @@ def delete_product(db: Session, product_id: int, tenant_id: int = None) -> model
         return None
 
     db.delete(db_product)
+    # Tombstone para que las terminales eliminen el producto en su próxima sincronización
+    db.add(
+        models.ProductTombstone(tenant_id=db_product.tenant_id, product_id=db_product.id, barcode=db_product.barcode)
+    )
     db.commit()
+    invalidate_barcode_cache(tenant_id, [db_product.barcode])
+    invalidate_barcode_index(tenant_id)
+    invalidate_counts(tenant_id)
+    invalidate_product_facets(tenant_id)
     return db_product
@@ -321,31 +321,33 @@ def get_top_selling_products(db: Session, limit: int = 10) -> list[dict]:
     return results
 
 
-def get_fulfillment_stats(db: Session) -> dict:
+def get_fulfillment_stats(db: Session, tenant_id: int = None) -> dict:
     """
     Estadísticas de cumplimiento: entregas pendientes, pagos pendientes, etc.
     """
     from backend.core.models import ProductBatch, Sale
 
     # Ventas enviadas pero no entregadas
-    pending_delivery = db.query(Sale).filter(Sale.shipping_status == "shipped").count()
+    sales = db.query(Sale)
+    if tenant_id:
+        sales = sales.filter(Sale.tenant_id == tenant_id)
+    pending_delivery = sales.filter(Sale.shipping_status == "shipped").count()
 
     # Ventas no pagadas (en un sistema con crédito, pero aquí buscaremos las que no tienen factura si aplica o flag similar)
     # Por ahora usaremos un placeholder basado en el modelo de negocio "confirmación"
-    pending_payment = db.query(Sale).filter(Sale.payment_status == "pending").count()
+    pending_payment = sales.filter(Sale.payment_status == "pending").count()
 
     # Medicamentos por vencer (próximos 30 días)
     today = date.today()
     next_month = today + timedelta(days=30)
-    expiring_soon = (
-        db.query(ProductBatch)
-        .filter(
-            ProductBatch.expiration_date >= today,
-            ProductBatch.expiration_date <= next_month,
-            ProductBatch.quantity_remaining > 0,
-        )
-        .count()
+    expiring = db.query(ProductBatch).filter(
+        ProductBatch.expiration_date >= today,
+        ProductBatch.expiration_date <= next_month,
+        ProductBatch.quantity_remaining > 0,
     )
+    if tenant_id:
+        expiring = expiring.filter(ProductBatch.tenant_id == tenant_id)
+    expiring_soon = expiring.count()
 
     return {
         "pending_delivery": pending_delivery,
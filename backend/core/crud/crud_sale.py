@@ -1,8 +1,17 @@
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
 
 from backend.core import models, schemas
+from backend.core.crud.crud_batches import BatchDemand, allocate_batches, invalidate_batch_summary, release_batches
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, chunked
+from backend.core.crud.crud_products import invalidate_barcode_cache
+from backend.core.crud.crud_stock import decrement_stock, increment_stock
+from backend.core.crud.crud_stock_ledger import ledger_rows, record_stock_movements
+from backend.core.pagination import cached_count, invalidate_counts, paginate_by_cursor
 
 
 def calculate_sale_totals(items_subtotal: float, items_iva: float, document_type: str) -> dict:
@@ -19,111 +28,214 @@ def calculate_sale_totals(items_subtotal: float, items_iva: float, document_type
     return {"subtotal": items_subtotal, "iva_amount": iva_amount, "total": total}
 
 
-def check_stock_availability(db: Session, items: list[schemas.SaleItemCreate], tenant_id: int = None) -> dict:
-    """
-    Verifica disponibilidad de stock para los items de una venta.
-    Retorna información sobre items con stock insuficiente.
-    """
-    stock_issues = []
+class SaleContext(NamedTuple):
+    """Productos e inventario de una venta, cargados una sola vez por pedido"""
 
-    for item_data in items:
-        query = db.query(models.Product).filter(models.Product.id == item_data.product_id)
-        if tenant_id:
-            query = query.filter(models.Product.tenant_id == tenant_id)
+    products: dict[int, models.Product]
+    inventory: dict[int, models.Inventory]
 
-        product = query.first()
-
-        if not product:
-            stock_issues.append(
-                {
-                    "product_id": item_data.product_id,
-                    "product_name": "Medicamento no encontrado",
-                    "requested": item_data.quantity,
-                    "available": 0,
-                    "shortage": item_data.quantity,
-                }
-            )
-            continue
 
-        inv_query = db.query(models.Inventory).filter(models.Inventory.product_id == item_data.product_id)
+def load_sale_context(db: Session, product_ids: list[int], tenant_id: int = None) -> SaleContext:
+    """Carga productos e inventario de todas las líneas con una consulta ``IN`` cada uno"""
+    product_ids = sorted(set(product_ids))
+    products, inventory = {}, {}
+    for chunk in chunked(product_ids, IN_CHUNK_SIZE):
+        product_query = db.query(models.Product).filter(models.Product.id.in_(chunk))
+        inv_query = db.query(models.Inventory).filter(models.Inventory.product_id.in_(chunk))
         if tenant_id:
+            product_query = product_query.filter(models.Product.tenant_id == tenant_id)
             inv_query = inv_query.filter(models.Inventory.tenant_id == tenant_id)
+        products.update((product.id, product) for product in product_query)
+        inventory.update((inv.product_id, inv) for inv in inv_query)
+    return SaleContext(products, inventory)
 
-        inventory = inv_query.first()
 
-        available = inventory.quantity if inventory else 0
+def requested_quantities(items: list) -> dict[int, int]:
+    """Cantidad total por producto (líneas de venta nuevas o guardadas)"""
+    requested = defaultdict(int)
+    for item in items:
+        requested[item.product_id] += item.quantity
+    return requested
+
+
+def check_stock_availability(
+    db: Session, items: list[schemas.SaleItemCreate], tenant_id: int = None, context: SaleContext | None = None
+) -> dict:
+    """
+    Verifica disponibilidad de stock para los items de una venta.
+    Las líneas del mismo producto se suman antes de comparar con el inventario.
+    Retorna información sobre items con stock insuficiente.
+    """
+    if context is None:
+        context = load_sale_context(db, [item.product_id for item in items], tenant_id)
+
+    stock_issues = []
+    for product_id, requested in requested_quantities(items).items():
+        product = context.products.get(product_id)
+        inventory = context.inventory.get(product_id)
+        available = inventory.quantity if product and inventory else 0
 
-        if available < item_data.quantity:
+        if available < requested:
             stock_issues.append(
                 {
-                    "product_id": item_data.product_id,
-                    "product_name": product.name,
-                    "requested": item_data.quantity,
+                    "product_id": product_id,
+                    "product_name": product.name if product else "Medicamento no encontrado",
+                    "requested": requested,
                     "available": available,
-                    "shortage": item_data.quantity - available,
+                    "shortage": requested - available,
                 }
             )
 
     return {"has_issues": len(stock_issues) > 0, "issues": stock_issues}
 
 
-def get_sale(db: Session, sale_id: int, tenant_id: int = None):
-    query = (
-        db.query(models.Sale)
-        .options(
-            joinedload(models.Sale.items).joinedload(models.SaleItem.product),
-            joinedload(models.Sale.client),
-            joinedload(models.Sale.user),
-        )
-        .filter(models.Sale.id == sale_id)
+def _full_sale_options() -> tuple:
+    """
+    Grafo completo de la venta (items -> producto con etiquetas e inventario, cliente,
+    usuario). Las colecciones van con ``selectinload``: una consulta por relación en
+    lugar de un JOIN que repite la venta por cada línea.
+    """
+    return (
+        selectinload(models.Sale.items)
+        .selectinload(models.SaleItem.product)
+        .options(selectinload(models.Product.tags), selectinload(models.Product.inventory)),
+        joinedload(models.Sale.client),
+        joinedload(models.Sale.user),
     )
+
+
+def get_sale(db: Session, sale_id: int, tenant_id: int = None):
+    query = db.query(models.Sale).options(*_full_sale_options()).filter(models.Sale.id == sale_id)
     if tenant_id:
         query = query.filter(models.Sale.tenant_id == tenant_id)
     return query.first()
 
 
-def get_sales(db: Session, tenant_id: int = None, skip: int = 0, limit: int = 100):
-    query = db.query(models.Sale).options(
-        joinedload(models.Sale.items).joinedload(models.SaleItem.product),
-        joinedload(models.Sale.client),
-        joinedload(models.Sale.user),
-    )
+def _filter_sales(query: Query, tenant_id: int = None, filters: schemas.SaleFilters | None = None) -> Query:
+    """
+    Filtros del listado de ventas. Fecha, estado y cliente usan los índices
+    ``(tenant_id, <columna>, sale_date)``; ``notes`` se evalúa sobre ese rango.
+    """
     if tenant_id:
         query = query.filter(models.Sale.tenant_id == tenant_id)
-    return query.order_by(models.Sale.sale_date.desc()).offset(skip).limit(limit).all()
+    if filters is None:
+        return query
+    if filters.date_from:
+        query = query.filter(models.Sale.sale_date >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        # Fecha final inclusiva: hasta antes del día siguiente
+        query = query.filter(models.Sale.sale_date < datetime.combine(filters.date_to + timedelta(days=1), time.min))
+    for field in ("shipping_status", "payment_status", "document_type", "client_id"):
+        value = getattr(filters, field)
+        if value is not None:
+            query = query.filter(getattr(models.Sale, field) == value)
+    if filters.notes:
+        query = query.filter(models.Sale.notes.ilike(f"%{filters.notes}%"))
+    return query
+
+
+def _listing_key(filters: schemas.SaleFilters | None) -> tuple:
+    return ("sales", *(filters.model_dump().values() if filters else ()))
+
+
+def _sale_summary_query(db: Session, tenant_id: int = None, filters: schemas.SaleFilters | None = None) -> Query:
+    """Una fila por venta con el nombre del cliente y el número de líneas, sin cargar items"""
+    item_count = (
+        select(func.count(models.SaleItem.id))
+        .where(models.SaleItem.sale_id == models.Sale.id)
+        .correlate(models.Sale)
+        .scalar_subquery()
+    )
+    query = db.query(
+        models.Sale.id,
+        models.Sale.sale_date,
+        models.Sale.client_id,
+        models.Client.name.label("client_name"),
+        models.Sale.user_id,
+        models.Sale.document_type,
+        models.Sale.subtotal,
+        models.Sale.iva_amount,
+        models.Sale.total,
+        models.Sale.shipping_status,
+        models.Sale.payment_status,
+        models.Sale.payment_method,
+        item_count.label("item_count"),
+    ).outerjoin(models.Client, models.Client.id == models.Sale.client_id)
+    return _filter_sales(query, tenant_id, filters)
+
+
+def get_sale_summaries(
+    db: Session, tenant_id: int = None, skip: int = 0, limit: int = 100, filters: schemas.SaleFilters | None = None
+) -> list:
+    """Resumen de ventas para listados (``schemas.SaleSummary``), más recientes primero"""
+    query = _sale_summary_query(db, tenant_id, filters)
+    return query.order_by(models.Sale.sale_date.desc(), models.Sale.id.desc()).offset(skip).limit(limit).all()
+
+
+def get_sale_summaries_by_cursor(
+    db: Session,
+    tenant_id: int = None,
+    cursor: str = None,
+    page_size: int = 50,
+    filters: schemas.SaleFilters | None = None,
+) -> dict:
+    """Resumen de ventas paginado por (sale_date, id), más recientes primero"""
+    total = cached_count(_filter_sales(db.query(models.Sale), tenant_id, filters), tenant_id, _listing_key(filters))
+    return paginate_by_cursor(
+        _sale_summary_query(db, tenant_id, filters),
+        [models.Sale.sale_date, models.Sale.id],
+        cursor,
+        page_size,
+        descending=True,
+        total_estimate=total,
+    )
 
 
-def create_sale(db: Session, sale: schemas.SaleCreate, tenant_id: int = None, auto_adjust_stock: bool = False):
-    """
-    Crea una venta.
-    """
-    # Crear la venta principal
-    sale_data = sale.model_dump(exclude={"items"})
-    if sale_data.get("sale_date") is None:
-        sale_data["sale_date"] = datetime.now()
+def get_sales(
+    db: Session, tenant_id: int = None, skip: int = 0, limit: int = 100, filters: schemas.SaleFilters | None = None
+):
+    query = _filter_sales(db.query(models.Sale).options(*_full_sale_options()), tenant_id, filters)
+    return query.order_by(models.Sale.sale_date.desc(), models.Sale.id.desc()).offset(skip).limit(limit).all()
+
+
+def get_sales_by_cursor(
+    db: Session,
+    tenant_id: int = None,
+    cursor: str = None,
+    page_size: int = 50,
+    filters: schemas.SaleFilters | None = None,
+) -> dict:
+    """Ventas más recientes primero, paginadas por (sale_date, id) en lugar de OFFSET"""
+    query = _filter_sales(db.query(models.Sale).options(*_full_sale_options()), tenant_id, filters)
+    total = cached_count(query, tenant_id, _listing_key(filters))
+    return paginate_by_cursor(
+        query, [models.Sale.sale_date, models.Sale.id], cursor, page_size, descending=True, total_estimate=total
+    )
 
-    if tenant_id:
-        sale_data["tenant_id"] = tenant_id
 
-    db_sale = models.Sale(**sale_data)
-    db.add(db_sale)
-    db.flush()
+def add_missing_inventory(db: Session, context: SaleContext, product_ids, tenant_id: int = None) -> None:
+    """Registra en cero el inventario de los productos que no tienen fila (``auto_adjust_stock``)"""
+    for product_id in sorted(set(product_ids) - set(context.inventory)):
+        inventory = models.Inventory(product_id=product_id, tenant_id=tenant_id, quantity=0)
+        db.add(inventory)
+        context.inventory[product_id] = inventory
+
 
-    # Crear los items de la venta y calcular subtotales
+def build_sale_items(sale: schemas.SaleCreate, context: SaleContext, tenant_id: int = None) -> tuple[list[dict], dict]:
+    """
+    Filas de ``sale_items`` (sin ``sale_id``) y totales de la venta. Si una línea trae
+    un precio distinto al del producto, el producto toma ese precio.
+    """
     items_subtotal = 0.0
     items_iva = 0.0
+    sale_items = []
 
     for item_data in sale.items:
-        product_query = db.query(models.Product).filter(models.Product.id == item_data.product_id)
-        if tenant_id:
-            product_query = product_query.filter(models.Product.tenant_id == tenant_id)
-
-        product = product_query.first()
-
+        product = context.products.get(item_data.product_id)
         if not product:
             raise ValueError(f"Medicamento con ID {item_data.product_id} no encontrado o fuera de tu tenant")
 
-        product_iva_rate = product.iva_rate if product else 0.0
+        product_iva_rate = product.iva_rate or 0.0
         unit_price = item_data.unit_price if item_data.unit_price else product.sale_price
 
         item_subtotal = (item_data.quantity * unit_price) - item_data.discount
@@ -131,51 +243,160 @@ def create_sale(db: Session, sale: schemas.SaleCreate, tenant_id: int = None, au
         items_subtotal += item_subtotal
         items_iva += item_iva
 
-        db_item = models.SaleItem(
-            tenant_id=tenant_id,
-            sale_id=db_sale.id,
-            product_id=item_data.product_id,
-            quantity=item_data.quantity,
-            unit_price=unit_price,
-            discount=item_data.discount,
-            iva_rate=product_iva_rate,
-            subtotal=item_subtotal,
-            iva_amount=item_iva,
+        sale_items.append(
+            {
+                "tenant_id": tenant_id,
+                "product_id": item_data.product_id,
+                "quantity": item_data.quantity,
+                "unit_price": unit_price,
+                "discount": item_data.discount,
+                "iva_rate": product_iva_rate,
+                "subtotal": item_subtotal,
+                "iva_amount": item_iva,
+            }
         )
-        db.add(db_item)
-
-        # Manejar inventario
-        inv_query = db.query(models.Inventory).filter(models.Inventory.product_id == item_data.product_id)
-        if tenant_id:
-            inv_query = inv_query.filter(models.Inventory.tenant_id == tenant_id)
-
-        inventory = inv_query.first()
-
-        if inventory:
-            if inventory.quantity < item_data.quantity and auto_adjust_stock:
-                inventory.quantity = 0
-            else:
-                inventory.quantity = max(0, inventory.quantity - item_data.quantity)
-        elif auto_adjust_stock:
-            new_inventory = models.Inventory(product_id=item_data.product_id, tenant_id=tenant_id, quantity=0)
-            db.add(new_inventory)
 
         # Actualizar precio si es necesario
         if item_data.unit_price and item_data.unit_price != product.sale_price:
             product.sale_price = item_data.unit_price
 
-    totals = calculate_sale_totals(items_subtotal, items_iva, sale.document_type)
-    db_sale.subtotal = totals["subtotal"]
-    db_sale.iva_amount = totals["iva_amount"]
-    db_sale.total = totals["total"]
+    return sale_items, calculate_sale_totals(items_subtotal, items_iva, sale.document_type)
+
+
+def write_sales(
+    db: Session,
+    sales: list[schemas.SaleCreate],
+    context: SaleContext,
+    tenant_id: int = None,
+    auto_adjust_stock: bool = False,
+) -> list[models.Sale]:
+    """
+    Escribe ventas ya validadas (sin commit): las ventas en un flush, los items de
+    todas en un INSERT de varias filas, el descuento de inventario sumado por
+    producto con ``crud_stock.decrement_stock``, sus movimientos en ``stock_ledger``
+    y la salida de lotes con ``crud_batches.allocate_batches``. Raises InsufficientStockError.
+    """
+    if auto_adjust_stock:
+        add_missing_inventory(db, context, [item.product_id for sale in sales for item in sale.items], tenant_id)
+
+    db_sales, sale_items = [], []
+    for sale in sales:
+        items, totals = build_sale_items(sale, context, tenant_id)
+        sale_data = sale.model_dump(exclude={"items"})
+        if sale_data.get("sale_date") is None:
+            sale_data["sale_date"] = datetime.now()
+        if tenant_id:
+            sale_data["tenant_id"] = tenant_id
+        db_sale = models.Sale(**sale_data, **totals)
+        db_sales.append(db_sale)
+        sale_items.append(items)
+
+    db.add_all(db_sales)
+    db.flush()
+    rows = [
+        dict(item, sale_id=db_sale.id) for db_sale, items in zip(db_sales, sale_items, strict=True) for item in items
+    ]
+    db.execute(insert(models.SaleItem.__table__), rows)
+
+    # Descuento atómico: si otra venta se llevó el stock lanza InsufficientStockError
+    taken = decrement_stock(
+        db, requested_quantities([item for sale in sales for item in sale.items]), tenant_id, clamp=auto_adjust_stock
+    )
+
+    # Libro de existencias y salida de lotes FEFO por venta, en la misma transacción
+    # (con ``auto_adjust_stock`` lo descontado se reparte en el orden de las ventas)
+    ledger, demands = [], []
+    for db_sale, sale in zip(db_sales, sales, strict=True):
+        changes = {}
+        for product_id, quantity in requested_quantities(sale.items).items():
+            applied = min(quantity, taken.get(product_id, 0))
+            taken[product_id] = taken.get(product_id, 0) - applied
+            changes[product_id] = -applied
+            demands.append(BatchDemand(product_id, quantity, str(db_sale.id), db_sale.user_id))
+        ledger.extend(ledger_rows(changes, "sale", str(db_sale.id), db_sale.user_id))
+    record_stock_movements(db, ledger, tenant_id)
+    allocate_batches(db, demands, tenant_id)
+    return db_sales
+
+
+def create_sale(
+    db: Session,
+    sale: schemas.SaleCreate,
+    tenant_id: int = None,
+    auto_adjust_stock: bool = False,
+    context: SaleContext | None = None,
+):
+    """
+    Crea una venta. Productos e inventario se cargan una vez para todo el pedido
+    (o se reutiliza el ``context`` que ya cargó el router) y los items se insertan
+    con un solo INSERT de varias filas. El inventario se descuenta con
+    ``crud_stock.decrement_stock``. Raises InsufficientStockError (sin rollback).
+    """
+    if context is None:
+        context = load_sale_context(db, [item.product_id for item in sale.items], tenant_id)
 
+    (db_sale,) = write_sales(db, [sale], context, tenant_id, auto_adjust_stock)
+    touched_barcodes = [context.products[item.product_id].barcode for item in sale.items]
     db.commit()
-    db.refresh(db_sale)
+    # El stock mostrado al escanear cambió
+    invalidate_barcode_cache(tenant_id, touched_barcodes)
+    invalidate_counts(tenant_id)
+    invalidate_batch_summary(tenant_id)
     return get_sale(db, db_sale.id, tenant_id=tenant_id)
 
 
-def update_sale(db: Session, sale_id: int, sale_update: schemas.SaleUpdate, tenant_id: int = None):
-    db_sale = get_sale(db, sale_id, tenant_id=tenant_id)
+def _diff_sale_items(old_items: list[models.SaleItem], new_items: list[schemas.SaleItemCreate]) -> tuple:
+    """
+    Empareja las líneas guardadas con las nuevas por producto (en orden de aparición).
+    Retorna (sin cambios, modificadas [(guardada, nueva)], agregadas, eliminadas).
+    """
+    pending = defaultdict(list)
+    for old in sorted(old_items, key=lambda item: item.id):
+        pending[old.product_id].append(old)
+
+    unchanged, changed, added = [], [], []
+    for new in new_items:
+        if not pending[new.product_id]:
+            added.append(new)
+            continue
+        old = pending[new.product_id].pop(0)
+        if (old.quantity, old.unit_price, old.discount) == (new.quantity, new.unit_price, new.discount):
+            unchanged.append(old)
+        else:
+            changed.append((old, new))
+    removed = [old for olds in pending.values() for old in olds]
+    return unchanged, changed, added, removed
+
+
+def _line_amounts(item: schemas.SaleItemCreate, iva_rate: float) -> dict:
+    subtotal = (item.quantity * item.unit_price) - item.discount
+    return {
+        "quantity": item.quantity,
+        "unit_price": item.unit_price,
+        "discount": item.discount,
+        "iva_rate": iva_rate,
+        "subtotal": subtotal,
+        "iva_amount": subtotal * iva_rate,
+    }
+
+
+def update_sale(
+    db: Session,
+    sale_id: int,
+    sale_update: schemas.SaleUpdate,
+    tenant_id: int = None,
+    auto_adjust_stock: bool = False,
+):
+    """
+    Actualiza una venta. Si trae ``items`` sólo se escriben las líneas que cambian
+    (UPDATE de las modificadas, INSERT de las nuevas, DELETE de las eliminadas) y el
+    inventario se ajusta por la diferencia neta de cada producto con
+    ``crud_stock``. Raises InsufficientStockError (sin rollback) y ValueError.
+    """
+    query = db.query(models.Sale).options(selectinload(models.Sale.items)).filter(models.Sale.id == sale_id)
+    if tenant_id:
+        query = query.filter(models.Sale.tenant_id == tenant_id)
+    db_sale = query.first()
     if not db_sale:
         return None
 
@@ -183,89 +404,114 @@ def update_sale(db: Session, sale_id: int, sale_update: schemas.SaleUpdate, tena
     for key, value in update_data.items():
         setattr(db_sale, key, value)
 
+    touched_barcodes = []
+    amounts = [{"subtotal": item.subtotal, "iva_amount": item.iva_amount} for item in db_sale.items]
     if sale_update.items is not None:
-        # Revertir inventario
-        for old_item in db_sale.items:
-            inv_query = db.query(models.Inventory).filter(models.Inventory.product_id == old_item.product_id)
-            if tenant_id:
-                inv_query = inv_query.filter(models.Inventory.tenant_id == tenant_id)
-            inventory = inv_query.first()
-            if inventory:
-                inventory.quantity += old_item.quantity
-
-        # Eliminar items anteriores
-        db.query(models.SaleItem).filter(models.SaleItem.sale_id == sale_id).delete()
-
-        # Crear nuevos items
-        items_subtotal = 0.0
-        items_iva = 0.0
-        for item_data in sale_update.items:
-            prod_query = db.query(models.Product).filter(models.Product.id == item_data.product_id)
-            if tenant_id:
-                prod_query = prod_query.filter(models.Product.tenant_id == tenant_id)
-            product = prod_query.first()
-
-            product_iva_rate = product.iva_rate if product else 0.0
-            item_subtotal = (item_data.quantity * item_data.unit_price) - item_data.discount
-            item_iva = item_subtotal * product_iva_rate
-            items_subtotal += item_subtotal
-            items_iva += item_iva
-
-            db_item = models.SaleItem(
-                tenant_id=tenant_id,
-                sale_id=sale_id,
-                product_id=item_data.product_id,
-                quantity=item_data.quantity,
-                unit_price=item_data.unit_price,
-                discount=item_data.discount,
-                iva_rate=product_iva_rate,
-                subtotal=item_subtotal,
-                iva_amount=item_iva,
+        unchanged, changed, added, removed = _diff_sale_items(db_sale.items, sale_update.items)
+        lines = [new for _, new in changed] + added
+        product_ids = [item.product_id for item in lines] + [old.product_id for old in removed]
+        context = load_sale_context(db, product_ids, tenant_id)
+        missing = sorted({item.product_id for item in lines} - set(context.products))
+        if missing:
+            raise ValueError(f"Medicamento con ID {missing[0]} no encontrado o fuera de tu tenant")
+        touched_barcodes = [product.barcode for product in context.products.values()]
+        new_amounts = [_line_amounts(item, context.products[item.product_id].iva_rate or 0.0) for item in lines]
+
+        # Diferencia neta de inventario por producto
+        deltas = defaultdict(int)
+        for product_id, quantity in requested_quantities(lines).items():
+            deltas[product_id] += quantity
+        for old in [old for old, _ in changed] + removed:
+            deltas[old.product_id] -= old.quantity
+
+        sale_items = models.SaleItem.__table__
+        if removed:
+            db.execute(delete(sale_items).where(sale_items.c.id.in_([old.id for old in removed])))
+        if changed:
+            db.execute(
+                update(sale_items)
+                .where(sale_items.c.id == bindparam("item_id"))
+                .values({column: bindparam(column) for column in new_amounts[0]}),
+                [
+                    {"item_id": old.id, **amount}
+                    for (old, _), amount in zip(changed, new_amounts[: len(changed)], strict=True)
+                ],
             )
-            db.add(db_item)
+        if added:
+            db.execute(
+                insert(sale_items),
+                [
+                    {"tenant_id": tenant_id, "sale_id": sale_id, "product_id": item.product_id, **amount}
+                    for item, amount in zip(added, new_amounts[len(changed) :], strict=True)
+                ],
+            )
+
+        returned = increment_stock(
+            db, {product_id: -delta for product_id, delta in deltas.items() if delta < 0}, tenant_id
+        )
+        requested = {product_id: delta for product_id, delta in deltas.items() if delta > 0}
+        if auto_adjust_stock:
+            add_missing_inventory(db, context, requested, tenant_id)
+            db.flush()
+        taken = decrement_stock(db, requested, tenant_id, clamp=auto_adjust_stock)
+        changes = {**returned, **{product_id: -quantity for product_id, quantity in taken.items()}}
+        record_stock_movements(db, ledger_rows(changes, "sale_update", str(sale_id)), tenant_id)
+
+        # Los lotes siguen a la venta: se devuelve lo que sobra y se asigna FEFO lo que falta
+        release_batches(
+            db,
+            str(sale_id),
+            {product_id: -delta for product_id, delta in deltas.items() if delta < 0},
+            tenant_id,
+            reason="sale_update",
+            user_id=db_sale.user_id,
+        )
+        allocate_batches(
+            db,
+            [
+                BatchDemand(product_id, quantity, str(sale_id), db_sale.user_id)
+                for product_id, quantity in requested.items()
+            ],
+            tenant_id,
+        )
 
-            inv_query = db.query(models.Inventory).filter(models.Inventory.product_id == item_data.product_id)
-            if tenant_id:
-                inv_query = inv_query.filter(models.Inventory.tenant_id == tenant_id)
-            inventory = inv_query.first()
-            if inventory:
-                inventory.quantity = max(0, inventory.quantity - item_data.quantity)
+        amounts = [{"subtotal": old.subtotal, "iva_amount": old.iva_amount} for old in unchanged] + new_amounts
 
-        totals = calculate_sale_totals(items_subtotal, items_iva, db_sale.document_type)
+    if sale_update.items is not None or "document_type" in update_data:
+        totals = calculate_sale_totals(
+            sum(line["subtotal"] or 0.0 for line in amounts),
+            sum(line["iva_amount"] or 0.0 for line in amounts),
+            db_sale.document_type,
+        )
         db_sale.subtotal = totals["subtotal"]
         db_sale.iva_amount = totals["iva_amount"]
         db_sale.total = totals["total"]
 
     db.commit()
+    invalidate_barcode_cache(tenant_id, touched_barcodes)
+    invalidate_counts(tenant_id)
+    invalidate_batch_summary(tenant_id)
     return get_sale(db, sale_id, tenant_id=tenant_id)
 
 
 def delete_sale(db: Session, sale_id: int, tenant_id: int = None):
     db_sale = get_sale(db, sale_id, tenant_id=tenant_id)
     if db_sale:
-        for item in db_sale.items:
-            inv_query = db.query(models.Inventory).filter(models.Inventory.product_id == item.product_id)
-            if tenant_id:
-                inv_query = inv_query.filter(models.Inventory.tenant_id == tenant_id)
-            inventory = inv_query.first()
-            if inventory:
-                inventory.quantity += item.quantity
+        returned = increment_stock(db, requested_quantities(db_sale.items), tenant_id)
+        record_stock_movements(db, ledger_rows(returned, "sale_delete", str(sale_id)), tenant_id)
+        release_batches(db, str(sale_id), tenant_id=tenant_id, reason="sale_delete", user_id=db_sale.user_id)
 
+        touched_barcodes = [item.product.barcode for item in db_sale.items]
         db.delete(db_sale)
         db.commit()
+        invalidate_barcode_cache(tenant_id, touched_barcodes)
+        invalidate_counts(tenant_id)
+        invalidate_batch_summary(tenant_id)
     return db_sale
 
 
 def get_sales_by_client(db: Session, client_id: int, tenant_id: int = None, skip: int = 0, limit: int = 100):
-    query = (
-        db.query(models.Sale)
-        .options(
-            joinedload(models.Sale.items).joinedload(models.SaleItem.product),
-            joinedload(models.Sale.client),
-            joinedload(models.Sale.user),
-        )
-        .filter(models.Sale.client_id == client_id)
-    )
+    query = db.query(models.Sale).options(*_full_sale_options()).filter(models.Sale.client_id == client_id)
     if tenant_id:
         query = query.filter(models.Sale.tenant_id == tenant_id)
     return query.order_by(models.Sale.sale_date.desc()).offset(skip).limit(limit).all()
@@ -274,13 +520,8 @@ def get_sales_by_client(db: Session, client_id: int, tenant_id: int = None, skip
 def get_sales_by_product(db: Session, product_id: int, tenant_id: int = None, skip: int = 0, limit: int = 100):
     query = (
         db.query(models.Sale)
-        .options(
-            joinedload(models.Sale.items).joinedload(models.SaleItem.product),
-            joinedload(models.Sale.client),
-            joinedload(models.Sale.user),
-        )
-        .join(models.SaleItem)
-        .filter(models.SaleItem.product_id == product_id)
+        .options(*_full_sale_options())
+        .filter(models.Sale.id.in_(select(models.SaleItem.sale_id).where(models.SaleItem.product_id == product_id)))
     )
     if tenant_id:
         query = query.filter(models.Sale.tenant_id == tenant_id)
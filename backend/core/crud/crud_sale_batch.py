@@ -0,0 +1,150 @@
+"""
+Ingesta masiva de ventas capturadas sin conexión (terminales VanPOS).
+
+Al reconectarse, la terminal envía todas las ventas de la ruta en una sola
+petición en lugar de repetir ``POST /sales/`` por cada una:
+
+1. Productos, inventario y clientes de todo el lote se cargan con una consulta
+   ``IN`` cada uno.
+2. Cada venta se valida (cliente, productos, líneas) y se descuenta de una
+   existencia simulada en memoria, en el orden del lote: si no alcanza, la venta
+   se rechaza con el faltante y las siguientes siguen su curso.
+3. Las ventas aceptadas se escriben por bloques dentro de un SAVEPOINT
+   (``crud_sale.write_sales``: un flush para las ventas, un INSERT de varias filas
+   para los items y un UPDATE condicional de inventario en orden de
+   ``product_id``). Si el bloque falla, por ejemplo porque otra caja vendió el
+   stock mientras tanto, se reintenta venta por venta para aislar las fallidas.
+4. Un solo commit al final.
+"""
+
+from collections.abc import Sequence
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.crud.crud_batches import invalidate_batch_summary
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, chunked
+from backend.core.crud.crud_products import invalidate_barcode_cache
+from backend.core.crud.crud_sale import (
+    SaleContext,
+    add_missing_inventory,
+    load_sale_context,
+    requested_quantities,
+    write_sales,
+)
+from backend.core.crud.crud_stock import InsufficientStockError
+from backend.core.pagination import invalidate_counts
+
+SALE_BATCH_CHUNK_SIZE = 200
+
+
+def _result(index: int, error: str | None = None, issues: list[dict] | None = None) -> dict:
+    return {"index": index, "sale_id": None, "total": None, "error": error, "issues": issues or []}
+
+
+def _tenant_client_ids(db: Session, client_ids: set[int], tenant_id: int = None) -> set[int]:
+    """Clientes del tenant (o compartidos, sin tenant) entre ``client_ids``"""
+    found = set()
+    for chunk in chunked(sorted(client_ids), IN_CHUNK_SIZE):
+        query = select(models.Client.id).where(models.Client.id.in_(chunk))
+        if tenant_id:
+            query = query.where(or_(models.Client.tenant_id == tenant_id, models.Client.tenant_id.is_(None)))
+        found.update(db.execute(query).scalars())
+    return found
+
+
+def _write_chunk(
+    db: Session,
+    chunk: Sequence[tuple[int, schemas.SaleCreate]],
+    context: SaleContext,
+    tenant_id: int | None,
+    auto_adjust_stock: bool,
+    results: list[dict],
+) -> None:
+    db_sales = write_sales(db, [sale for _, sale in chunk], context, tenant_id, auto_adjust_stock)
+    for (index, _), db_sale in zip(chunk, db_sales, strict=True):
+        results[index].update(sale_id=db_sale.id, total=db_sale.total)
+
+
+def create_sales_batch(
+    db: Session,
+    sales: Sequence[schemas.SaleCreate],
+    tenant_id: int = None,
+    auto_adjust_stock: bool = False,
+    chunk_size: int = SALE_BATCH_CHUNK_SIZE,
+) -> dict:
+    """
+    Crea un lote de ventas en una transacción. Cada venta se acepta o rechaza por
+    separado; retorna ``{"created", "failed", "results"}`` con un resultado por venta
+    (``index``, ``sale_id``, ``total``, ``error``, ``issues``) en el orden recibido.
+    """
+    results = [_result(index) for index in range(len(sales))]
+
+    # 1. Pre-carga de todo el lote
+    context = load_sale_context(db, [item.product_id for sale in sales for item in sale.items], tenant_id)
+    clients = _tenant_client_ids(db, {sale.client_id for sale in sales}, tenant_id)
+
+    # 2. Validación y existencia simulada, en el orden del lote
+    available = {product_id: inventory.quantity or 0 for product_id, inventory in context.inventory.items()}
+    accepted: list[tuple[int, schemas.SaleCreate]] = []
+    for index, sale in enumerate(sales):
+        if not sale.items:
+            results[index]["error"] = "Sale must have at least one item"
+            continue
+        if sale.client_id not in clients:
+            results[index]["error"] = "Client not found"
+            continue
+        missing = sorted({item.product_id for item in sale.items} - set(context.products))
+        if missing:
+            results[index]["error"] = f"Product {missing[0]} not found"
+            continue
+
+        requested = requested_quantities(sale.items)
+        issues = [
+            {
+                "product_id": product_id,
+                "product_name": context.products[product_id].name,
+                "requested": quantity,
+                "available": available.get(product_id, 0),
+                "shortage": quantity - available.get(product_id, 0),
+            }
+            for product_id, quantity in requested.items()
+            if available.get(product_id, 0) < quantity
+        ]
+        if issues and not auto_adjust_stock:
+            results[index].update(error="Stock insuficiente", issues=issues)
+            continue
+        for product_id, quantity in requested.items():
+            available[product_id] = max(0, available.get(product_id, 0) - quantity)
+        accepted.append((index, sale))
+
+    # 3. Escritura por bloques (el inventario faltante se registra antes, fuera de los SAVEPOINT)
+    if auto_adjust_stock:
+        product_ids = [item.product_id for _, sale in accepted for item in sale.items]
+        add_missing_inventory(db, context, product_ids, tenant_id)
+        db.flush()
+    for chunk in chunked(accepted, chunk_size):
+        try:
+            with db.begin_nested():
+                _write_chunk(db, chunk, context, tenant_id, auto_adjust_stock, results)
+        except Exception:
+            # Aislar las ventas con error: reintentar el bloque venta por venta
+            for entry in chunk:
+                try:
+                    with db.begin_nested():
+                        _write_chunk(db, [entry], context, tenant_id, auto_adjust_stock, results)
+                except InsufficientStockError as e:
+                    results[entry[0]].update(sale_id=None, total=None, error=str(e), issues=e.issues)
+                except Exception as e:
+                    results[entry[0]].update(sale_id=None, total=None, error=str(e))
+
+    # 4. Un solo commit
+    touched_barcodes = [product.barcode for product in context.products.values()]
+    db.commit()
+    invalidate_barcode_cache(tenant_id, touched_barcodes)
+    invalidate_counts(tenant_id)
+    invalidate_batch_summary(tenant_id)
+
+    created = sum(1 for result in results if result["sale_id"] is not None)
+    return {"created": created, "failed": len(results) - created, "results": results}
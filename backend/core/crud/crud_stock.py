@@ -0,0 +1,119 @@
+"""
+Descuento de inventario seguro ante ventas concurrentes.
+
+Leer la existencia, compararla en Python y escribir ``quantity - n`` permite que
+dos cajas vendan las últimas piezas a la vez: ambas pasan la validación y el
+inventario termina en cero (o negativo) con más piezas vendidas de las que había.
+Aquí el descuento es un solo UPDATE condicional por bloque::
+
+    UPDATE inventory SET quantity = quantity - CASE product_id WHEN ... END
+    WHERE product_id IN (...) AND quantity >= CASE product_id WHEN ... END
+
+La base de datos evalúa la condición sobre la fila ya bloqueada, así que si el
+número de filas afectadas no coincide con el de productos pedidos alguna venta
+concurrente se llevó el stock y se lanza ``InsufficientStockError`` (el llamador
+hace rollback). Antes del UPDATE las filas se bloquean con ``SELECT ... FOR
+UPDATE`` ordenado por ``product_id`` para que dos ventas con los mismos
+productos no se bloqueen mutuamente en PostgreSQL (en SQLite la escritura ya es
+serializada y el ``FOR UPDATE`` se omite).
+"""
+
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from backend.core import models
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, chunked
+
+
+class InsufficientStockError(ValueError):
+    """No hay existencia suficiente para descontar lo pedido"""
+
+    def __init__(self, issues: list[dict]):
+        self.issues = issues
+        super().__init__("Stock insuficiente")
+
+
+def _inventory_rows(product_ids, tenant_id: int = None):
+    inventory = models.Inventory.__table__
+    condition = inventory.c.product_id.in_(list(product_ids))
+    if tenant_id:
+        condition = condition & (inventory.c.tenant_id == tenant_id)
+    return inventory, condition
+
+
+def _lock_inventory(db: Session, product_ids, tenant_id: int = None) -> dict[int, int]:
+    """Bloquea las filas de inventario; retorna la existencia bloqueada ``{product_id: cantidad}``"""
+    inventory, condition = _inventory_rows(product_ids, tenant_id)
+    query = select(inventory.c.product_id, inventory.c.quantity).where(condition).order_by(inventory.c.product_id)
+    return {product_id: quantity or 0 for product_id, quantity in db.execute(query.with_for_update())}
+
+
+def get_stock_shortages(db: Session, quantities: dict[int, int], tenant_id: int = None) -> list[dict]:
+    """Productos cuya existencia actual no alcanza para la cantidad pedida"""
+    available = {}
+    for chunk in chunked(sorted(quantities), IN_CHUNK_SIZE):
+        inventory, condition = _inventory_rows(chunk, tenant_id)
+        available.update(db.execute(select(inventory.c.product_id, inventory.c.quantity).where(condition)).all())
+    return [
+        {
+            "product_id": product_id,
+            "requested": requested,
+            "available": available.get(product_id) or 0,
+            "shortage": requested - (available.get(product_id) or 0),
+        }
+        for product_id, requested in sorted(quantities.items())
+        if (available.get(product_id) or 0) < requested
+    ]
+
+
+def decrement_stock(
+    db: Session, quantities: dict[int, int], tenant_id: int = None, clamp: bool = False
+) -> dict[int, int]:
+    """
+    Descuenta ``{product_id: cantidad}`` del inventario de forma atómica (sin commit).
+    Con ``clamp`` el faltante no es error y la existencia queda en cero (``auto_adjust_stock``).
+    Retorna lo descontado por producto (para ``stock_ledger``).
+    Raises InsufficientStockError; el llamador debe hacer rollback.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    taken = {}
+    for chunk in chunked(sorted(quantities), IN_CHUNK_SIZE):
+        chunk_quantities = {product_id: quantities[product_id] for product_id in chunk}
+        inventory, condition = _inventory_rows(chunk, tenant_id)
+        requested = case(chunk_quantities, value=inventory.c.product_id)
+        locked = _lock_inventory(db, chunk, tenant_id)
+
+        if clamp:
+            remaining = case((inventory.c.quantity > requested, inventory.c.quantity - requested), else_=0)
+            db.execute(update(inventory).where(condition).values(quantity=remaining))
+            taken.update(
+                (product_id, min(max(quantity, 0), chunk_quantities[product_id]))
+                for product_id, quantity in locked.items()
+            )
+            continue
+
+        result = db.execute(
+            update(inventory)
+            .where(condition, inventory.c.quantity >= requested)
+            .values(quantity=inventory.c.quantity - requested)
+        )
+        if result.rowcount != len(chunk):
+            raise InsufficientStockError(get_stock_shortages(db, chunk_quantities, tenant_id))
+        taken.update(chunk_quantities)
+    return taken
+
+
+def increment_stock(db: Session, quantities: dict[int, int], tenant_id: int = None) -> dict[int, int]:
+    """
+    Devuelve ``{product_id: cantidad}`` al inventario con ``quantity + n`` en la base de datos
+    (sin commit). Retorna lo devuelto a los productos que tienen fila de inventario.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    returned_quantities = {}
+    for chunk in chunked(sorted(quantities), IN_CHUNK_SIZE):
+        inventory, condition = _inventory_rows(chunk, tenant_id)
+        returned = case({product_id: quantities[product_id] for product_id in chunk}, value=inventory.c.product_id)
+        locked = _lock_inventory(db, chunk, tenant_id)
+        db.execute(update(inventory).where(condition).values(quantity=inventory.c.quantity + returned))
+        returned_quantities.update((product_id, quantities[product_id]) for product_id in locked)
+    return returned_quantities
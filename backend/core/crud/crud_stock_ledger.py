@@ -0,0 +1,172 @@
+"""
+Libro de existencias (``stock_ledger``) y fotos de existencia (``stock_snapshots``).
+
+Cada cambio de ``inventory.quantity`` (ventas, ediciones y cancelaciones de venta,
+importación de Excel, alta y edición de productos) inserta en la misma
+transacción una fila en ``stock_ledger`` con el cambio con signo, el origen y la
+referencia. ``inventory`` sigue siendo el saldo materializado: la existencia
+actual se lee ahí con una búsqueda por llave, sin sumar historial. Los lotes
+llevan su propio historial en ``batch_stock_movements``.
+
+La existencia a una fecha parte del punto conocido más cercano:
+
+- la foto más reciente anterior a la fecha (``take_stock_snapshot``, p. ej. cada
+  noche con ``python -m backend.tasks.stock_snapshot``) más los movimientos entre
+  la foto y la fecha, o
+- si el producto no tiene foto, la existencia actual menos los movimientos
+  posteriores a la fecha.
+
+Así la consulta recorre sólo la cola del libro desde la foto y no todo el historial.
+
+Cada escritura de existencia (inventario o lotes) marca además sus productos en
+``stock_dirty_products`` con ``mark_products_dirty``; la conciliación
+(``crud_stock_reconciliation``) revisa sólo esos productos.
+"""
+
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import DateTime, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from backend.core import models
+
+
+def ledger_rows(
+    changes: dict[int, int], source: str, reference_id: str | None = None, user_id: int | None = None
+) -> list[dict]:
+    """Filas de ``stock_ledger`` para ``{product_id: cambio}`` (se omiten los cambios en cero)"""
+    return [
+        {
+            "product_id": product_id,
+            "quantity_change": change,
+            "source": source,
+            "reference_id": reference_id,
+            "user_id": user_id,
+        }
+        for product_id, change in sorted(changes.items())
+        if change
+    ]
+
+
+def mark_products_dirty(db: Session, product_ids: Iterable[int], tenant_id: int = None) -> None:
+    """Agrega los productos al conjunto pendiente de conciliar, con un solo INSERT (sin commit)"""
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    marked_at = datetime.now()
+    db.execute(
+        insert(models.StockDirtyProduct.__table__),
+        [{"tenant_id": tenant_id, "product_id": product_id, "marked_at": marked_at} for product_id in product_ids],
+    )
+
+
+def record_stock_movements(db: Session, rows: list[dict], tenant_id: int = None, mark_dirty: bool = True) -> None:
+    """Inserta los movimientos con un solo INSERT de varias filas (sin commit)"""
+    if not rows:
+        return
+    created_at = datetime.now()
+    db.execute(
+        insert(models.StockLedgerEntry.__table__),
+        [dict(row, tenant_id=tenant_id, created_at=created_at) for row in rows],
+    )
+    if mark_dirty:
+        mark_products_dirty(db, (row["product_id"] for row in rows), tenant_id)
+
+
+def take_stock_snapshot(db: Session, tenant_id: int = None, taken_at: datetime | None = None) -> int:
+    """Copia la existencia actual a ``stock_snapshots`` con un INSERT ... SELECT (sin commit)"""
+    inventory = models.Inventory.__table__
+    query = select(
+        inventory.c.tenant_id,
+        inventory.c.product_id,
+        func.coalesce(inventory.c.quantity, 0),
+        literal(taken_at or datetime.now(), DateTime),
+    )
+    if tenant_id:
+        query = query.where(inventory.c.tenant_id == tenant_id)
+    snapshots = models.StockSnapshot.__table__
+    result = db.execute(insert(snapshots).from_select(["tenant_id", "product_id", "quantity", "taken_at"], query))
+    return result.rowcount
+
+
+def _scoped(query, model, tenant_id: int = None, product_ids: Iterable[int] | None = None):
+    if tenant_id:
+        query = query.where(model.tenant_id == tenant_id)
+    if product_ids is not None:
+        query = query.where(model.product_id.in_(list(product_ids)))
+    return query
+
+
+def get_stock_as_of(
+    db: Session, as_of: datetime, tenant_id: int = None, product_ids: Iterable[int] | None = None
+) -> dict[int, int]:
+    """Existencia ``{product_id: cantidad}`` al momento ``as_of``"""
+    ledger, snapshot, inventory = models.StockLedgerEntry, models.StockSnapshot, models.Inventory
+    product_ids = None if product_ids is None else sorted(set(product_ids))
+
+    latest = (
+        _scoped(
+            select(snapshot.product_id, func.max(snapshot.taken_at).label("taken_at")), snapshot, tenant_id, product_ids
+        )
+        .where(snapshot.taken_at <= as_of)
+        .group_by(snapshot.product_id)
+        .subquery()
+    )
+
+    # Con foto: saldo de la foto + movimientos entre la foto y la fecha
+    stock = dict(
+        db.execute(
+            _scoped(select(snapshot.product_id, snapshot.quantity), snapshot, tenant_id).join(
+                latest, (snapshot.product_id == latest.c.product_id) & (snapshot.taken_at == latest.c.taken_at)
+            )
+        ).all()
+    )
+    forward = _scoped(select(ledger.product_id, func.sum(ledger.quantity_change)), ledger, tenant_id).join(
+        latest, ledger.product_id == latest.c.product_id
+    )
+    forward = forward.where(ledger.created_at > latest.c.taken_at, ledger.created_at <= as_of)
+    for product_id, change in db.execute(forward.group_by(ledger.product_id)):
+        stock[product_id] += change
+
+    # Sin foto: saldo actual - movimientos posteriores a la fecha
+    without_snapshot = ~inventory.product_id.in_(select(latest.c.product_id))
+    current = _scoped(select(inventory.product_id, inventory.quantity), inventory, tenant_id, product_ids)
+    current_stock = {product_id: quantity or 0 for product_id, quantity in db.execute(current.where(without_snapshot))}
+    backward = _scoped(select(ledger.product_id, func.sum(ledger.quantity_change)), ledger, tenant_id, product_ids)
+    backward = backward.where(ledger.created_at > as_of, ~ledger.product_id.in_(select(latest.c.product_id)))
+    for product_id, change in db.execute(backward.group_by(ledger.product_id)):
+        if product_id in current_stock:
+            current_stock[product_id] -= change
+
+    stock.update(current_stock)
+    return stock
+
+
+def get_stock_valuation_as_of(
+    db: Session, as_of: datetime, tenant_id: int = None, product_ids: Iterable[int] | None = None
+) -> dict:
+    """Existencia y valor (al precio de compra actual) de cada producto al momento ``as_of``"""
+    stock = get_stock_as_of(db, as_of, tenant_id, product_ids)
+    query = select(models.Product.id, models.Product.purchase_price)
+    if tenant_id:
+        query = query.where(models.Product.tenant_id == tenant_id)
+    if product_ids is not None:
+        query = query.where(models.Product.id.in_(list(product_ids)))
+    prices = dict(db.execute(query).all())
+    items = [
+        {"product_id": product_id, "quantity": quantity, "value": quantity * (prices.get(product_id) or 0.0)}
+        for product_id, quantity in sorted(stock.items())
+    ]
+    return {"as_of": as_of, "total_value": sum(item["value"] for item in items), "items": items}
+
+
+def get_stock_ledger(
+    db: Session, product_id: int, tenant_id: int = None, skip: int = 0, limit: int = 100
+) -> list[models.StockLedgerEntry]:
+    """Movimientos de existencia de un producto, más recientes primero"""
+    query = db.query(models.StockLedgerEntry).filter(models.StockLedgerEntry.product_id == product_id)
+    if tenant_id:
+        query = query.filter(models.StockLedgerEntry.tenant_id == tenant_id)
+    query = query.order_by(models.StockLedgerEntry.created_at.desc(), models.StockLedgerEntry.id.desc())
+    return query.offset(skip).limit(limit).all()
@@ -0,0 +1,168 @@
+"""
+Conciliación de ``inventory.quantity`` contra la existencia de los lotes.
+
+Las ventas descuentan ``inventory`` y asignan lotes, pero los movimientos manuales
+de lotes y los ajustes de inventario tocan sólo un lado, así que ambos saldos se
+desfasan. En vez de comparar todo el catálogo, cada escritura de existencia marca
+sus productos en ``stock_dirty_products`` (``crud_stock_ledger.mark_products_dirty``)
+y ``reconcile_dirty_products`` revisa sólo esos:
+
+1. Toma la marca más alta del momento; lo marcado después queda para la siguiente
+   corrida.
+2. Por bloque de ``IN`` compara inventario y suma de lotes con una sola consulta
+   agrupada. Los productos sin lotes no llevan control por lote y se omiten.
+3. Escribe una fila en ``stock_discrepancies`` por diferencia y, con
+   ``auto_correct``, ajusta el inventario a los lotes y lo registra en el libro
+   con origen ``reconciliation``.
+4. Borra las marcas conciliadas.
+
+Con ``auto_correct`` las filas de inventario y de lotes del bloque se bloquean
+(``SELECT ... FOR UPDATE``, en el mismo orden que las ventas: inventario y luego
+lotes) antes de compararlas, para que una venta concurrente no se pierda al
+escribir el ajuste. Los lotes siguen a las ventas al editarlas o cancelarlas
+(``crud_batches.release_batches``); las diferencias heredadas de antes de eso
+conviene revisarlas en ``stock_discrepancies`` antes de corregir.
+
+Se programa con ``python -m backend.tasks.stock_reconciliation``.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, true, update
+from sqlalchemy.orm import Session
+
+from backend.core import models
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, chunked
+from backend.core.crud.crud_stock_ledger import ledger_rows, record_stock_movements
+
+
+def _lock_stock(db: Session, product_ids: list[int]) -> None:
+    """Bloquea el inventario y los lotes de los productos hasta el commit"""
+    batches, inventory = models.ProductBatch.__table__, models.Inventory.__table__
+    db.execute(
+        select(inventory.c.product_id)
+        .where(inventory.c.product_id.in_(product_ids))
+        .order_by(inventory.c.product_id)
+        .with_for_update()
+    ).all()
+    db.execute(
+        select(batches.c.id)
+        .where(batches.c.product_id.in_(product_ids))
+        .order_by(batches.c.product_id, batches.c.expiration_date, batches.c.id)
+        .with_for_update()
+    ).all()
+
+
+def _batch_stock(db: Session, product_ids: list[int]) -> list:
+    """``(product_id, tenant_id, inventory_quantity, batch_quantity)`` de los productos con lotes"""
+    batches, inventory = models.ProductBatch.__table__, models.Inventory.__table__
+    totals = (
+        select(
+            batches.c.product_id,
+            func.max(batches.c.tenant_id).label("tenant_id"),
+            func.sum(batches.c.quantity_remaining).label("batch_quantity"),
+        )
+        .where(batches.c.product_id.in_(product_ids))
+        .group_by(batches.c.product_id)
+        .subquery()
+    )
+    query = select(
+        totals.c.product_id,
+        func.coalesce(inventory.c.tenant_id, totals.c.tenant_id).label("tenant_id"),
+        func.coalesce(inventory.c.quantity, 0).label("inventory_quantity"),
+        func.coalesce(totals.c.batch_quantity, 0).label("batch_quantity"),
+        inventory.c.product_id.label("inventory_product_id"),
+    ).outerjoin(inventory, inventory.c.product_id == totals.c.product_id)
+    return db.execute(query).all()
+
+
+def _correct_inventory(db: Session, rows: list) -> None:
+    """Ajusta el inventario (ya bloqueado) a la existencia de los lotes y lo registra en el libro"""
+    inventory = models.Inventory.__table__
+    existing = {
+        row.product_id: row.batch_quantity - row.inventory_quantity
+        for row in rows
+        if row.inventory_product_id is not None
+    }
+    if existing:
+        deltas = case(existing, value=inventory.c.product_id)
+        db.execute(
+            update(inventory)
+            .where(inventory.c.product_id.in_(list(existing)))
+            .values(quantity=func.coalesce(inventory.c.quantity, 0) + deltas, updated_at=datetime.utcnow())
+        )
+    missing = [row for row in rows if row.inventory_product_id is None]
+    if missing:
+        db.execute(
+            insert(inventory),
+            [
+                {"product_id": row.product_id, "tenant_id": row.tenant_id, "quantity": row.batch_quantity}
+                for row in missing
+            ],
+        )
+
+    # El ajuste no vuelve a marcar el producto: ya quedó conciliado
+    changes = defaultdict(dict)
+    for row in rows:
+        changes[row.tenant_id][row.product_id] = row.batch_quantity - row.inventory_quantity
+    for tenant_id, tenant_changes in changes.items():
+        record_stock_movements(db, ledger_rows(tenant_changes, "reconciliation"), tenant_id, mark_dirty=False)
+
+
+def reconcile_dirty_products(db: Session, tenant_id: int = None, auto_correct: bool = False) -> dict:
+    """
+    Concilia los productos marcados desde la última corrida (sin commit).
+    Retorna ``{"checked", "discrepancies", "corrected"}``.
+    """
+    dirty = models.StockDirtyProduct.__table__
+    scope = dirty.c.tenant_id == tenant_id if tenant_id else true()
+    high_water = db.execute(select(func.max(dirty.c.id)).where(scope)).scalar()
+    result = {"checked": 0, "discrepancies": 0, "corrected": 0}
+    if high_water is None:
+        return result
+
+    marked = select(dirty.c.product_id).where(scope, dirty.c.id <= high_water).distinct()
+    product_ids = sorted(db.execute(marked).scalars())
+    detected_at = datetime.now()
+    for chunk in chunked(product_ids, IN_CHUNK_SIZE):
+        if auto_correct:
+            _lock_stock(db, chunk)
+        rows = _batch_stock(db, chunk)
+        mismatched = [row for row in rows if row.inventory_quantity != row.batch_quantity]
+        result["checked"] += len(rows)
+        if mismatched:
+            db.execute(
+                insert(models.StockDiscrepancy.__table__),
+                [
+                    {
+                        "tenant_id": row.tenant_id,
+                        "product_id": row.product_id,
+                        "inventory_quantity": row.inventory_quantity,
+                        "batch_quantity": row.batch_quantity,
+                        "difference": row.inventory_quantity - row.batch_quantity,
+                        "corrected": auto_correct,
+                        "detected_at": detected_at,
+                    }
+                    for row in mismatched
+                ],
+            )
+            result["discrepancies"] += len(mismatched)
+            if auto_correct:
+                _correct_inventory(db, mismatched)
+                result["corrected"] += len(mismatched)
+        db.execute(delete(dirty).where(scope, dirty.c.product_id.in_(chunk), dirty.c.id <= high_water))
+    return result
+
+
+def get_stock_discrepancies(
+    db: Session, tenant_id: int = None, product_id: int | None = None, skip: int = 0, limit: int = 100
+) -> list[models.StockDiscrepancy]:
+    """Diferencias encontradas por la conciliación, más recientes primero"""
+    query = db.query(models.StockDiscrepancy)
+    if tenant_id:
+        query = query.filter(models.StockDiscrepancy.tenant_id == tenant_id)
+    if product_id:
+        query = query.filter(models.StockDiscrepancy.product_id == product_id)
+    query = query.order_by(models.StockDiscrepancy.detected_at.desc(), models.StockDiscrepancy.id.desc())
+    return query.offset(skip).limit(limit).all()
@@ -0,0 +1,248 @@
+"""
+Motor de importación de listas de precios en Excel.
+
+La previsualización trabaja con la hoja completa como DataFrame:
+
+1. Normaliza columnas (alias en español/inglés) y tipos con operaciones de pandas.
+2. Busca los productos existentes con consultas ``barcode IN (...)`` por bloques,
+   en lugar de una consulta por fila.
+3. Une la hoja con los productos existentes (``merge``) y calcula precios
+   sugeridos y rangos con la tabla de márgenes compilada del tenant, y las
+   diferencias con las versiones vectorizadas de ``utils.pricing_formula``.
+
+La confirmación reutiliza el motor de upsert masivo (``crud_product_bulk``).
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.crud.crud_pricing import get_pricing_table
+from backend.core.crud.crud_product_bulk import IN_CHUNK_SIZE, ProgressCallback, bulk_upsert_products, chunked
+from backend.utils.pricing_formula import calculate_price_differences, format_price_difference
+
+IMPORT_COLUMN_MAPPINGS = {
+    "CODIGO DE BARRAS": ["CODIGO DE BARRAS", "BARCODE", "CODIGO"],
+    "DESCRIPCION": ["DESCRIPCION", "NOMBRE", "PRODUCTO"],
+    "DELTA": ["DELTA", "COSTO", "PRECIO"],
+    "IVA": ["IVA", "TAX"],
+    "INV": ["INV", "STOCK", "CANTIDAD"],
+    "LABORATORIO": ["LABORATORIO", "LAB", "FABRICANTE"],
+    "SUSTANCIA ACTIVA": ["SUSTANCIA ACTIVA", "INGREDIENTE ACTIVO", "SUSTANCIA"],
+}
+
+REQUIRED_COLUMNS = ("CODIGO DE BARRAS", "DESCRIPCION", "DELTA")
+
+# Tasa aplicada cuando la columna IVA dice "IVA" (o "16%")
+IVA_RATE = 0.16
+
+# Campos que la confirmación actualiza en productos existentes
+CONFIRM_UPDATE_FIELDS = {"name", "purchase_price", "sale_price", "iva_rate"}
+
+# Las importaciones confirman cada bloque para no mantener una transacción enorme abierta
+CONFIRM_CHUNK_SIZE = 1000
+
+# Máximo de filas con error que se listan en el mensaje
+MAX_REPORTED_ROWS = 10
+
+
+class ExcelImportError(ValueError):
+    """El archivo no tiene el formato esperado"""
+
+
+def _find_column(df: pd.DataFrame, target: str) -> str | None:
+    for possible in IMPORT_COLUMN_MAPPINGS.get(target, [target]):
+        if possible in df.columns:
+            return possible
+    return None
+
+
+def _text_column(df: pd.DataFrame, column: str | None) -> pd.Series:
+    if column is None:
+        return pd.Series(None, index=df.index, dtype=object)
+    values = df[column].astype("string").str.strip()
+    return values.where(values.notna() & (values != "") & (values.str.lower() != "nan"), None).astype(object)
+
+
+def _parse_iva(values: pd.Series) -> np.ndarray:
+    """ "IVA", "16%", "0.16" o "16" -> 0.16; "s/IVA", "Exento", vacío -> 0.0"""
+    text = values.fillna("").astype(str).str.upper().str.replace(" ", "", regex=False)
+    numeric = pd.to_numeric(text.str.rstrip("%"), errors="coerce").to_numpy(dtype=float)
+    from_text = np.where(text.isin(["IVA", "CONIVA", "SI"]), IVA_RATE, 0.0)
+    return np.where(np.isnan(numeric), from_text, np.where(numeric > 1, numeric / 100, numeric))
+
+
+def normalize_import_sheet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte la hoja del proveedor a columnas normalizadas: ``barcode``, ``name``,
+    ``active_substance``, ``laboratory``, ``purchase_price``, ``iva_rate`` e
+    ``inventory_to_add``. Descarta las filas sin código de barras.
+    """
+    df = df.copy()
+    df.columns = df.columns.astype(str).str.strip().str.upper()
+    columns = {target: _find_column(df, target) for target in IMPORT_COLUMN_MAPPINGS}
+    if any(columns[target] is None for target in REQUIRED_COLUMNS):
+        raise ExcelImportError("Faltan columnas requeridas en el Excel")
+
+    barcode = _text_column(df, columns["CODIGO DE BARRAS"])
+    # Celdas numéricas leídas como flotante: "7501234567890.0" -> "7501234567890"
+    barcode = barcode.where(barcode.isna(), barcode.astype("string").str.replace(r"\.0$", "", regex=True))
+
+    raw_price = df[columns["DELTA"]].astype("string").str.replace("$", "", regex=False).str.replace(",", "")
+    purchase_price = pd.to_numeric(raw_price.str.strip(), errors="coerce")
+
+    sheet = pd.DataFrame(
+        {
+            "row": df.index + 2,  # número de fila en Excel (encabezado en la fila 1)
+            "barcode": barcode,
+            "name": _text_column(df, columns["DESCRIPCION"]).fillna(""),
+            "active_substance": _text_column(df, columns["SUSTANCIA ACTIVA"]),
+            "laboratory": _text_column(df, columns["LABORATORIO"]),
+            "purchase_price": purchase_price,
+            "iva_rate": _parse_iva(df[columns["IVA"]]) if columns["IVA"] else 0.0,
+            "inventory_to_add": (
+                pd.to_numeric(df[columns["INV"]], errors="coerce").fillna(0).astype(int) if columns["INV"] else 0
+            ),
+        }
+    )
+    sheet = sheet[sheet["barcode"].notna()].reset_index(drop=True)
+
+    invalid = sheet.loc[sheet["purchase_price"].isna(), "row"].tolist()
+    if invalid:
+        rows = ", ".join(str(row) for row in invalid[:MAX_REPORTED_ROWS])
+        more = f" y {len(invalid) - MAX_REPORTED_ROWS} más" if len(invalid) > MAX_REPORTED_ROWS else ""
+        raise ExcelImportError(f"Precio de compra inválido en las filas {rows}{more}")
+    return sheet
+
+
+def read_import_sheet(contents: bytes) -> pd.DataFrame:
+    """Lee el Excel (todas las celdas como texto) y lo normaliza"""
+    return normalize_import_sheet(pd.read_excel(io.BytesIO(contents), dtype=str))
+
+
+def fetch_existing_prices(db: Session, barcodes: list[str], tenant_id: int = None) -> pd.DataFrame:
+    """Productos existentes del tenant (id y precios actuales) con consultas ``IN`` por bloques"""
+    product = models.Product
+    rows = []
+    for chunk in chunked(barcodes, IN_CHUNK_SIZE):
+        query = select(product.barcode, product.id, product.purchase_price, product.sale_price).where(
+            product.barcode.in_(chunk)
+        )
+        if tenant_id:
+            query = query.where(product.tenant_id == tenant_id)
+        rows.extend(db.execute(query.order_by(product.id)).all())
+
+    existing = pd.DataFrame(
+        rows, columns=["barcode", "product_id", "purchase_price_old", "sale_price_current"], dtype=object
+    )
+    # Igual que ``get_product_by_barcode``: si hay duplicados gana el primero
+    return existing.drop_duplicates("barcode", keep="first")
+
+
+def _optional(values: pd.Series) -> list:
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def build_import_preview(db: Session, sheet: pd.DataFrame, tenant_id: int = None) -> schemas.ExcelImportPreviewResponse:
+    """Previsualización de la importación a partir de una hoja normalizada"""
+    pricing = get_pricing_table(db, tenant_id)
+    existing = fetch_existing_prices(db, sheet["barcode"].unique().tolist(), tenant_id)
+    merged = sheet.merge(existing, on="barcode", how="left", validate="many_to_one")
+
+    purchase_price = merged["purchase_price"].to_numpy(dtype=float)
+    old_price = pd.to_numeric(merged["purchase_price_old"]).fillna(0).to_numpy(dtype=float)
+    exists = merged["product_id"].notna().to_numpy()
+
+    differences = calculate_price_differences(old_price, purchase_price)
+    price_change = np.where(exists, differences["direction"], "new")
+    price_difference = [
+        {
+            "difference": difference,
+            "percentage_change": percentage,
+            "direction": direction,
+            "formatted": format_price_difference(difference, percentage, direction),
+        }
+        if row_exists
+        else None
+        for row_exists, difference, percentage, direction in zip(
+            exists.tolist(),
+            differences["difference"].tolist(),
+            differences["percentage_change"].tolist(),
+            differences["direction"].tolist(),
+            strict=True,
+        )
+    ]
+
+    columns = {
+        "barcode": merged["barcode"].tolist(),
+        "name": merged["name"].tolist(),
+        "active_substance": _optional(merged["active_substance"]),
+        "laboratory": _optional(merged["laboratory"]),
+        "purchase_price_new": purchase_price.tolist(),
+        "purchase_price_old": _optional(merged["purchase_price_old"]),
+        "sale_price_suggested": pricing.sale_prices(purchase_price).tolist(),
+        "sale_price_current": _optional(merged["sale_price_current"]),
+        "price_change": price_change.tolist(),
+        "iva_rate": merged["iva_rate"].astype(float).tolist(),
+        "inventory_to_add": merged["inventory_to_add"].astype(int).tolist(),
+        "exists": exists.tolist(),
+        "product_id": _optional(merged["product_id"]),
+        "price_range": pricing.price_ranges(purchase_price).tolist(),
+        "price_difference": price_difference,
+    }
+    # Filas como dicts: pydantic valida la lista completa de una sola vez al construir la respuesta
+    keys = tuple(columns)
+    items = [dict(zip(keys, values, strict=True)) for values in zip(*columns.values(), strict=True)]
+
+    existing_count = int(exists.sum())
+    return schemas.ExcelImportPreviewResponse(
+        items=items,
+        total_items=len(items),
+        new_products=len(items) - existing_count,
+        existing_products=existing_count,
+        price_changes=int((exists & np.isin(price_change, ["up", "down"])).sum()),
+    )
+
+
+def _confirm_row(item: schemas.ExcelImportConfirmItem) -> schemas.ProductCreate:
+    row = {
+        "name": item.name,
+        "barcode": item.barcode,
+        "purchase_price": item.purchase_price,
+        "sale_price": item.sale_price,
+        "iva_rate": item.iva_rate,
+        "inventory": {"quantity": item.inventory_to_add},
+    }
+    # Campos opcionales sólo si vienen en el Excel, para no marcarlos como enviados
+    for field in ("active_substance", "laboratory", "sat_key"):
+        if getattr(item, field) is not None:
+            row[field] = getattr(item, field)
+    return schemas.ProductCreate.model_validate(row)
+
+
+def confirm_import(
+    db: Session,
+    items: list[schemas.ExcelImportConfirmItem],
+    tenant_id: int = None,
+    on_progress: ProgressCallback | None = None,
+) -> schemas.ExcelImportResult:
+    """
+    Confirma la importación con el motor de upsert masivo: los productos existentes
+    actualizan nombre y precios, los nuevos se crean con su inventario, y
+    ``inventory_to_add`` se suma al inventario de ambos.
+    """
+    result = bulk_upsert_products(
+        db,
+        [_confirm_row(item) for item in items],
+        tenant_id=tenant_id,
+        chunk_size=CONFIRM_CHUNK_SIZE,
+        inventory_mode="add",
+        update_fields=CONFIRM_UPDATE_FIELDS,
+        commit_each_chunk=True,
+        on_progress=on_progress,
+    )
+    return schemas.ExcelImportResult(**result)
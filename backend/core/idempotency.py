@@ -0,0 +1,138 @@
+"""
+Claves de idempotencia para creaciones que no deben repetirse.
+
+Las terminales móviles reintentan cuando se cae la conexión; sin deduplicación un
+reintento de ``POST /sales/`` crea otra venta y vuelve a descontar inventario. Si
+la petición trae ``Idempotency-Key``:
+
+1. Se busca la clave del tenant en ``idempotency_keys`` (por ``scope``, p. ej.
+   ``"sales.create"``). Si existe con la misma huella de petición se devuelve la
+   respuesta guardada sin volver a ejecutar nada (encabezado
+   ``Idempotent-Replayed: true``); con otra huella es un error 422 y si la
+   petición original no ha terminado, 409.
+2. Si no existe, se inserta la reserva en la misma transacción que la operación:
+   el commit de la venta confirma también la clave, y una petición concurrente con
+   la misma clave choca con la restricción única (409).
+3. Tras el commit se guarda la respuesta serializada.
+
+Si el proceso muere entre el commit de la operación y el de la respuesta, la clave
+queda "en proceso" hasta que expira: el reintento recibe 409 en lugar de crear un
+duplicado. Las claves expiran tras ``IDEMPOTENCY_KEY_TTL_HOURS``; las vencidas se
+reemplazan al reutilizarse y ``tasks.cleanup`` purga el resto.
+"""
+
+import hashlib
+import json
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from fastapi import Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.core import models
+from backend.core.config import settings
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def idempotency_key_header(
+    idempotency_key: str | None = Header(None, alias=IDEMPOTENCY_HEADER, min_length=1, max_length=255),
+) -> str | None:
+    """Dependencia: valor del encabezado ``Idempotency-Key`` (opcional)"""
+    return idempotency_key
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """sha256 de la petición (cuerpo y parámetros) en JSON canónico"""
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record: models.IdempotencyKey, fingerprint: str) -> JSONResponse:
+    if record.request_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="La clave de idempotencia ya se usó con otra petición")
+    if record.status_code is None:
+        raise HTTPException(status_code=409, detail="La petición original con esta clave sigue en proceso")
+    return JSONResponse(json.loads(record.response), status_code=record.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def run_idempotent(
+    db: Session,
+    tenant_id: int | None,
+    scope: str,
+    key: str | None,
+    request: Any,
+    action: Callable[[], Any],
+    response_model: Any,
+    status_code: int = 200,
+) -> Any:
+    """
+    Ejecuta ``action`` una sola vez por (tenant, scope, key). ``request`` es lo que
+    identifica la petición (cuerpo y parámetros); ``action`` debe hacer su propio commit.
+    Sin ``key`` sólo ejecuta ``action``.
+    """
+    if not key:
+        return action()
+
+    fingerprint = request_fingerprint(request)
+    now = datetime.utcnow()
+    record = (
+        db.query(models.IdempotencyKey)
+        .filter(
+            models.IdempotencyKey.tenant_id == tenant_id,
+            models.IdempotencyKey.scope == scope,
+            models.IdempotencyKey.key == key,
+        )
+        .first()
+    )
+    if record is not None and record.expires_at <= now:
+        db.delete(record)
+        db.flush()
+        record = None
+    if record is not None:
+        return _replay(record, fingerprint)
+
+    record = models.IdempotencyKey(
+        tenant_id=tenant_id,
+        scope=scope,
+        key=key,
+        request_hash=fingerprint,
+        created_at=now,
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    )
+    db.add(record)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="La petición original con esta clave sigue en proceso")
+
+    try:
+        result = action()
+    except Exception:
+        # La reserva se descarta con la operación; el cliente puede reintentar con la misma clave
+        db.rollback()
+        raise
+
+    adapter = TypeAdapter(response_model)
+    content = adapter.dump_python(adapter.validate_python(result, from_attributes=True), mode="json")
+    record.status_code = status_code
+    record.response = json.dumps(content)
+    db.commit()
+    return JSONResponse(content, status_code=status_code)
+
+
+def purge_idempotency_keys(db: Session, dry_run: bool = False) -> int:
+    """Elimina las claves vencidas; retorna cuántas había"""
+    query = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.expires_at <= datetime.utcnow())
+    count = query.count()
+    if not dry_run and count:
+        query.delete(synchronize_session=False)
+        db.commit()
+    return count
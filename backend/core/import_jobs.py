@@ -0,0 +1,238 @@
+"""
+Importaciones de Excel en segundo plano.
+
+La petición sólo recibe el archivo y registra el job en ``import_jobs``; la lectura
+con pandas, la previsualización y el upsert masivo corren en un
+``ThreadPoolExecutor`` con su propia sesión de base de datos, de modo que el event
+loop sigue atendiendo otras peticiones.
+
+El progreso (filas procesadas, errores, ETA) y el resultado se escriben en la
+tabla, cada actualización en su propia transacción: cualquier worker responde la
+consulta por id y el resultado sobrevive a un reinicio. Se conservan
+``IMPORT_JOB_TTL_SECONDS`` después de terminar (``purge_import_jobs`` en la tarea
+de limpieza).
+
+Si el proceso muere a media importación el job queda ``pending``/``running``; la
+limpieza marca como ``failed`` los que llevan más de ``IMPORT_JOB_STALE_SECONDS``
+sin terminar, y desde ahí expiran como cualquier otro.
+"""
+
+import json
+import logging
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.config import settings
+from backend.core.excel_import import build_import_preview, confirm_import, read_import_sheet
+
+logger = logging.getLogger(__name__)
+
+# Errores que se incluyen en el estado del job (el resultado completo los trae todos)
+STATUS_ERRORS_LIMIT = 20
+
+SessionFactory = Callable[[], Session]
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMPORT_JOB_WORKERS, thread_name_prefix="import-job")
+
+
+def _save(session_factory: SessionFactory, job_id: str, **values) -> None:
+    """Actualiza el job en una transacción propia (independiente de la del upsert)"""
+    db = session_factory()
+    try:
+        db.execute(update(models.ImportJob).where(models.ImportJob.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobProgress:
+    """Avance de un job en ejecución; se guarda en ``import_jobs`` en cada llamada"""
+
+    def __init__(self, job_id: str, session_factory: SessionFactory):
+        self.job_id = job_id
+        self._session_factory = session_factory
+
+    def update_progress(self, processed: int, total: int) -> None:
+        _save(self._session_factory, self.job_id, processed_rows=processed, total_rows=total)
+
+
+def _run(job_id: str, session_factory: SessionFactory, work: Callable[[Session, JobProgress], dict]) -> None:
+    _save(session_factory, job_id, status="running", started_at=datetime.utcnow())
+    db = session_factory()
+    try:
+        result = work(db, JobProgress(job_id, session_factory))
+        errors = result.get("errors") or []
+        values = {
+            "status": "completed",
+            "result": json.dumps(result),
+            "error_count": len(errors),
+            "errors": json.dumps(errors[:STATUS_ERRORS_LIMIT]),
+        }
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Import job {job_id} failed")
+        values = {"status": "failed", "error": str(e)}
+    finally:
+        db.close()
+    finished_at = datetime.utcnow()
+    expires_at = finished_at + timedelta(seconds=settings.IMPORT_JOB_TTL_SECONDS)
+    _save(session_factory, job_id, finished_at=finished_at, expires_at=expires_at, **values)
+
+
+def _submit(
+    kind: str,
+    tenant_id: int | None,
+    session_factory: SessionFactory,
+    work: Callable[[Session, JobProgress], dict],
+    total_rows: int = 0,
+) -> schemas.ImportJobStatus:
+    db = session_factory()
+    try:
+        job = models.ImportJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            tenant_id=tenant_id,
+            status="pending",
+            total_rows=total_rows,
+            processed_rows=0,
+            error_count=0,
+        )
+        db.add(job)
+        db.commit()
+        status = to_status(job)
+    finally:
+        db.close()
+    _executor.submit(_run, status.id, session_factory, work)
+    return status
+
+
+def submit_excel_job(
+    contents: bytes, tenant_id: int | None, session_factory: SessionFactory, auto_confirm: bool = False
+) -> schemas.ImportJobStatus:
+    """
+    Previsualiza un Excel en segundo plano. Con ``auto_confirm`` además importa las
+    filas con el precio de venta sugerido y suma ``inventory_to_add``.
+    """
+
+    def work(db: Session, job: JobProgress) -> dict:
+        sheet = read_import_sheet(contents)
+        job.update_progress(0, len(sheet))
+        preview = build_import_preview(db, sheet, tenant_id=tenant_id)
+        if not auto_confirm:
+            job.update_progress(len(sheet), len(sheet))
+            return preview.model_dump(mode="json")
+
+        items = [
+            schemas.ExcelImportConfirmItem(
+                **item.model_dump(include={"barcode", "name", "active_substance", "laboratory"}),
+                purchase_price=item.purchase_price_new,
+                sale_price=item.sale_price_suggested,
+                iva_rate=item.iva_rate,
+                inventory_to_add=item.inventory_to_add,
+                exists=item.exists,
+                product_id=item.product_id,
+            )
+            for item in preview.items
+        ]
+        result = confirm_import(db, items, tenant_id=tenant_id, on_progress=job.update_progress)
+        return result.model_dump(mode="json")
+
+    return _submit("import" if auto_confirm else "preview", tenant_id, session_factory, work)
+
+
+def submit_confirm_job(
+    items: list[schemas.ExcelImportConfirmItem], tenant_id: int | None, session_factory: SessionFactory
+) -> schemas.ImportJobStatus:
+    """Confirma en segundo plano una importación ya previsualizada"""
+
+    def work(db: Session, job: JobProgress) -> dict:
+        result = confirm_import(db, items, tenant_id=tenant_id, on_progress=job.update_progress)
+        return result.model_dump(mode="json")
+
+    return _submit("confirm", tenant_id, session_factory, work, total_rows=len(items))
+
+
+def get_import_job(db: Session, job_id: str, tenant_id: int | None) -> models.ImportJob | None:
+    """Job del tenant o ``None`` si no existe, expiró o pertenece a otro tenant"""
+    return (
+        db.query(models.ImportJob)
+        .filter(
+            models.ImportJob.id == job_id,
+            models.ImportJob.tenant_id == tenant_id,
+            or_(models.ImportJob.expires_at.is_(None), models.ImportJob.expires_at > datetime.utcnow()),
+        )
+        .first()
+    )
+
+
+def _eta_seconds(job: models.ImportJob) -> float | None:
+    if job.status != "running" or not job.processed_rows or not job.started_at:
+        return None
+    elapsed = (datetime.utcnow() - job.started_at).total_seconds()
+    remaining = max(job.total_rows - job.processed_rows, 0)
+    return round(elapsed / job.processed_rows * remaining, 1)
+
+
+def to_status(job: models.ImportJob) -> schemas.ImportJobStatus:
+    return schemas.ImportJobStatus(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        total_rows=job.total_rows,
+        processed_rows=job.processed_rows,
+        error_count=job.error_count,
+        errors=json.loads(job.errors) if job.errors else [],
+        error=job.error,
+        eta_seconds=_eta_seconds(job),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result_available=job.result is not None,
+    )
+
+
+def load_result(job: models.ImportJob) -> dict | None:
+    """Resultado completo guardado (previsualización o ``ExcelImportResult``)"""
+    return json.loads(job.result) if job.result is not None else None
+
+
+def fail_stale_import_jobs(db: Session, dry_run: bool = False) -> int:
+    """Marca como fallidos los jobs sin terminar más antiguos que ``IMPORT_JOB_STALE_SECONDS``"""
+    now = datetime.utcnow()
+    query = db.query(models.ImportJob).filter(
+        models.ImportJob.status.in_(["pending", "running"]),
+        models.ImportJob.created_at <= now - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS),
+    )
+    count = query.count()
+    if not dry_run and count:
+        query.update(
+            {
+                "status": "failed",
+                "error": "La importación se interrumpió antes de terminar",
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=settings.IMPORT_JOB_TTL_SECONDS),
+            },
+            synchronize_session=False,
+        )
+        db.commit()
+    return count
+
+
+def purge_import_jobs(db: Session, dry_run: bool = False) -> int:
+    """
+    Elimina los jobs cuya retención venció; retorna cuántos había. Antes da por
+    fallidos los interrumpidos (``fail_stale_import_jobs``) para que también expiren.
+    """
+    fail_stale_import_jobs(db, dry_run=dry_run)
+    query = db.query(models.ImportJob).filter(models.ImportJob.expires_at <= datetime.utcnow())
+    count = query.count()
+    if not dry_run and count:
+        query.delete(synchronize_session=False)
+        db.commit()
+    return count
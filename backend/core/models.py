@@ -1,6 +1,18 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Integer, String, Table
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Table,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from backend.core.database import Base
@@ -24,6 +36,8 @@ product_tag_association = Table(
     Base.metadata,
     Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("product_tags.id"), primary_key=True),
+    # La llave primaria (product_id, tag_id) no sirve para filtrar por etiqueta
+    Index("ix_product_tag_association_tag_product", "tag_id", "product_id"),
 )
 
 
@@ -46,12 +60,21 @@ class Product(Base):
     # Tax and SAT fields
     iva_rate = Column(Float, default=0.0)  # 0.0 = exento, 0.16 = 16%
     sat_key = Column(String, nullable=True)  # Clave SAT para facturación electrónica
+    # Texto normalizado (sin acentos, minúsculas) para el motor de búsqueda
+    search_text = Column(String, nullable=True)
+    # Última modificación, para la sincronización incremental de las terminales
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     inventory = relationship("Inventory", uselist=False, back_populates="product", cascade="all, delete")
     suppliers = relationship("SupplierProduct", back_populates="product", cascade="all, delete")
     purchase_order_items = relationship("PurchaseOrderItem", back_populates="product", cascade="all, delete")
     tags = relationship("ProductTag", secondary=product_tag_association, backref="products")
 
+    __table_args__ = (
+        Index("ix_products_tenant_barcode", "tenant_id", "barcode"),
+        Index("ix_products_tenant_updated", "tenant_id", "updated_at", "id"),
+    )
+
 
 class ProductTag(Base):
     __tablename__ = "product_tags"
@@ -62,6 +85,18 @@ class ProductTag(Base):
     color = Column(String, nullable=True)
 
 
+class PricingTier(Base):
+    """Rango de la tabla de márgenes de un tenant (sin rangos se usa la tabla por defecto)"""
+
+    __tablename__ = "pricing_tiers"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True, index=True)
+    max_purchase_price = Column(Float, nullable=True)  # NULL = sin límite (último rango)
+    multiplier = Column(Float, nullable=False)
+    round_to = Column(Float, nullable=True)  # p. ej. 0.5 = múltiplos de $0.50
+    round_mode = Column(String, default="nearest")  # nearest | up
+
+
 class Supplier(Base):
     __tablename__ = "suppliers"
     id = Column(Integer, primary_key=True, index=True)
@@ -89,8 +124,84 @@ class Inventory(Base):
     product_id = Column(ForeignKey("products.id"), primary_key=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
     quantity = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     product = relationship("Product", back_populates="inventory")
 
+    __table_args__ = (Index("ix_inventory_tenant_updated", "tenant_id", "updated_at", "product_id"),)
+
+
+class ProductTombstone(Base):
+    """Producto eliminado; las terminales lo reciben en la sincronización incremental"""
+
+    __tablename__ = "product_tombstones"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    product_id = Column(Integer, nullable=False)
+    barcode = Column(String, nullable=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_product_tombstones_tenant_deleted", "tenant_id", "deleted_at", "id"),)
+
+
+class StockLedgerEntry(Base):
+    """Movimiento de existencia de un producto (sólo se insertan; ``inventory`` es el saldo)"""
+
+    __tablename__ = "stock_ledger"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    product_id = Column(Integer, nullable=False)  # sin FK: el historial sobrevive al producto
+    quantity_change = Column(Integer, nullable=False)  # positivo entra, negativo sale
+    source = Column(String, nullable=False)  # sale, sale_update, sale_delete, import, adjustment
+    reference_id = Column(String, nullable=True)  # p. ej. id de la venta
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_stock_ledger_product_created", "product_id", "created_at", "id"),
+        Index("ix_stock_ledger_tenant_created", "tenant_id", "created_at", "id"),
+    )
+
+
+class StockSnapshot(Base):
+    """Existencia de un producto en un momento; punto de partida de las consultas históricas"""
+
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index("ix_stock_snapshots_product_taken", "product_id", "taken_at"),)
+
+
+class StockDirtyProduct(Base):
+    """Producto con movimientos de inventario o de lotes pendientes de conciliar"""
+
+    __tablename__ = "stock_dirty_products"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    product_id = Column(Integer, nullable=False)
+    marked_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (Index("ix_stock_dirty_products_tenant_product", "tenant_id", "product_id"),)
+
+
+class StockDiscrepancy(Base):
+    """Diferencia encontrada entre inventory.quantity y la existencia de los lotes del producto"""
+
+    __tablename__ = "stock_discrepancies"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    product_id = Column(Integer, nullable=False)
+    inventory_quantity = Column(Integer, nullable=False)
+    batch_quantity = Column(Integer, nullable=False)
+    difference = Column(Integer, nullable=False)  # inventario - lotes
+    corrected = Column(Boolean, default=False)  # el inventario se ajustó a los lotes
+    detected_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (Index("ix_stock_discrepancies_tenant_detected", "tenant_id", "detected_at"),)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -138,6 +249,14 @@ class Sale(Base):
 
     items = relationship("SaleItem", back_populates="sale", cascade="all, delete-orphan")
 
+    # Listados recientes primero y filtros por estado o cliente dentro del rango de fechas
+    __table_args__ = (
+        Index("ix_sales_tenant_date", "tenant_id", "sale_date", "id"),
+        Index("ix_sales_tenant_payment_date", "tenant_id", "payment_status", "sale_date"),
+        Index("ix_sales_tenant_shipping_date", "tenant_id", "shipping_status", "sale_date"),
+        Index("ix_sales_tenant_client_date", "tenant_id", "client_id", "sale_date"),
+    )
+
 
 class SaleItem(Base):
     """Items individuales de una venta - cada producto con su cantidad"""
@@ -157,6 +276,9 @@ class SaleItem(Base):
     sale = relationship("Sale", back_populates="items")
     product = relationship("Product")
 
+    # Carga de items por venta (selectinload, conteo de líneas en el resumen)
+    __table_args__ = (Index("ix_sale_items_sale_id", "sale_id"),)
+
 
 class Client(Base):
     __tablename__ = "clients"
@@ -240,6 +362,26 @@ class ProductBatch(Base):
     supplier = relationship("Supplier")
     stock_movements = relationship("BatchStockMovement", back_populates="batch")
 
+    # Parciales: sólo los lotes con existencia (caducidades por tenant y FEFO por producto)
+    __table_args__ = (
+        Index(
+            "ix_product_batches_tenant_expiry_active",
+            "tenant_id",
+            "expiration_date",
+            "id",
+            postgresql_where=quantity_remaining > 0,
+            sqlite_where=quantity_remaining > 0,
+        ),
+        Index(
+            "ix_product_batches_product_expiry_active",
+            "product_id",
+            "expiration_date",
+            "id",
+            postgresql_where=quantity_remaining > 0,
+            sqlite_where=quantity_remaining > 0,
+        ),
+    )
+
 
 class BatchStockMovement(Base):
     """Movimientos de stock por lote"""
@@ -419,3 +561,45 @@ class AppSettings(Base):
     value = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    """Respuesta guardada de una creación con encabezado ``Idempotency-Key``"""
+
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    scope = Column(String, nullable=False)  # p. ej. "sales.create"
+    key = Column(String, nullable=False)
+    request_hash = Column(String(64), nullable=False)  # sha256 del cuerpo y parámetros
+    status_code = Column(Integer, nullable=True)  # NULL = la petición original sigue en proceso
+    response = Column(String, nullable=True)  # JSON de la respuesta original
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "scope", "key", name="uq_idempotency_keys_tenant_scope_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+
+class ImportJob(Base):
+    """Importación de Excel en segundo plano: estado, progreso y resultado para descargarlo después"""
+
+    __tablename__ = "import_jobs"
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    kind = Column(String, nullable=False)  # preview | import | confirm
+    status = Column(String, nullable=False, default="pending")  # pending | running | completed | failed
+    total_rows = Column(Integer, nullable=False, default=0)
+    processed_rows = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(String, nullable=True)  # JSON con los primeros errores
+    error = Column(String, nullable=True)  # motivo si el job falló
+    result = Column(String, nullable=True)  # JSON del resultado completo
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # se fija al terminar
+
+    __table_args__ = (Index("ix_import_jobs_expires_at", "expires_at"),)
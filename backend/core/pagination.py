@@ -0,0 +1,129 @@
+"""
+Paginación por cursor (keyset) y conteos cacheados.
+
+En lugar de ``OFFSET``, cada página filtra por la llave de orden del último
+registro devuelto (por ejemplo ``(sale_date, id)``), de modo que la página 500
+cuesta lo mismo que la página 1 y el orden es estable aunque se inserten
+registros nuevos mientras se pagina.
+
+El cursor es opaco para el cliente: JSON en base64-url con los valores de la
+llave de orden.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+from backend.core.cache import TenantLRUCache
+
+# Los totales se sirven desde caché: un COUNT exacto por tenant/filtro cada TTL
+COUNT_CACHE_TTL_SECONDS = 60
+_count_cache = TenantLRUCache("counts", maxsize=256, ttl=COUNT_CACHE_TTL_SECONDS)
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no es válido para este listado"""
+
+
+def _to_json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _from_json_value(value, column: InstrumentedAttribute):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values: list) -> str:
+    """Codifica los valores de la llave de orden en un cursor opaco"""
+    payload = json.dumps([_to_json_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: list[InstrumentedAttribute]) -> list:
+    """Decodifica un cursor y convierte sus valores al tipo de cada columna de orden"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(order_by):
+            raise InvalidCursorError("Cursor inválido")
+        return [_from_json_value(value, column) for value, column in zip(values, order_by, strict=True)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Cursor inválido") from e
+
+
+def keyset_filter(order_by: list[InstrumentedAttribute], values: list, descending: bool = False):
+    """
+    Condición "después de ``values``" para el orden lexicográfico de ``order_by``:
+    (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    """
+    clauses = []
+    for i, column in enumerate(order_by):
+        equal_prefix = [order_by[j] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+
+def paginate_by_cursor(
+    query: Query,
+    order_by: list[InstrumentedAttribute],
+    cursor: str | None = None,
+    page_size: int = 50,
+    descending: bool = False,
+    total_estimate: int | None = None,
+) -> dict:
+    """
+    Obtiene una página ordenada por ``order_by`` (la última columna debe ser única, p. ej. ``id``).
+    Retorna un dict compatible con ``schemas.CursorPage``.
+    """
+    if cursor:
+        query = query.filter(keyset_filter(order_by, decode_cursor(cursor, order_by), descending))
+
+    ordering = [column.desc() for column in order_by] if descending else list(order_by)
+    rows = query.order_by(*ordering).limit(page_size + 1).all()
+
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in order_by])
+
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "page_size": page_size,
+        "total_estimate": total_estimate,
+    }
+
+
+def cached_count(query: Query, tenant_id: int | None, key: tuple) -> int:
+    """
+    Total de registros de ``query`` servido desde caché por tenant.
+    ``key`` debe identificar el listado y sus filtros, p. ej. ``("sales", status)``.
+    """
+    total = _count_cache.get(tenant_id, key)
+    if total is None:
+        total = query.order_by(None).count()
+        _count_cache.set(tenant_id, key, total)
+    return total
+
+
+def invalidate_counts(tenant_id: int | None) -> None:
+    """Descarta los totales cacheados de un tenant (tras altas o bajas)"""
+    _count_cache.clear_tenant(tenant_id)
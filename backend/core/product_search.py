@@ -0,0 +1,244 @@
+"""
+Motor de búsqueda de productos.
+
+Cada producto guarda una columna ``search_text`` con nombre, código de barras,
+laboratorio y sustancia activa normalizados (minúsculas, sin acentos). Sobre esa
+columna se monta un índice según el motor de base de datos:
+
+* PostgreSQL: índice GIN con ``pg_trgm`` y ranking por ``similarity()``.
+* SQLite: tabla sombra FTS5 con tokenizador ``trigram`` y ranking ``bm25``.
+* Cualquier otro caso: ``LIKE`` sobre ``search_text`` (sin índice).
+
+El backend se elige al arrancar con ``init_product_search(engine)`` según
+``settings.PRODUCT_SEARCH_BACKEND`` ("auto", "postgres", "sqlite", "like").
+"""
+
+import logging
+import unicodedata
+
+from sqlalchemy import DDL, Float, Integer, bindparam, event, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+
+from backend.core import models
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ("name", "barcode", "laboratory", "active_substance")
+
+# El tokenizador trigram de FTS5 no indexa términos de menos de 3 caracteres
+FTS_MIN_TOKEN_LENGTH = 3
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def normalize_search_text(value: str | None) -> str:
+    """Normaliza texto para búsqueda: minúsculas, sin acentos y espacios colapsados"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_accents = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(without_accents.casefold().split())
+
+
+def build_product_search_text(
+    name: str | None = None,
+    barcode: str | None = None,
+    laboratory: str | None = None,
+    active_substance: str | None = None,
+) -> str:
+    """Construye el valor de ``Product.search_text`` a partir de los campos buscables"""
+    parts = (normalize_search_text(value) for value in (name, barcode, laboratory, active_substance))
+    return " ".join(part for part in parts if part)
+
+
+def _search_tokens(term: str) -> list[str]:
+    return normalize_search_text(term).split()
+
+
+@event.listens_for(models.Product, "before_insert")
+@event.listens_for(models.Product, "before_update")
+def _sync_product_search_text(mapper, connection, target: models.Product) -> None:
+    """Mantiene ``search_text`` sincronizado en cada insert/update hecho vía ORM"""
+    target.search_text = build_product_search_text(*(getattr(target, field) for field in SEARCH_FIELDS))
+
+
+_SQLITE_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        search_text, content='products', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF search_text ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO products_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+)
+
+# En SQLite la tabla sombra se crea/borra junto con ``products`` (create_all/drop_all)
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(models.Product.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    models.Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite")
+)
+
+
+class LikeSearchBackend:
+    """Búsqueda por ``LIKE`` sobre el texto normalizado. No requiere índices especiales."""
+
+    name = "like"
+
+    def install(self, engine: Engine) -> None:
+        pass
+
+    def _filter_tokens(self, query: Query, tokens: list[str]) -> Query:
+        for token in tokens:
+            query = query.filter(models.Product.search_text.contains(token, autoescape=True))
+        return query
+
+    def _match(self, query: Query, tokens: list[str]) -> tuple[Query, list]:
+        """Aplica el filtro de búsqueda y retorna también las expresiones de ranking"""
+        return self._filter_tokens(query, tokens), [models.Product.name]
+
+    def filter(self, query: Query, term: str) -> Query:
+        """Filtra ``query`` por ``term`` sin imponer orden (para paginación por cursor)"""
+        tokens = _search_tokens(term)
+        if not tokens:
+            return query
+        return self._match(query, tokens)[0]
+
+    def apply(self, query: Query, term: str) -> Query:
+        """Filtra ``query`` por ``term`` y la ordena por relevancia"""
+        tokens = _search_tokens(term)
+        if not tokens:
+            return query
+        query, ranking = self._match(query, tokens)
+        return query.order_by(*ranking, models.Product.id)
+
+
+class PostgresTrigramSearchBackend(LikeSearchBackend):
+    """Índice GIN ``gin_trgm_ops``: los ``LIKE '%x%'`` se resuelven con el índice"""
+
+    name = "postgres"
+
+    def install(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_products_search_text_trgm "
+                    "ON products USING gin (search_text gin_trgm_ops)"
+                )
+            )
+
+    def _match(self, query: Query, tokens: list[str]) -> tuple[Query, list]:
+        similarity = func.similarity(models.Product.search_text, " ".join(tokens))
+        return self._filter_tokens(query, tokens), [similarity.desc()]
+
+
+class SqliteFtsSearchBackend(LikeSearchBackend):
+    """Tabla sombra FTS5 (tokenizador trigram) sincronizada con triggers"""
+
+    name = "sqlite"
+
+    def install(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+            ).first()
+            for statement in _SQLITE_FTS_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                # Indexar los productos que ya existían antes de crear la tabla sombra
+                conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+    def _match(self, query: Query, tokens: list[str]) -> tuple[Query, list]:
+        fts_tokens = [token for token in tokens if len(token) >= FTS_MIN_TOKEN_LENGTH]
+        short_tokens = [token for token in tokens if len(token) < FTS_MIN_TOKEN_LENGTH]
+        if not fts_tokens:
+            return super()._match(query, tokens)
+
+        match_expr = " ".join('"{}"'.format(token.replace('"', '""')) for token in fts_tokens)
+        fts = (
+            text("SELECT rowid AS product_id, rank AS score FROM products_fts WHERE products_fts MATCH :match")
+            .bindparams(match=match_expr)
+            .columns(product_id=Integer, score=Float)
+            .subquery("fts")
+        )
+        query = query.join(fts, fts.c.product_id == models.Product.id)
+        return self._filter_tokens(query, short_tokens), [fts.c.score]
+
+
+_BACKENDS = {
+    backend.name: backend for backend in (LikeSearchBackend, PostgresTrigramSearchBackend, SqliteFtsSearchBackend)
+}
+
+_active_backend: LikeSearchBackend = LikeSearchBackend()
+
+
+def get_product_search_backend() -> LikeSearchBackend:
+    """Backend de búsqueda activo (``LikeSearchBackend`` si no se ha inicializado)"""
+    return _active_backend
+
+
+def backfill_search_text(engine: Engine) -> int:
+    """Calcula ``search_text`` para los productos que aún no lo tienen. Retorna cuántos se actualizaron."""
+    products = models.Product.__table__
+    updated = 0
+    with engine.begin() as conn:
+        while True:
+            rows = conn.execute(
+                select(products.c.id, *(products.c[field] for field in SEARCH_FIELDS))
+                .where(products.c.search_text.is_(None))
+                .limit(BACKFILL_CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                products.update().where(products.c.id == bindparam("product_id")),
+                [{"product_id": row.id, "search_text": build_product_search_text(*row[1:])} for row in rows],
+            )
+            updated += len(rows)
+    return updated
+
+
+def init_product_search(engine: Engine) -> LikeSearchBackend:
+    """Selecciona e instala el backend de búsqueda según la configuración y el dialecto"""
+    global _active_backend
+
+    choice = settings.PRODUCT_SEARCH_BACKEND
+    if choice == "auto":
+        choice = {"postgresql": "postgres", "sqlite": "sqlite"}.get(engine.dialect.name, "like")
+
+    backend_cls = _BACKENDS.get(choice)
+    if backend_cls is None:
+        logger.warning(f"Backend de búsqueda desconocido '{choice}', usando 'like'")
+        backend_cls = LikeSearchBackend
+
+    backfilled = backfill_search_text(engine)
+    if backfilled:
+        logger.info(f"search_text calculado para {backfilled} productos existentes")
+
+    backend = backend_cls()
+    try:
+        backend.install(engine)
+    except Exception as e:
+        logger.warning(f"No se pudo instalar el backend de búsqueda '{backend.name}': {e}. Usando 'like'")
+        backend = LikeSearchBackend()
+
+    _active_backend = backend
+    logger.info(f"Backend de búsqueda de productos: {backend.name}")
+    return backend
@@ -0,0 +1,116 @@
+"""
+Recálculo masivo de precios de venta a partir del precio de compra.
+
+1. Una sola consulta trae ``id``, ``purchase_price`` y ``sale_price`` de los
+   productos del alcance (catálogo completo, ids o laboratorio).
+2. Los precios nuevos se calculan de una vez con la tabla de márgenes compilada
+   del tenant (``PricingTable``, arreglos NumPy; la tabla por defecto da el mismo
+   resultado que ``calculate_sale_price``).
+3. Sólo los productos cuyo precio cambia se escriben, con un
+   ``UPDATE ... SET sale_price = CASE id WHEN ... END WHERE id IN (...)`` por bloque.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, select, update
+from sqlalchemy.orm import Session
+
+from backend.core import models, schemas
+from backend.core.crud.crud_pricing import get_pricing_table
+from backend.core.crud.crud_product_bulk import chunked
+from backend.core.crud.crud_products import invalidate_barcode_cache
+from backend.utils.pricing_formula import DEFAULT_PRICING_TABLE, PricingTable, calculate_price_differences
+
+# Productos por UPDATE: tres parámetros por fila (WHEN, THEN e IN), muy por debajo del
+# límite de SQLite (32766) y de PostgreSQL (65535)
+REPRICE_CHUNK_SIZE = 1000
+
+
+def fetch_pricing_rows(
+    db: Session, tenant_id: int = None, product_ids: list[int] | None = None, laboratory: str | None = None
+) -> pd.DataFrame:
+    """Id, código, nombre y precios actuales de los productos del alcance"""
+    product = models.Product
+    query = select(product.id, product.barcode, product.name, product.purchase_price, product.sale_price)
+    if tenant_id:
+        query = query.where(product.tenant_id == tenant_id)
+    if laboratory:
+        query = query.where(product.laboratory == laboratory)
+
+    columns = ["product_id", "barcode", "name", "purchase_price", "sale_price_current"]
+    if product_ids is None:
+        rows = db.execute(query.order_by(product.id)).all()
+    else:
+        rows = []
+        for chunk in chunked(sorted(set(product_ids)), REPRICE_CHUNK_SIZE):
+            rows.extend(db.execute(query.where(product.id.in_(chunk)).order_by(product.id)).all())
+    return pd.DataFrame(rows, columns=columns)
+
+
+def compute_repricing(rows: pd.DataFrame, pricing: PricingTable = DEFAULT_PRICING_TABLE) -> tuple[pd.DataFrame, int]:
+    """
+    Calcula el precio nuevo de cada fila. Retorna (filas cuyo precio cambia, omitidas);
+    se omiten los productos sin precio de compra.
+    """
+    purchase_price = pd.to_numeric(rows["purchase_price"]).to_numpy(dtype=float)
+    priced = ~np.isnan(purchase_price) & (purchase_price > 0)
+    rows = rows[priced].copy()
+    skipped = int((~priced).sum())
+
+    purchase_price = purchase_price[priced]
+    current = pd.to_numeric(rows["sale_price_current"]).to_numpy(dtype=float)
+    new_price = pricing.sale_prices(purchase_price)
+    differences = calculate_price_differences(np.nan_to_num(current), new_price)
+
+    rows["purchase_price"] = purchase_price
+    rows["sale_price_new"] = new_price
+    rows["difference"] = differences["difference"]
+    rows["percentage_change"] = differences["percentage_change"]
+    rows["direction"] = differences["direction"]
+    return rows[np.isnan(current) | (current != new_price)], skipped
+
+
+def apply_sale_prices(db: Session, prices: dict[int, float], tenant_id: int = None) -> None:
+    """Escribe ``{product_id: sale_price}`` con un UPDATE ``CASE`` por bloque (sin commit)"""
+    products = models.Product.__table__
+    for chunk in chunked(list(prices.items()), REPRICE_CHUNK_SIZE):
+        chunk_prices = dict(chunk)
+        statement = (
+            update(products)
+            .where(products.c.id.in_(list(chunk_prices)))
+            .values(sale_price=case(chunk_prices, value=products.c.id))
+        )
+        if tenant_id:
+            statement = statement.where(products.c.tenant_id == tenant_id)
+        db.execute(statement)
+
+
+def reprice_products(
+    db: Session, request: schemas.ProductRepriceRequest, tenant_id: int = None
+) -> schemas.ProductRepriceResult:
+    """
+    Recalcula el precio de venta de los productos del alcance con la tabla de márgenes.
+    Con ``dry_run`` sólo retorna la diferencia; si no, la aplica en una transacción.
+    """
+    rows = fetch_pricing_rows(db, tenant_id, request.product_ids, request.laboratory)
+    changed, skipped = compute_repricing(rows, get_pricing_table(db, tenant_id))
+
+    if not request.dry_run and len(changed):
+        apply_sale_prices(
+            db,
+            dict(zip(changed["product_id"].tolist(), changed["sale_price_new"].tolist(), strict=True)),
+            tenant_id,
+        )
+        db.commit()
+        # El caché de escaneo guarda el producto completo (con precio); el índice no cambia
+        invalidate_barcode_cache(tenant_id, changed["barcode"].tolist())
+
+    items = changed.astype(object).where(changed.notna(), None).to_dict("records")
+    return schemas.ProductRepriceResult(
+        dry_run=request.dry_run,
+        total_products=len(rows),
+        changed=len(changed),
+        unchanged=len(rows) - len(changed) - skipped,
+        skipped=skipped,
+        items=items,
+    )
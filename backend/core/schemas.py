@@ -1,8 +1,10 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import Generic, Optional, TypeVar
 
 from pydantic import BaseModel, EmailStr
 
+T = TypeVar("T")
+
 # Inventory Schemas
 
 
@@ -25,6 +27,48 @@ class Inventory(InventoryBase):
         from_attributes = True
 
 
+class StockLedgerEntry(BaseModel):
+    id: int
+    product_id: int
+    quantity_change: int
+    source: str
+    reference_id: str | None = None
+    user_id: int | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class StockValuationItem(BaseModel):
+    product_id: int
+    quantity: int
+    value: float
+
+
+class StockValuation(BaseModel):
+    """Existencia y valor del inventario a una fecha"""
+
+    as_of: datetime
+    total_value: float
+    items: list[StockValuationItem]
+
+
+class StockDiscrepancy(BaseModel):
+    """Diferencia entre el inventario y la existencia de los lotes de un medicamento"""
+
+    id: int
+    product_id: int
+    inventory_quantity: int
+    batch_quantity: int
+    difference: int
+    corrected: bool
+    detected_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 # Tag Schemas
 
 
@@ -71,6 +115,7 @@ class ProductBase(BaseModel):
 
 
 class ProductCreate(ProductBase):
+    sale_price: float | None = None  # None = precio sugerido por la tabla de márgenes del tenant
     tags: list[int] | None = []
     inventory: InventoryCreate | None = None
 
@@ -89,6 +134,26 @@ class Product(ProductBase):
         from_attributes = True
 
 
+class TagFacet(BaseModel):
+    id: int
+    name: str | None = None
+    count: int
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class ProductFacets(BaseModel):
+    """Conteos para la barra de filtros (todo el catálogo del tenant, cacheados)"""
+
+    tags: list[TagFacet]
+    laboratories: list[FacetCount]
+    in_stock: int
+    out_of_stock: int
+
+
 class ProductPaginatedResponse(BaseModel):
     """Schema para respuesta paginada de productos"""
 
@@ -97,11 +162,136 @@ class ProductPaginatedResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    facets: ProductFacets | None = None
 
     class Config:
         from_attributes = True
 
 
+class ProductBulkResult(BaseModel):
+    """Resultado de un alta/actualización masiva de productos"""
+
+    created: int
+    updated: int
+    errors: list[dict]  # {"index", "barcode", "error"}
+    total_processed: int
+
+
+# Pricing Schemas
+
+
+class PricingTierBase(BaseModel):
+    """Rango de la tabla de márgenes"""
+
+    max_purchase_price: float | None = None  # None = sin límite (último rango)
+    multiplier: float  # 1.6 = 60% de margen
+    round_to: float | None = None  # p. ej. 0.5 redondea a múltiplos de $0.50
+    round_mode: str = "nearest"  # nearest | up
+
+
+class PricingTier(PricingTierBase):
+    label: str
+
+    class Config:
+        from_attributes = True
+
+
+class PricingTableUpdate(BaseModel):
+    """Tabla de márgenes completa, ordenada por límite"""
+
+    tiers: list[PricingTierBase]
+
+
+class PricingTableResponse(BaseModel):
+    tiers: list[PricingTier]
+    is_default: bool  # el tenant no tiene tabla propia
+
+
+class PriceSuggestion(BaseModel):
+    purchase_price: float
+    sale_price: float
+    price_range: str
+
+
+class ProductRepriceRequest(BaseModel):
+    """Alcance del recálculo masivo de precios de venta"""
+
+    product_ids: list[int] | None = None  # None = todo el catálogo del tenant
+    laboratory: str | None = None
+    dry_run: bool = True  # sólo calcular la diferencia, sin guardar
+
+
+class ProductRepriceItem(BaseModel):
+    """Producto cuyo precio de venta cambia con el recálculo"""
+
+    product_id: int
+    barcode: str | None = None
+    name: str | None = None
+    purchase_price: float
+    sale_price_current: float | None = None
+    sale_price_new: float
+    difference: float
+    percentage_change: float
+    direction: str  # up | down | new
+
+
+class ProductRepriceResult(BaseModel):
+    """Resultado (o previsualización con ``dry_run``) del recálculo de precios"""
+
+    dry_run: bool
+    total_products: int
+    changed: int
+    unchanged: int
+    skipped: int  # sin precio de compra
+    items: list[ProductRepriceItem]
+
+
+class InventoryChange(BaseModel):
+    """Existencia modificada de un producto"""
+
+    product_id: int
+    quantity: int | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class ProductChanges(BaseModel):
+    """
+    Cambios del catálogo desde el último ``next_since`` de la terminal.
+    Se aplican primero ``deleted`` y después ``products`` e ``inventory``;
+    con ``reset`` la terminal descarta su catálogo local antes de aplicarlos.
+    Cada sincronización repite los cambios de la ventana de seguridad anterior:
+    se aplican por id (un producto o eliminación repetidos no tienen efecto).
+    """
+
+    products: list[Product]
+    inventory: list[InventoryChange]
+    deleted: list[int]  # ids de productos eliminados
+    next_since: str  # token para la siguiente sincronización
+    has_more: bool = False  # pedir de nuevo con ``next_since`` hasta que sea False
+    reset: bool = False
+
+
+class BarcodeCandidate(BaseModel):
+    """Candidato de búsqueda parcial por código de barras"""
+
+    product_id: int
+    barcode: str
+    name: str
+    match: str  # exact | prefix | suffix | contains
+
+
+class CursorPage(BaseModel, Generic[T]):
+    """Página de un listado paginado por cursor (keyset)"""
+
+    items: list[T]
+    next_cursor: str | None = None  # None cuando no hay más páginas
+    has_more: bool = False
+    page_size: int
+    total_estimate: int | None = None  # Total cacheado, puede estar desfasado unos segundos
+
+
 # Supplier Schemas
 
 
@@ -360,6 +550,57 @@ class Sale(SaleBase):
         from_attributes = True
 
 
+class SaleFilters(BaseModel):
+    """Filtros del listado de ventas (``date_to`` incluye el día completo)"""
+
+    date_from: date | None = None
+    date_to: date | None = None
+    shipping_status: str | None = None
+    payment_status: str | None = None
+    document_type: str | None = None
+    client_id: int | None = None
+    notes: str | None = None  # texto contenido en las notas
+
+
+class SaleSummary(BaseModel):
+    """Fila del listado de ventas: sin items, con nombre del cliente y número de líneas"""
+
+    id: int
+    sale_date: datetime
+    client_id: int
+    client_name: str | None = None
+    user_id: int
+    document_type: str
+    subtotal: float
+    iva_amount: float
+    total: float
+    shipping_status: str
+    payment_status: str
+    payment_method: str | None = None
+    item_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class SaleBatchItemResult(BaseModel):
+    """Resultado de una venta del lote (``index`` = posición en la petición)"""
+
+    index: int
+    sale_id: int | None = None
+    total: float | None = None
+    error: str | None = None
+    issues: list[dict] = []  # {"product_id", "requested", "available", "shortage", ...}
+
+
+class SaleBatchResult(BaseModel):
+    """Resultado de la ingesta masiva de ventas"""
+
+    created: int
+    failed: int
+    results: list[SaleBatchItemResult]
+
+
 class SaleWithInvoice(Sale):
     """Sale with optional invoice - use only when invoice data is needed"""
 
@@ -651,6 +892,30 @@ class BatchStockMovement(BatchStockMovementBase):
         from_attributes = True
 
 
+class BatchValuationGroup(BaseModel):
+    """Valuación de lotes con existencia por producto, proveedor o rango de caducidad"""
+
+    key: int | str | None = None
+    name: str | None = None
+    batch_count: int
+    total_quantity: int
+    total_value: float
+
+
+class ExpiringBatch(BaseModel):
+    """Lote próximo a caducar con el nombre del medicamento y el valor de su existencia"""
+
+    id: int
+    product_id: int
+    product_name: str
+    batch_number: str
+    expiration_date: date
+    quantity_remaining: int
+    unit_cost: float | None = None
+    stock_value: float
+    days_until_expiry: int
+
+
 class InvoiceBase(BaseModel):
     serie: str = "A"
     folio: str | None = None
@@ -760,6 +1025,24 @@ class ExcelImportResult(BaseModel):
     total_processed: int
 
 
+class ImportJobStatus(BaseModel):
+    """Estado de una importación de Excel en segundo plano"""
+
+    id: str
+    kind: str  # preview | import | confirm
+    status: str  # pending | running | completed | failed
+    total_rows: int
+    processed_rows: int
+    error_count: int
+    errors: list[dict]  # primeros errores; el resultado trae la lista completa
+    error: str | None = None  # motivo si el job falló
+    eta_seconds: float | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result_available: bool = False
+
+
 # Rebuild models for forward references
 Sale.model_rebuild()
 SaleWithInvoice.model_rebuild()
@@ -6,6 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from backend.core.database import Base, engine
 from backend.core.logging_config import setup_logging
 from backend.core.middleware import AuditMiddleware, RequestLoggingMiddleware, SystemHealthMiddleware
+from backend.core.product_search import init_product_search
 from backend.init_db import init_db
 from backend.routers import (
     alerts,
@@ -16,6 +17,7 @@ from backend.routers import (
     expenses,
     invoices,
     onboarding,
+    pricing,
     product_tags,
     products,
     purchase_order,
@@ -36,6 +38,9 @@ Base.metadata.create_all(bind=engine)
 
 init_db()
 
+# Índices de búsqueda de productos (pg_trgm / FTS5)
+init_product_search(engine)
+
 # Crear la aplicación FastAPI
 app = FastAPI(title="VanPOS API", description="API para gestión de productos e inventario", version="1.0.0")
 
@@ -65,6 +70,7 @@ app.include_router(financial_reports.router, prefix="/api/v1/financial-reports",
 app.include_router(batches.router, prefix="/api/v1/batches", tags=["batches"])
 app.include_router(auth.router, prefix="/api/v1", tags=["authentication"])
 app.include_router(product_tags.router, prefix="/api/v1", tags=["product-tags"])
+app.include_router(pricing.router, prefix="/api/v1", tags=["pricing"])
 app.include_router(purchase_order.router, prefix="/api/v1", tags=["purchase-orders"])
 app.include_router(alerts.router, prefix="/api/v1/alerts", tags=["alerts"])
 app.include_router(invoices.router, prefix="/api/v1/invoices", tags=["invoices"])
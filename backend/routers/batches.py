@@ -1,4 +1,5 @@
 from datetime import date
+from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
@@ -8,25 +9,40 @@ from backend.core.crud.crud_batches import (
     delete_product_batch,
     get_batch_inventory_summary,
     get_batch_movements,
+    get_batch_valuation,
     get_batches_by_product,
     get_expiring_batches,
+    get_expiring_batches_by_cursor,
     get_product_batch,
     get_product_batches,
     update_product_batch,
     validate_batch_expiration,
 )
 from backend.core.database import get_db
-from backend.core.schemas import BatchStockMovement, ProductBatch, ProductBatchCreate, ProductBatchUpdate
+from backend.core.dependencies import get_tenant_id
+from backend.core.pagination import InvalidCursorError
+from backend.core.schemas import (
+    BatchStockMovement,
+    BatchValuationGroup,
+    CursorPage,
+    ExpiringBatch,
+    ProductBatch,
+    ProductBatchCreate,
+    ProductBatchUpdate,
+)
 
 router = APIRouter()
 
 
 @router.post("/", response_model=ProductBatch)
 def create_batch(
-    batch: ProductBatchCreate, user_id: int = Query(..., description="User ID"), db: Session = Depends(get_db)
+    batch: ProductBatchCreate,
+    user_id: int = Query(..., description="User ID"),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
 ):
     """Crear un nuevo lote de medicamento"""
-    return create_product_batch(db, batch, user_id)
+    return create_product_batch(db, batch, user_id, tenant_id=tenant_id)
 
 
 @router.get("/", response_model=list[ProductBatch])
@@ -69,10 +85,12 @@ def delete_batch(batch_id: int, user_id: int = Query(..., description="User ID")
 
 @router.get("/expiring/soon")
 def get_expiring_soon_batches(
-    days_ahead: int = Query(30, description="Days ahead to check"), db: Session = Depends(get_db)
+    days_ahead: int = Query(30, description="Days ahead to check"),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
 ):
     """Obtener lotes próximos a expirar"""
-    batches = get_expiring_batches(db, days_ahead)
+    batches = get_expiring_batches(db, days_ahead, tenant_id=tenant_id)
     return {
         "count": len(batches),
         "batches": [
@@ -89,6 +107,23 @@ def get_expiring_soon_batches(
     }
 
 
+@router.get("/expiring/page", response_model=CursorPage[ExpiringBatch])
+def get_expiring_batches_page(
+    days_ahead: int = Query(30, description="Days ahead to check"),
+    cursor: str | None = Query(None, description="Cursor de la página anterior"),
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Lotes próximos a expirar, paginados por fecha de caducidad"""
+    try:
+        return get_expiring_batches_by_cursor(
+            db, tenant_id=tenant_id, days_ahead=days_ahead, cursor=cursor, page_size=page_size
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/product/{product_id}/batches")
 def get_product_batches_list(product_id: int, db: Session = Depends(get_db)):
     """Obtener lotes disponibles para un medicamento"""
@@ -112,9 +147,19 @@ def get_product_batches_list(product_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/inventory/summary")
-def get_inventory_summary(db: Session = Depends(get_db)):
+def get_inventory_summary(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
     """Obtener resumen de inventario por lotes"""
-    return get_batch_inventory_summary(db)
+    return get_batch_inventory_summary(db, tenant_id=tenant_id)
+
+
+@router.get("/inventory/valuation", response_model=list[BatchValuationGroup])
+def get_inventory_valuation(
+    group_by: Literal["product", "supplier", "expiry"] = "product",
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Valuación de lotes con existencia por medicamento, proveedor o rango de caducidad"""
+    return get_batch_valuation(db, tenant_id=tenant_id, group_by=group_by)
 
 
 @router.get("/{batch_id}/validate")
@@ -2,12 +2,13 @@
 Clients router with multi-tenant support.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from backend.core import models, schemas
 from backend.core.dependencies import get_db, get_tenant_id
+from backend.core.pagination import InvalidCursorError, cached_count, invalidate_counts, paginate_by_cursor
 
 router = APIRouter(
     prefix="/clients",
@@ -45,6 +46,21 @@ def read_clients(
     return db.query(models.Client).filter(models.Client.tenant_id == tenant_id).offset(skip).limit(limit).all()
 
 
+@router.get("/cursor", response_model=schemas.CursorPage[schemas.Client])
+def read_clients_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    query = db.query(models.Client).filter(models.Client.tenant_id == tenant_id)
+    total = cached_count(query, tenant_id, ("clients",))
+    try:
+        return paginate_by_cursor(query, [models.Client.id], cursor, page_size, total_estimate=total)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/", response_model=schemas.Client)
 def create_client(client: schemas.ClientCreate, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
     existing = (
@@ -57,6 +73,7 @@ def create_client(client: schemas.ClientCreate, db: Session = Depends(get_db), t
     db.add(db_client)
     db.commit()
     db.refresh(db_client)
+    invalidate_counts(tenant_id)
     return db_client
 
 
@@ -93,6 +110,7 @@ def delete_client(client_id: int, db: Session = Depends(get_db), tenant_id: int
         raise HTTPException(status_code=404, detail="Client not found")
     db.delete(client)
     db.commit()
+    invalidate_counts(tenant_id)
     return client
 
 
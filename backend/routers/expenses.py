@@ -2,12 +2,15 @@
 Expenses router with multi-tenant support.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from backend.core import models
 from backend.core.dependencies import get_db, get_tenant_id
+from backend.core.idempotency import idempotency_key_header, run_idempotent
+from backend.core.pagination import InvalidCursorError, cached_count, invalidate_counts, paginate_by_cursor
 from backend.core.schemas import (
+    CursorPage,
     Expense,
     ExpenseCategory,
     ExpenseCategoryCreate,
@@ -32,19 +35,51 @@ def read_expenses(
     return db.query(models.Expense).filter(models.Expense.tenant_id == tenant_id).offset(skip).limit(limit).all()
 
 
+@router.get("/cursor", response_model=CursorPage[Expense])
+def read_expenses_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Gastos más recientes primero, paginados por (expense_date, id)"""
+    query = db.query(models.Expense).filter(models.Expense.tenant_id == tenant_id)
+    total = cached_count(query, tenant_id, ("expenses",))
+    try:
+        return paginate_by_cursor(
+            query,
+            [models.Expense.expense_date, models.Expense.id],
+            cursor,
+            page_size,
+            descending=True,
+            total_estimate=total,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/", response_model=Expense)
 def create_expense(
-    expense: ExpenseCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+    expense: ExpenseCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    idempotency_key: str | None = Depends(idempotency_key_header),
 ):
     tenant_id = current_user.tenant_id
     if not tenant_id:
         raise HTTPException(status_code=403, detail="User not associated with a tenant")
 
-    db_expense = models.Expense(tenant_id=tenant_id, created_by=current_user.id, **expense.model_dump())
-    db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    def create():
+        db_expense = models.Expense(
+            tenant_id=tenant_id, created_by=current_user.id, **expense.model_dump(exclude={"created_by"})
+        )
+        db.add(db_expense)
+        db.commit()
+        db.refresh(db_expense)
+        invalidate_counts(tenant_id)
+        return db_expense
+
+    return run_idempotent(db, tenant_id, "expenses.create", idempotency_key, expense, create, Expense)
 
 
 @router.get("/summary")
@@ -98,6 +133,7 @@ def delete_expense(expense_id: int, db: Session = Depends(get_db), tenant_id: in
         raise HTTPException(status_code=404, detail="Expense not found")
     db.delete(expense)
     db.commit()
+    invalidate_counts(tenant_id)
     return {"message": "Expense deleted successfully"}
 
 
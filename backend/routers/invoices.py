@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from backend.core import models
 from backend.core.dependencies import get_db
+from backend.core.idempotency import idempotency_key_header, run_idempotent
 from backend.core.schemas import Invoice, InvoiceCreate, InvoiceUpdate
 from backend.core.security import get_current_user
 
@@ -96,8 +97,21 @@ def create_invoice_from_sale(
     payment_method: str = "PUE",
     db: Session = Depends(get_db),
     tenant_id: int = Depends(get_tenant_id),
+    idempotency_key: str | None = Depends(idempotency_key_header),
 ):
-    """Create invoice from existing sale"""
+    """Create invoice from existing sale; a retry with the same ``Idempotency-Key`` returns the original invoice"""
+    return run_idempotent(
+        db,
+        tenant_id,
+        "invoices.from_sale",
+        idempotency_key,
+        (sale_id, payment_form, payment_method),
+        lambda: _create_invoice_from_sale(db, sale_id, payment_form, payment_method, tenant_id),
+        Invoice,
+    )
+
+
+def _create_invoice_from_sale(db: Session, sale_id: int, payment_form: str, payment_method: str, tenant_id: int):
     sale = db.query(models.Sale).filter(models.Sale.id == sale_id, models.Sale.tenant_id == tenant_id).first()
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
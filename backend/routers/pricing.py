@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from backend.core import schemas
+from backend.core.crud import crud_pricing
+from backend.core.dependencies import get_db, get_tenant_id
+
+router = APIRouter(
+    prefix="/pricing",
+    tags=["pricing"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def _table_response(db: Session, tenant_id: int) -> dict:
+    table = crud_pricing.get_pricing_table(db, tenant_id)
+    return {
+        "tiers": crud_pricing.describe_pricing_table(table),
+        "is_default": table is crud_pricing.DEFAULT_PRICING_TABLE,
+    }
+
+
+@router.get("/tiers", response_model=schemas.PricingTableResponse)
+def read_pricing_tiers(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+    """Tabla de márgenes vigente del tenant (la tabla por defecto si no tiene una propia)"""
+    return _table_response(db, tenant_id)
+
+
+@router.put("/tiers", response_model=schemas.PricingTableResponse)
+def update_pricing_tiers(
+    table: schemas.PricingTableUpdate, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+):
+    """Reemplazar la tabla de márgenes del tenant: rangos con límite creciente y el último sin límite"""
+    try:
+        crud_pricing.replace_pricing_tiers(db, table.tiers, tenant_id=tenant_id)
+    except crud_pricing.InvalidPricingTableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _table_response(db, tenant_id)
+
+
+@router.delete("/tiers", response_model=schemas.PricingTableResponse)
+def reset_pricing_tiers(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+    """Volver a la tabla de márgenes por defecto"""
+    crud_pricing.reset_pricing_tiers(db, tenant_id=tenant_id)
+    return _table_response(db, tenant_id)
+
+
+@router.get("/suggest", response_model=schemas.PriceSuggestion)
+def suggest_sale_price(
+    purchase_price: float = Query(..., ge=0), db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+):
+    """Precio de venta sugerido para un precio de compra"""
+    table = crud_pricing.get_pricing_table(db, tenant_id)
+    return {
+        "purchase_price": purchase_price,
+        "sale_price": table.sale_price(purchase_price),
+        "price_range": table.price_range(purchase_price),
+    }
@@ -1,18 +1,26 @@
-import io
 from datetime import datetime
+from typing import Any, Literal
 
-import pandas as pd
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Body, Depends, File, Form, HTTPException, Query, UploadFile
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-
-from backend.core import models, schemas
-from backend.core.crud import crud_products
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from backend.core import import_jobs, repricing, schemas
+from backend.core.catalog_export import EXPORT_EXTENSIONS, EXPORT_MEDIA_TYPES, stream_catalog
+from backend.core.crud import (
+    crud_product_bulk,
+    crud_product_sync,
+    crud_products,
+    crud_stock_ledger,
+    crud_stock_reconciliation,
+)
 
 # Importaciones del proyecto
 from backend.core.dependencies import get_db, get_tenant_id
-from backend.core.schemas import ExcelImportConfirmItem, ExcelImportItem, ExcelImportPreviewResponse, ExcelImportResult
-from backend.utils.pricing_formula import calculate_price_difference, calculate_sale_price
+from backend.core.excel_import import build_import_preview, confirm_import, read_import_sheet
+from backend.core.pagination import InvalidCursorError
+from backend.core.schemas import ExcelImportConfirmItem, ExcelImportPreviewResponse, ExcelImportResult
 
 router = APIRouter(
     prefix="/products",
@@ -26,40 +34,21 @@ router = APIRouter(
 # ============================================================================
 
 
-@router.get("/export/excel")
-async def export_products_to_excel(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+@router.get("/export/{export_format}")
+def export_products(
+    export_format: Literal["excel", "csv", "ndjson"],
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
     """
-    Exporta la lista completa de medicamentos a Excel para compartir con clientes.
+    Exporta la lista completa de medicamentos (Excel, CSV o NDJSON) para compartir con clientes.
+    El archivo se genera y envía en streaming, sin cargar el catálogo completo en memoria,
+    con una sesión propia: la de la petición puede cerrarse antes de terminar la respuesta.
     """
-    # Obtener todos los medicamentos del tenant
-    products = db.query(models.Product).filter(models.Product.tenant_id == tenant_id).all()
-
-    # Crear DataFrame con las columnas para clientes
-    data = []
-    for med in products:
-        iva_text = "16%" if med.iva_rate and med.iva_rate > 0 else "Exento"
-        data.append(
-            {
-                "CODIGO DE BARRAS": med.barcode or "",
-                "NOMBRE": med.name,
-                "INGREDIENTE ACTIVO": med.active_substance or "",
-                "LABORATORIO": med.laboratory or "",
-                "PRECIO": round(med.sale_price, 2) if med.sale_price else 0,
-                "IVA": iva_text,
-            }
-        )
-
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Catálogo de Medicamentos")
-
-    output.seek(0)
-    filename = f"Catalogo_Medicamentos_{datetime.now().strftime('%Y%m%d')}.xlsx"
-
+    filename = f"Catalogo_Medicamentos_{datetime.now().strftime('%Y%m%d')}.{EXPORT_EXTENSIONS[export_format]}"
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        stream_catalog(export_format, tenant_id, _job_session_factory(db)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
@@ -75,10 +64,41 @@ def search_products_by_barcode(
 ):
     """Buscar medicamentos por código de barras"""
     if len(barcode) < 3:
-        product = crud_products.get_product_by_barcode(db, barcode=barcode, tenant_id=tenant_id)
+        product = crud_products.resolve_barcode(db, barcode=barcode, tenant_id=tenant_id)
         return [product] if product else []
-    else:
-        return crud_products.search_products_by_barcode(db, barcode=barcode, tenant_id=tenant_id)
+    # Coincidencias parciales ordenadas: la exacta, si existe, va primero
+    return crud_products.search_products_by_barcode(db, barcode=barcode, tenant_id=tenant_id)
+
+
+@router.get("/search/barcode/scan", response_model=schemas.Product)
+def scan_product_barcode(
+    barcode: str = Query(..., min_length=1), db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+):
+    """Resolver un código escaneado en el punto de venta; se sirve desde el caché sin ir a la base de datos"""
+    product = crud_products.resolve_barcode(db, barcode=barcode, tenant_id=tenant_id)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Medicamento no encontrado")
+    return product
+
+
+@router.get("/search/barcode/candidates", response_model=list[schemas.BarcodeCandidate])
+def search_barcode_candidates(
+    barcode: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Candidatos por código de barras parcial, ordenados: exacto, prefijo, sufijo y contiene"""
+    return [
+        candidate._asdict()
+        for candidate in crud_products.search_barcode_candidates(db, barcode=barcode, tenant_id=tenant_id, limit=limit)
+    ]
+
+
+@router.get("/search/barcode/cache-stats")
+def get_barcode_cache_stats(tenant_id: int = Depends(get_tenant_id)):
+    """Contadores de aciertos/fallos del caché de códigos de barras (por worker)"""
+    return crud_products.get_barcode_cache_stats(tenant_id)
 
 
 @router.get("/search/", response_model=list[schemas.Product])
@@ -99,131 +119,87 @@ async def preview_excel_import(
     file: UploadFile = File(...), db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
 ):
     """Previsualiza la importación del Excel antes de confirmar."""
-    try:
-        if not file.filename.endswith((".xlsx", ".xls")):
-            raise HTTPException(status_code=400, detail="Solo se aceptan archivos Excel")
+    if not file.filename.endswith((".xlsx", ".xls")):
+        raise HTTPException(status_code=400, detail="Solo se aceptan archivos Excel")
 
+    try:
         contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        df.columns = df.columns.str.strip().str.upper()
-
-        column_mappings = {
-            "CODIGO DE BARRAS": ["CODIGO DE BARRAS", "BARCODE", "CODIGO"],
-            "DESCRIPCION": ["DESCRIPCION", "NOMBRE", "PRODUCTO"],
-            "DELTA": ["DELTA", "COSTO", "PRECIO"],
-            "IVA": ["IVA", "TAX"],
-            "INV": ["INV", "STOCK", "CANTIDAD"],
-            "LABORATORIO": ["LABORATORIO", "LAB", "FABRICANTE"],
-        }
-
-        def find_column(target_col):
-            for possible in column_mappings.get(target_col, [target_col]):
-                if possible in df.columns:
-                    return possible
-            return None
-
-        barcode_col = find_column("CODIGO DE BARRAS")
-        desc_col = find_column("DESCRIPCION")
-        delta_col = find_column("DELTA")
-
-        if not barcode_col or not desc_col or not delta_col:
-            raise HTTPException(status_code=400, detail="Faltan columnas requeridas en el Excel")
-
-        preview_items = []
-        new_count = 0
-        existing_count = 0
-        price_changes = 0
-
-        for idx, row in df.iterrows():
-            barcode = str(row.get(barcode_col, "")).strip()
-            if not barcode or barcode == "nan":
-                continue
-
-            name = str(row.get(desc_col, "")).strip()
-            purchase_price_new = float(str(row.get(delta_col, 0)).replace("$", "").replace(",", ""))
-
-            existing_product = crud_products.get_product_by_barcode(db, barcode=barcode, tenant_id=tenant_id)
-
-            suggested_price = calculate_sale_price(purchase_price_new)
-            price_change = "new"
-            price_diff = None
-
-            if existing_product:
-                existing_count += 1
-                price_diff = calculate_price_difference(existing_product.purchase_price or 0, purchase_price_new)
-                price_change = price_diff["direction"]
-                if price_change in ["up", "down"]:
-                    price_changes += 1
-            else:
-                new_count += 1
-
-            preview_items.append(
-                ExcelImportItem(
-                    barcode=barcode,
-                    name=name,
-                    purchase_price_new=purchase_price_new,
-                    purchase_price_old=existing_product.purchase_price if existing_product else None,
-                    sale_price_suggested=suggested_price,
-                    sale_price_current=existing_product.sale_price if existing_product else None,
-                    price_change=price_change,
-                    exists=existing_product is not None,
-                    price_difference=price_diff,
-                )
-            )
-
-        return ExcelImportPreviewResponse(
-            items=preview_items,
-            total_items=len(preview_items),
-            new_products=new_count,
-            existing_products=existing_count,
-            price_changes=price_changes,
-        )
+        # pandas y la base de datos bloquean: se ejecutan fuera del event loop
+        sheet = await run_in_threadpool(read_import_sheet, contents)
+        return await run_in_threadpool(build_import_preview, db, sheet, tenant_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/import-excel/confirm", response_model=ExcelImportResult)
-async def confirm_excel_import(
+def confirm_excel_import(
     items: list[ExcelImportConfirmItem], db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
 ):
     """Confirma la importación con los precios ajustados por el usuario."""
-    results = {"created": 0, "updated": 0, "errors": []}
-
-    for item in items:
-        try:
-            existing_product = crud_products.get_product_by_barcode(db, barcode=item.barcode, tenant_id=tenant_id)
-
-            if existing_product:
-                existing_product.name = item.name
-                existing_product.purchase_price = item.purchase_price
-                existing_product.sale_price = item.sale_price
-                existing_product.iva_rate = item.iva_rate
-                db.commit()
-                results["updated"] += 1
-            else:
-                new_product = models.Product(
-                    tenant_id=tenant_id,
-                    name=item.name,
-                    barcode=item.barcode,
-                    purchase_price=item.purchase_price,
-                    sale_price=item.sale_price,
-                    iva_rate=item.iva_rate,
-                )
-                db.add(new_product)
-                db.flush()
-                inventory = models.Inventory(product_id=new_product.id, tenant_id=tenant_id, quantity=0)
-                db.add(inventory)
-                db.commit()
-                results["created"] += 1
-        except Exception as e:
-            db.rollback()
-            results["errors"].append({"barcode": item.barcode, "error": str(e)})
-
-    return ExcelImportResult(
-        created=results["created"], updated=results["updated"], errors=results["errors"], total_processed=len(items)
+    return confirm_import(db, items, tenant_id=tenant_id)
+
+
+# ============================================================================
+# IMPORTACIONES EN SEGUNDO PLANO
+# ============================================================================
+
+
+def _job_session_factory(db: Session) -> sessionmaker:
+    """Sesiones propias (jobs en segundo plano, exportaciones), sobre la misma base de datos que la petición"""
+    return sessionmaker(bind=db.get_bind(), autocommit=False, autoflush=False)
+
+
+@router.post("/import-jobs", response_model=schemas.ImportJobStatus, status_code=202)
+async def create_import_job(
+    file: UploadFile = File(...),
+    auto_confirm: bool = Form(False),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """
+    Registra la importación de un Excel y la procesa en segundo plano.
+    Sin ``auto_confirm`` el resultado es la previsualización; con ``auto_confirm``
+    se importan las filas con el precio sugerido.
+    """
+    if not file.filename.endswith((".xlsx", ".xls")):
+        raise HTTPException(status_code=400, detail="Solo se aceptan archivos Excel")
+    contents = await file.read()
+    # Registrar el job escribe en la base de datos: fuera del event loop
+    return await run_in_threadpool(
+        import_jobs.submit_excel_job, contents, tenant_id, _job_session_factory(db), auto_confirm=auto_confirm
     )
 
 
+@router.post("/import-jobs/confirm", response_model=schemas.ImportJobStatus, status_code=202)
+def create_import_confirm_job(
+    items: list[ExcelImportConfirmItem], db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+):
+    """Confirma en segundo plano una importación con los precios ajustados por el usuario."""
+    return import_jobs.submit_confirm_job(items, tenant_id, _job_session_factory(db))
+
+
+@router.get("/import-jobs/{job_id}", response_model=schemas.ImportJobStatus)
+def read_import_job(job_id: str, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+    """Progreso de una importación: filas procesadas, errores y tiempo estimado restante"""
+    job = import_jobs.get_import_job(db, job_id, tenant_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return import_jobs.to_status(job)
+
+
+@router.get("/import-jobs/{job_id}/result")
+def read_import_job_result(job_id: str, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+    """Resultado de una importación terminada (previsualización o ``ExcelImportResult``)"""
+    job = import_jobs.get_import_job(db, job_id, tenant_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    if job.status == "failed":
+        raise HTTPException(status_code=400, detail=job.error)
+    if job.result is None:
+        raise HTTPException(status_code=409, detail="La importación aún está en proceso")
+    return import_jobs.load_result(job)
+
+
 # ============================================================================
 # ENDPOINTS CRUD BÁSICOS
 # ============================================================================
@@ -235,12 +211,103 @@ def read_products_paginated(
     page_size: int = 50,
     search: str = None,
     stock_filter: str = "all",
+    tag_ids: list[int] | None = Query(None),
+    tag_match: Literal["any", "all"] = "any",
+    include_facets: bool = False,
     db: Session = Depends(get_db),
     tenant_id: int = Depends(get_tenant_id),
 ):
-    """Obtener lista de medicamentos con paginación"""
+    """
+    Obtener lista de medicamentos con paginación. ``tag_ids`` filtra por etiquetas
+    (cualquiera o todas según ``tag_match``); ``include_facets`` agrega los conteos
+    por etiqueta, laboratorio y existencias para la barra de filtros.
+    """
     return crud_products.get_products_paginated(
-        db, tenant_id=tenant_id, page=page, page_size=page_size, search=search, stock_filter=stock_filter
+        db,
+        tenant_id=tenant_id,
+        page=page,
+        page_size=page_size,
+        search=search,
+        stock_filter=stock_filter,
+        tag_ids=tag_ids,
+        tag_match=tag_match,
+        include_facets=include_facets,
+    )
+
+
+@router.get("/cursor", response_model=schemas.CursorPage[schemas.Product])
+def read_products_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    search: str = None,
+    stock_filter: str = "all",
+    tag_ids: list[int] | None = Query(None),
+    tag_match: Literal["any", "all"] = "any",
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Obtener medicamentos paginados por cursor. Usa ``next_cursor`` para la siguiente página."""
+    try:
+        return crud_products.get_products_by_cursor(
+            db,
+            tenant_id=tenant_id,
+            cursor=cursor,
+            page_size=page_size,
+            search=search,
+            stock_filter=stock_filter,
+            tag_ids=tag_ids,
+            tag_match=tag_match,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/facets", response_model=schemas.ProductFacets)
+def read_product_facets(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
+    """Conteos por etiqueta, laboratorio y existencias para la barra de filtros"""
+    return crud_products.get_product_facets(db, tenant_id=tenant_id)
+
+
+@router.get("/changes", response_model=schemas.ProductChanges)
+def read_product_changes(
+    since: str | None = None,
+    limit: int = Query(crud_product_sync.SYNC_PAGE_SIZE, ge=1, le=2000),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """
+    Sincronización incremental para las terminales: productos, existencias y
+    eliminaciones posteriores a ``since`` (el ``next_since`` de la sincronización
+    anterior). Sin ``since`` devuelve el catálogo completo.
+    """
+    try:
+        return crud_product_sync.get_product_changes(db, tenant_id=tenant_id, since=since, limit=limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/stock/as-of", response_model=schemas.StockValuation)
+def read_stock_as_of(
+    as_of: datetime,
+    product_ids: list[int] | None = Query(None, max_length=crud_product_bulk.IN_CHUNK_SIZE),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Existencias y valor del inventario a una fecha (foto más cercana + movimientos del libro)"""
+    return crud_stock_ledger.get_stock_valuation_as_of(db, as_of, tenant_id=tenant_id, product_ids=product_ids)
+
+
+@router.get("/stock/discrepancies", response_model=list[schemas.StockDiscrepancy])
+def read_stock_discrepancies(
+    product_id: int | None = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Diferencias entre inventario y lotes encontradas por la conciliación"""
+    return crud_stock_reconciliation.get_stock_discrepancies(
+        db, tenant_id=tenant_id, product_id=product_id, skip=skip, limit=limit
     )
 
 
@@ -256,7 +323,9 @@ def read_products(
 def create_product(
     product: schemas.ProductCreate, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
 ):
-    """Crear un nuevo medicamento"""
+    """Crear un nuevo medicamento. Sin ``sale_price`` se usa el precio sugerido por la tabla de márgenes."""
+    if product.sale_price is None and product.purchase_price is None:
+        raise HTTPException(status_code=400, detail="Se requiere precio de venta o de compra")
     if product.barcode:
         existing = crud_products.get_product_by_barcode(db, barcode=product.barcode, tenant_id=tenant_id)
         if existing:
@@ -264,6 +333,30 @@ def create_product(
     return crud_products.create_product(db=db, product=product, tenant_id=tenant_id)
 
 
+@router.post("/bulk", response_model=schemas.ProductBulkResult)
+def bulk_upsert_products(
+    items: list[dict[str, Any]] = Body(..., max_length=50000),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """
+    Crear o actualizar medicamentos en lote (por código de barras) en una sola transacción.
+    Cada elemento tiene la forma de ``ProductCreate``; las filas inválidas se reportan en ``errors``.
+    """
+    return crud_product_bulk.bulk_upsert_products(db, items, tenant_id=tenant_id)
+
+
+@router.post("/reprice", response_model=schemas.ProductRepriceResult)
+def reprice_products(
+    request: schemas.ProductRepriceRequest, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+):
+    """
+    Recalcular precios de venta con la tabla de márgenes tras cambios de costo del proveedor.
+    Con ``dry_run`` (por defecto) sólo devuelve la diferencia sin guardar.
+    """
+    return repricing.reprice_products(db, request, tenant_id=tenant_id)
+
+
 @router.get("/{product_id}", response_model=schemas.Product)
 def read_product(product_id: int, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
     """Obtener un medicamento por ID"""
@@ -273,6 +366,18 @@ def read_product(product_id: int, db: Session = Depends(get_db), tenant_id: int
     return db_product
 
 
+@router.get("/{product_id}/stock-ledger", response_model=list[schemas.StockLedgerEntry])
+def read_product_stock_ledger(
+    product_id: int,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Movimientos de existencia de un medicamento, más recientes primero"""
+    return crud_stock_ledger.get_stock_ledger(db, product_id, tenant_id=tenant_id, skip=skip, limit=limit)
+
+
 @router.put("/{product_id}", response_model=schemas.Product)
 def update_product(
     product_id: int,
@@ -14,6 +14,7 @@ from backend.core.crud.crud_reports import (
     get_top_selling_products,
 )
 from backend.core.database import get_db
+from backend.core.dependencies import get_tenant_id
 
 router = APIRouter()
 
@@ -73,6 +74,6 @@ def read_dashboard_comparison(timeframe: str = "30d", db: Session = Depends(get_
 
 
 @router.get("/fulfillment-stats")
-def read_fulfillment_stats(db: Session = Depends(get_db)):
+def read_fulfillment_stats(db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
     """Get fulfillment alerts and stats"""
-    return get_fulfillment_stats(db)
+    return get_fulfillment_stats(db, tenant_id=tenant_id)
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from backend.core import schemas
-from backend.core.crud import crud_client, crud_products, crud_sale
+from backend.core.crud import crud_client, crud_sale, crud_sale_batch
+from backend.core.crud.crud_stock import InsufficientStockError
 from backend.core.dependencies import get_db, get_tenant_id
+from backend.core.idempotency import idempotency_key_header, run_idempotent
+from backend.core.pagination import InvalidCursorError
 
 router = APIRouter(
     prefix="/sales",
@@ -45,8 +50,21 @@ def create_sale(
     auto_adjust_stock: bool = Query(False),
     db: Session = Depends(get_db),
     tenant_id: int = Depends(get_tenant_id),
+    idempotency_key: str | None = Depends(idempotency_key_header),
 ):
-    """Crea una nueva venta"""
+    """Crea una nueva venta. Con ``Idempotency-Key`` un reintento devuelve la venta original sin repetirla."""
+    return run_idempotent(
+        db,
+        tenant_id,
+        "sales.create",
+        idempotency_key,
+        (sale, auto_adjust_stock),
+        lambda: _create_sale(db, sale, tenant_id, auto_adjust_stock),
+        schemas.Sale,
+    )
+
+
+def _create_sale(db: Session, sale: schemas.SaleCreate, tenant_id: int, auto_adjust_stock: bool):
     # Validar cliente
     db_client = crud_client.get_client(db, client_id=sale.client_id)
     if not db_client or (db_client.tenant_id and db_client.tenant_id != tenant_id):
@@ -55,28 +73,134 @@ def create_sale(
     if not sale.items:
         raise HTTPException(status_code=400, detail="Sale must have at least one item")
 
+    # Productos e inventario de todas las líneas en una consulta cada uno; se reutilizan abajo
+    context = crud_sale.load_sale_context(db, [item.product_id for item in sale.items], tenant_id=tenant_id)
+
     # Validar productos
     for item in sale.items:
-        db_product = crud_products.get_product(db, product_id=item.product_id, tenant_id=tenant_id)
-        if not db_product:
+        if item.product_id not in context.products:
             raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
 
     # Verificar stock
     if not auto_adjust_stock:
-        stock_check = crud_sale.check_stock_availability(db, sale.items, tenant_id=tenant_id)
+        stock_check = crud_sale.check_stock_availability(db, sale.items, tenant_id=tenant_id, context=context)
         if stock_check["has_issues"]:
             raise HTTPException(status_code=400, detail="Stock insuficiente")
 
     try:
-        return crud_sale.create_sale(db=db, sale=sale, tenant_id=tenant_id, auto_adjust_stock=auto_adjust_stock)
+        return crud_sale.create_sale(
+            db=db, sale=sale, tenant_id=tenant_id, auto_adjust_stock=auto_adjust_stock, context=context
+        )
+    except InsufficientStockError as e:
+        # Otra venta se llevó el stock entre la verificación y el descuento; el cliente puede reintentar
+        db.rollback()
+        raise HTTPException(status_code=409, detail={"message": str(e), "issues": e.issues})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/batch", response_model=schemas.SaleBatchResult)
+def create_sales_batch(
+    sales: list[schemas.SaleCreate] = Body(..., max_length=5000),
+    auto_adjust_stock: bool = Query(False),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+    idempotency_key: str | None = Depends(idempotency_key_header),
+):
+    """
+    Registrar en una sola petición las ventas capturadas sin conexión (VanPOS).
+    Cada venta se acepta o rechaza por separado; los rechazos traen ``error`` y, si
+    faltó stock, ``issues``. Las ventas se aplican en el orden recibido.
+    Con ``Idempotency-Key`` reenviar el lote devuelve el resultado original.
+    """
+    return run_idempotent(
+        db,
+        tenant_id,
+        "sales.batch",
+        idempotency_key,
+        (sales, auto_adjust_stock),
+        lambda: crud_sale_batch.create_sales_batch(db, sales, tenant_id=tenant_id, auto_adjust_stock=auto_adjust_stock),
+        schemas.SaleBatchResult,
+    )
+
+
+def sale_filters(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    shipping_status: str | None = None,
+    payment_status: str | None = None,
+    document_type: str | None = None,
+    client_id: int | None = None,
+    notes: str | None = Query(None, min_length=1, max_length=100),
+) -> schemas.SaleFilters:
+    """Filtros comunes de los listados de ventas (parámetros de query)"""
+    return schemas.SaleFilters(
+        date_from=date_from,
+        date_to=date_to,
+        shipping_status=shipping_status,
+        payment_status=payment_status,
+        document_type=document_type,
+        client_id=client_id,
+        notes=notes,
+    )
+
+
 @router.get("/", response_model=list[schemas.Sale])
-def read_sales(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)):
-    """Obtener todas las ventas del tenant"""
-    return crud_sale.get_sales(db, tenant_id=tenant_id, skip=skip, limit=limit)
+def read_sales(
+    skip: int = 0,
+    limit: int = 100,
+    filters: schemas.SaleFilters = Depends(sale_filters),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Obtener las ventas del tenant; admite filtros por fechas, estados, tipo de documento, cliente y notas"""
+    return crud_sale.get_sales(db, tenant_id=tenant_id, skip=skip, limit=limit, filters=filters)
+
+
+@router.get("/cursor", response_model=schemas.CursorPage[schemas.Sale])
+def read_sales_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    filters: schemas.SaleFilters = Depends(sale_filters),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Ventas paginadas por cursor (más recientes primero). Usa ``next_cursor`` para la siguiente página."""
+    try:
+        return crud_sale.get_sales_by_cursor(
+            db, tenant_id=tenant_id, cursor=cursor, page_size=page_size, filters=filters
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/summary", response_model=list[schemas.SaleSummary])
+def read_sale_summaries(
+    skip: int = 0,
+    limit: int = 100,
+    filters: schemas.SaleFilters = Depends(sale_filters),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Listado ligero de ventas (sin items ni productos) para tablas; el detalle está en ``GET /sales/{id}``"""
+    return crud_sale.get_sale_summaries(db, tenant_id=tenant_id, skip=skip, limit=limit, filters=filters)
+
+
+@router.get("/summary/cursor", response_model=schemas.CursorPage[schemas.SaleSummary])
+def read_sale_summaries_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    filters: schemas.SaleFilters = Depends(sale_filters),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    """Listado ligero de ventas paginado por cursor (más recientes primero)"""
+    try:
+        return crud_sale.get_sale_summaries_by_cursor(
+            db, tenant_id=tenant_id, cursor=cursor, page_size=page_size, filters=filters
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{sale_id}", response_model=schemas.Sale)
@@ -90,10 +214,26 @@ def read_sale(sale_id: int, db: Session = Depends(get_db), tenant_id: int = Depe
 
 @router.put("/{sale_id}", response_model=schemas.Sale)
 def update_sale(
-    sale_id: int, sale: schemas.SaleUpdate, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
+    sale_id: int,
+    sale: schemas.SaleUpdate,
+    auto_adjust_stock: bool = Query(False),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
 ):
-    """Actualizar una venta"""
-    return crud_sale.update_sale(db=db, sale_id=sale_id, sale_update=sale, tenant_id=tenant_id)
+    """Actualizar una venta; el inventario se ajusta sólo por las líneas que cambian"""
+    try:
+        db_sale = crud_sale.update_sale(
+            db=db, sale_id=sale_id, sale_update=sale, tenant_id=tenant_id, auto_adjust_stock=auto_adjust_stock
+        )
+    except InsufficientStockError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={"message": str(e), "issues": e.issues})
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    if not db_sale:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    return db_sale
 
 
 @router.delete("/{sale_id}", response_model=schemas.Sale)
@@ -2,11 +2,12 @@
 Suppliers router with multi-tenant support.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from backend.core import models, schemas
 from backend.core.dependencies import get_db
+from backend.core.pagination import InvalidCursorError, cached_count, invalidate_counts, paginate_by_cursor
 from backend.core.security import get_current_user
 
 router = APIRouter(
@@ -29,6 +30,21 @@ def read_suppliers(
     return db.query(models.Supplier).filter(models.Supplier.tenant_id == tenant_id).offset(skip).limit(limit).all()
 
 
+@router.get("/cursor", response_model=schemas.CursorPage[schemas.Supplier])
+def read_suppliers_by_cursor(
+    cursor: str | None = None,
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    tenant_id: int = Depends(get_tenant_id),
+):
+    query = db.query(models.Supplier).filter(models.Supplier.tenant_id == tenant_id)
+    total = cached_count(query, tenant_id, ("suppliers",))
+    try:
+        return paginate_by_cursor(query, [models.Supplier.id], cursor, page_size, total_estimate=total)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/", response_model=schemas.Supplier)
 def create_supplier(
     supplier: schemas.SupplierCreate, db: Session = Depends(get_db), tenant_id: int = Depends(get_tenant_id)
@@ -37,6 +53,7 @@ def create_supplier(
     db.add(db_supplier)
     db.commit()
     db.refresh(db_supplier)
+    invalidate_counts(tenant_id)
     return db_supplier
 
 
@@ -85,4 +102,5 @@ def delete_supplier(supplier_id: int, db: Session = Depends(get_db), tenant_id:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
     db.delete(supplier)
     db.commit()
+    invalidate_counts(tenant_id)
     return supplier
@@ -15,7 +15,10 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from backend.core import models
+from backend.core.crud.crud_product_sync import purge_product_tombstones
 from backend.core.database import SessionLocal
+from backend.core.idempotency import purge_idempotency_keys
+from backend.core.import_jobs import purge_import_jobs
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,10 +58,18 @@ def delete_tenant_data(db: Session, tenant_id: int, dry_run: bool = False) -> di
         ("expense_categories", models.ExpenseCategory),
         ("alerts", models.Alert),
         ("inventory", models.Inventory),
+        ("stock_ledger", models.StockLedgerEntry),
+        ("stock_snapshots", models.StockSnapshot),
+        ("stock_dirty_products", models.StockDirtyProduct),
+        ("stock_discrepancies", models.StockDiscrepancy),
         ("supplier_products", models.SupplierProduct),
+        ("product_tombstones", models.ProductTombstone),
+        ("idempotency_keys", models.IdempotencyKey),
+        ("import_jobs", models.ImportJob),
         ("suppliers", models.Supplier),
         ("products", models.Product),
         ("product_tags", models.ProductTag),
+        ("pricing_tiers", models.PricingTier),
         ("clients", models.Client),
         ("companies", models.Company),
         ("app_settings", models.AppSettings),
@@ -90,6 +101,24 @@ def run_cleanup(dry_run: bool = True):
     """
     db = SessionLocal()
     try:
+        # Tombstones de sincronización vencidos (las terminales más atrasadas recargan todo)
+        purged = purge_product_tombstones(db, dry_run=dry_run)
+        if purged:
+            action = "Would purge" if dry_run else "Purged"
+            logger.info(f"{action} {purged} expired product tombstones")
+
+        # Claves de idempotencia vencidas (un reintento tardío vuelve a ejecutarse)
+        purged = purge_idempotency_keys(db, dry_run=dry_run)
+        if purged:
+            action = "Would purge" if dry_run else "Purged"
+            logger.info(f"{action} {purged} expired idempotency keys")
+
+        # Importaciones terminadas cuyo resultado ya venció
+        purged = purge_import_jobs(db, dry_run=dry_run)
+        if purged:
+            action = "Would purge" if dry_run else "Purged"
+            logger.info(f"{action} {purged} expired import jobs")
+
         expired_tenants = get_expired_tenants(db)
 
         if not expired_tenants:
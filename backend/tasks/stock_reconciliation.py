@@ -0,0 +1,46 @@
+"""
+Nightly inventory reconciliation.
+Compares Inventory.quantity against the batch stock of the products marked dirty
+since the last run (every inventory or batch write marks its products), records
+the mismatches in stock_discrepancies and optionally sets the inventory to the
+batch stock.
+
+Usage:
+    python -m backend.tasks.stock_reconciliation [--auto-correct]
+
+This can be scheduled with cron:
+    45 23 * * * cd /path/to/project && python -m backend.tasks.stock_reconciliation
+"""
+
+import logging
+
+from backend.core.crud.crud_stock_reconciliation import reconcile_dirty_products
+from backend.core.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_stock_reconciliation(tenant_id: int | None = None, auto_correct: bool = False) -> dict:
+    """Reconcile the dirty products of one tenant (or all of them). Returns the run counters."""
+    db = SessionLocal()
+    try:
+        result = reconcile_dirty_products(db, tenant_id=tenant_id, auto_correct=auto_correct)
+        db.commit()
+        logger.info(
+            f"Stock reconciliation: {result['checked']} products checked, "
+            f"{result['discrepancies']} discrepancies, {result['corrected']} corrected"
+        )
+        return result
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reconcile inventory against batch stock")
+    parser.add_argument("--tenant-id", type=int, default=None, help="Only this tenant (default: all)")
+    parser.add_argument("--auto-correct", action="store_true", help="Set inventory to the batch stock")
+    args = parser.parse_args()
+    run_stock_reconciliation(tenant_id=args.tenant_id, auto_correct=args.auto_correct)
@@ -0,0 +1,40 @@
+"""
+Nightly stock snapshot.
+Copies every product's on-hand quantity into stock_snapshots so that "stock as of
+date X" only replays the ledger entries written after the closest snapshot.
+
+Usage:
+    python -m backend.tasks.stock_snapshot
+
+This can be scheduled with cron:
+    30 23 * * * cd /path/to/project && python -m backend.tasks.stock_snapshot
+"""
+
+import logging
+
+from backend.core.crud.crud_stock_ledger import take_stock_snapshot
+from backend.core.database import SessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_stock_snapshot(tenant_id: int | None = None) -> int:
+    """Take a snapshot for one tenant (or all of them). Returns the number of products."""
+    db = SessionLocal()
+    try:
+        count = take_stock_snapshot(db, tenant_id=tenant_id)
+        db.commit()
+        logger.info(f"Stock snapshot taken for {count} products")
+        return count
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snapshot on-hand stock")
+    parser.add_argument("--tenant-id", type=int, default=None, help="Only this tenant (default: all)")
+    args = parser.parse_args()
+    run_stock_snapshot(tenant_id=args.tenant_id)
@@ -5,6 +5,29 @@ Este módulo contiene la lógica para calcular precios de venta
 basado en precios de compra con márgenes por rangos
 """
 
+import numpy as np
+
+# Márgenes por rango: (límite superior del precio de compra, multiplicador, descripción)
+PRICE_TIERS = (
+    (10, 1.70, "≤ $10.00 (70% margen)"),
+    (25, 1.60, "$10.01 - $25.00 (60% margen)"),
+    (50, 1.50, "$25.01 - $50.00 (50% margen)"),
+    (100, 1.40, "$50.01 - $100.00 (40% margen)"),
+    (200, 1.35, "$100.01 - $200.00 (35% margen)"),
+    (500, 1.30, "$200.01 - $500.00 (30% margen)"),
+    (float("inf"), 1.25, "> $500.00 (25% margen)"),
+)
+
+# Modos de redondeo a múltiplos (``round_to``): al más cercano o siempre hacia arriba
+ROUND_MODES = ("nearest", "up")
+
+
+def _tier_index(purchase_price: float) -> int:
+    for index, (limit, _, _) in enumerate(PRICE_TIERS):
+        if purchase_price <= limit:
+            return index
+    return len(PRICE_TIERS) - 1
+
 
 def calculate_sale_price(purchase_price: float) -> float:
     """
@@ -17,20 +40,7 @@ def calculate_sale_price(purchase_price: float) -> float:
     Returns:
         float: Precio de venta sugerido
     """
-    if purchase_price <= 10:
-        return round(purchase_price * 1.70, 2)  # 70% margen
-    elif purchase_price <= 25:
-        return round(purchase_price * 1.60, 2)  # 60% margen
-    elif purchase_price <= 50:
-        return round(purchase_price * 1.50, 2)  # 50% margen
-    elif purchase_price <= 100:
-        return round(purchase_price * 1.40, 2)  # 40% margen
-    elif purchase_price <= 200:
-        return round(purchase_price * 1.35, 2)  # 35% margen
-    elif purchase_price <= 500:
-        return round(purchase_price * 1.30, 2)  # 30% margen
-    else:
-        return round(purchase_price * 1.25, 2)  # 25% margen
+    return round(purchase_price * PRICE_TIERS[_tier_index(purchase_price)][1], 2)
 
 
 def get_price_range(purchase_price: float) -> str:
@@ -43,20 +53,107 @@ def get_price_range(purchase_price: float) -> str:
     Returns:
         str: Descripción del rango y margen
     """
-    if purchase_price <= 10:
-        return "≤ $10.00 (70% margen)"
-    elif purchase_price <= 25:
-        return "$10.01 - $25.00 (60% margen)"
-    elif purchase_price <= 50:
-        return "$25.01 - $50.00 (50% margen)"
-    elif purchase_price <= 100:
-        return "$50.01 - $100.00 (40% margen)"
-    elif purchase_price <= 200:
-        return "$100.01 - $200.00 (35% margen)"
-    elif purchase_price <= 500:
-        return "$200.01 - $500.00 (30% margen)"
-    else:
-        return "> $500.00 (25% margen)"
+    return PRICE_TIERS[_tier_index(purchase_price)][2]
+
+
+def round_prices(values: np.ndarray, decimals: int = 2) -> np.ndarray:
+    """
+    Redondeo vectorizado con el mismo resultado que ``round()`` de Python.
+
+    ``np.round`` escala por 10**decimals y puede diferir de ``round()`` cuando el
+    valor queda justo a la mitad; sólo esos casos se recalculan con ``round()``.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, decimals)
+    scaled = values * 10**decimals
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(value, decimals) for value in values[near_half].tolist()]
+    return rounded
+
+
+def format_tier_label(lower: float | None, upper: float | None, multiplier: float) -> str:
+    """Descripción de un rango, p. ej. "$10.01 - $25.00 (60% margen)" """
+    margin = f"({round((multiplier - 1) * 100):g}% margen)"
+    if lower is None:
+        return f"≤ ${upper:.2f} {margin}"
+    if upper is None:
+        return f"> ${lower:.2f} {margin}"
+    return f"${lower + 0.01:.2f} - ${upper:.2f} {margin}"
+
+
+class PricingTable:
+    """
+    Tabla de márgenes compilada a arreglos NumPy.
+
+    Cada rango es ``(límite superior, multiplicador, descripción, redondeo, modo)``;
+    el último no tiene límite (``inf``). El rango de un precio se obtiene con
+    ``searchsorted`` sobre los límites, el precio se multiplica por el margen del
+    rango y se redondea a centavos; si el rango tiene ``redondeo`` (p. ej. 0.5)
+    se lleva además al múltiplo más cercano o al siguiente según ``modo``.
+    """
+
+    def __init__(self, tiers: tuple):
+        self.tiers = tuple(tiers)
+        self._limits = np.array([tier[0] for tier in self.tiers[:-1]], dtype=float)
+        self._multipliers = np.array([tier[1] for tier in self.tiers], dtype=float)
+        self._labels = np.array([tier[2] for tier in self.tiers], dtype=object)
+        self._round_to = np.array([tier[3] or 0 for tier in self.tiers], dtype=float)
+        self._round_up = np.array([tier[4] == "up" for tier in self.tiers], dtype=bool)
+
+    def tier_indexes(self, purchase_prices: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self._limits, np.asarray(purchase_prices, dtype=float), side="left")
+
+    def sale_prices(self, purchase_prices: np.ndarray) -> np.ndarray:
+        """Precios de venta sugeridos para un arreglo de precios de compra"""
+        purchase_prices = np.asarray(purchase_prices, dtype=float)
+        tiers = self.tier_indexes(purchase_prices)
+        prices = round_prices(purchase_prices * self._multipliers[tiers])
+
+        step = self._round_to[tiers]
+        stepped = step > 0
+        if stepped.any():
+            units = prices[stepped] / step[stepped]
+            # El margen evita que el ruido de punto flotante (2.0000000001) suba un múltiplo
+            units = np.where(self._round_up[tiers][stepped], np.ceil(units - 1e-9), np.floor(units + 0.5))
+            prices[stepped] = round_prices(units * step[stepped])
+        return prices
+
+    def price_ranges(self, purchase_prices: np.ndarray) -> np.ndarray:
+        """Descripción del rango aplicado a cada precio de compra"""
+        return self._labels[self.tier_indexes(purchase_prices)]
+
+    def sale_price(self, purchase_price: float) -> float:
+        return float(self.sale_prices([purchase_price])[0])
+
+    def price_range(self, purchase_price: float) -> str:
+        return self.price_ranges([purchase_price])[0]
+
+
+DEFAULT_PRICING_TABLE = PricingTable(
+    tuple((limit, multiplier, label, None, "nearest") for limit, multiplier, label in PRICE_TIERS)
+)
+
+
+def calculate_sale_prices(purchase_prices: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de ``calculate_sale_price`` para un arreglo de precios de compra"""
+    return DEFAULT_PRICING_TABLE.sale_prices(purchase_prices)
+
+
+def get_price_ranges(purchase_prices: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de ``get_price_range``"""
+    return DEFAULT_PRICING_TABLE.price_ranges(purchase_prices)
+
+
+def format_price_difference(difference: float, percentage_change: float, direction: str) -> str:
+    """Texto legible de una diferencia de precio"""
+    if direction == "new":
+        return f"Nuevo: ${difference:.2f}"
+    if difference > 0:
+        return f"↑ ${difference:.2f} ({percentage_change:.1f}%)"
+    if difference < 0:
+        return f"↓ ${abs(difference):.2f} ({abs(percentage_change):.1f}%)"
+    return "Sin cambio"
 
 
 def calculate_price_difference(old_price: float, new_price: float) -> dict:
@@ -71,25 +168,31 @@ def calculate_price_difference(old_price: float, new_price: float) -> dict:
         dict: Información de la diferencia
     """
     if old_price == 0:
-        return {
-            "difference": new_price,
-            "percentage_change": 100.0,
-            "direction": "new",
-            "formatted": f"Nuevo: ${new_price:.2f}",
-        }
-
-    difference = new_price - old_price
-    percentage_change = (difference / old_price) * 100
+        difference, percentage_change, direction = new_price, 100.0, "new"
+    else:
+        difference = new_price - old_price
+        percentage_change = (difference / old_price) * 100
+        direction = "up" if difference > 0 else "down" if difference < 0 else "same"
 
     return {
         "difference": difference,
         "percentage_change": percentage_change,
-        "direction": "up" if difference > 0 else "down" if difference < 0 else "same",
-        "formatted": (
-            f"↑ ${difference:.2f} ({percentage_change:.1f}%)"
-            if difference > 0
-            else f"↓ ${abs(difference):.2f} ({abs(percentage_change):.1f}%)"
-            if difference < 0
-            else "Sin cambio"
-        ),
+        "direction": direction,
+        "formatted": format_price_difference(difference, percentage_change, direction),
     }
+
+
+def calculate_price_differences(old_prices: np.ndarray, new_prices: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Versión vectorizada de ``calculate_price_difference``.
+    Retorna arreglos ``difference``, ``percentage_change`` y ``direction``.
+    """
+    old_prices = np.asarray(old_prices, dtype=float)
+    new_prices = np.asarray(new_prices, dtype=float)
+    is_new = old_prices == 0
+
+    difference = np.where(is_new, new_prices, new_prices - old_prices)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage_change = np.where(is_new, 100.0, difference / np.where(is_new, 1.0, old_prices) * 100)
+    direction = np.select([is_new, difference > 0, difference < 0], ["new", "up", "down"], default="same")
+    return {"difference": difference, "percentage_change": percentage_change, "direction": direction.astype(object)}
@@ -0,0 +1,73 @@
+"""
+Fixtures for CRUD-level tests
+"""
+import pytest
+from sqlalchemy import event
+
+from backend.core import barcode_index, models, pagination
+from backend.core.crud import crud_batches, crud_pricing, crud_products
+from tests.conftest import engine
+
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """In-memory caches are per process; tests reuse tenant ids, so start each test clean"""
+    crud_products._barcode_cache.clear()
+    crud_products._facet_cache.clear()
+    pagination._count_cache.clear()
+    barcode_index._indexes.clear()
+    crud_pricing._pricing_cache.clear()
+    crud_batches._batch_summary_cache.clear()
+    yield
+
+
+@pytest.fixture
+def capture_statements():
+    """Runs ``fn`` and returns the SQL statements it sent to the database, in order"""
+
+    def capture(fn):
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_execute)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_execute)
+        return statements
+
+    return capture
+
+
+@pytest.fixture
+def make_store(db_session):
+    """
+    Factory for a tenant with a seller, a client and ``product_count`` products.
+    Each product gets ``stock`` units of inventory (none when ``stock`` is None);
+    ``product_fields`` go to every product. Returns ``(tenant, user, client, products)``.
+    """
+
+    def make(name="Farmacia", product_count=3, stock=10, client_name="Hospital", **product_fields):
+        tenant = models.Tenant(name=name)
+        db_session.add(tenant)
+        db_session.flush()
+        role = models.Role(name="vendedor")
+        db_session.add(role)
+        db_session.flush()
+        user = models.User(name="caja", email="caja@example.com", password="x", role_id=role.id, tenant_id=tenant.id)
+        client = models.Client(name=client_name, contact="x", tenant_id=tenant.id)
+        product_fields = {"sale_price": 10, **product_fields}
+        products = [
+            models.Product(tenant_id=tenant.id, name=f"P{i}", barcode=f"90{i}", **product_fields)
+            for i in range(product_count)
+        ]
+        db_session.add_all([user, client, *products])
+        db_session.flush()
+        if stock is not None:
+            db_session.add_all(models.Inventory(product_id=p.id, tenant_id=tenant.id, quantity=stock) for p in products)
+        db_session.commit()
+        return tenant, user, client, products
+
+    return make
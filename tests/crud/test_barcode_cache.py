@@ -0,0 +1,63 @@
+"""
+Tests for the per-tenant barcode resolution cache used by POS scanning
+"""
+import pytest
+
+from backend.core import models, schemas
+from backend.core.cache import TenantLRUCache
+from backend.core.crud import crud_products
+
+
+@pytest.fixture
+def scanned_product(db_session):
+    tenant = models.Tenant(name="Farmacia Scanner")
+    db_session.add(tenant)
+    db_session.flush()
+    product = models.Product(tenant_id=tenant.id, name="Amoxicilina 500mg", barcode="7502000000011", sale_price=80.0)
+    db_session.add(product)
+    db_session.flush()
+    db_session.add(models.Inventory(product_id=product.id, tenant_id=tenant.id, quantity=12))
+    db_session.commit()
+    crud_products.invalidate_barcode_cache(tenant.id)
+    return product
+
+
+class TestBarcodeCache:
+    def test_second_scan_is_served_from_cache(self, db_session, scanned_product):
+        stats_before = crud_products.get_barcode_cache_stats()
+
+        first = crud_products.resolve_barcode(db_session, " 7502000000011 ", tenant_id=scanned_product.tenant_id)
+        second = crud_products.resolve_barcode(db_session, "7502000000011", tenant_id=scanned_product.tenant_id)
+
+        stats_after = crud_products.get_barcode_cache_stats()
+        assert first.id == second.id == scanned_product.id
+        assert second.inventory.quantity == 12
+        assert stats_after["misses"] - stats_before["misses"] == 1
+        assert stats_after["hits"] - stats_before["hits"] == 1
+
+    def test_cache_is_scoped_by_tenant(self, db_session, scanned_product):
+        crud_products.resolve_barcode(db_session, "7502000000011", tenant_id=scanned_product.tenant_id)
+
+        assert crud_products.resolve_barcode(db_session, "7502000000011", tenant_id=scanned_product.tenant_id + 1) is None
+
+    def test_update_invalidates_cached_entry(self, db_session, scanned_product):
+        tenant_id = scanned_product.tenant_id
+        crud_products.resolve_barcode(db_session, "7502000000011", tenant_id=tenant_id)
+
+        update = schemas.ProductUpdate(name="Amoxicilina 875mg", sale_price=95.0, barcode="7502000000011")
+        crud_products.update_product(db_session, scanned_product.id, update, tenant_id=tenant_id)
+
+        assert crud_products.resolve_barcode(db_session, "7502000000011", tenant_id=tenant_id).name == "Amoxicilina 875mg"
+
+    def test_lru_evicts_least_recently_used_per_tenant(self):
+        cache = TenantLRUCache("test", maxsize=2)
+        cache.set(1, "a", 1)
+        cache.set(1, "b", 2)
+        cache.get(1, "a")
+        cache.set(1, "c", 3)
+        cache.set(2, "z", 26)
+
+        assert cache.get(1, "b") is None
+        assert cache.get(1, "a") == 1
+        assert cache.get(2, "z") == 26
+        assert cache.stats()["evictions"] == 1
@@ -0,0 +1,58 @@
+"""
+Tests for the in-memory partial barcode index
+"""
+from backend.core import models
+from backend.core.barcode_index import BarcodeIndex
+from backend.core.crud import crud_products
+
+
+class TestBarcodeIndex:
+    def test_candidates_are_ranked_by_match_type(self):
+        index = BarcodeIndex(
+            [
+                ("1234", 1, "Exacto"),
+                ("123456", 2, "Prefijo"),
+                ("999123", 3, "Sufijo"),
+                ("912345", 4, "Contiene"),
+                ("555555", 5, "Sin coincidencia"),
+            ]
+        )
+
+        results = index.search("123", limit=10)
+        assert [(r.product_id, r.match) for r in results] == [
+            (1, "prefix"),
+            (2, "prefix"),
+            (3, "suffix"),
+            (4, "contains"),
+        ]
+        assert index.search("1234")[0].match == "exact"
+        assert [r.product_id for r in index.search("123", limit=2)] == [1, 2]
+        assert index.search("000") == []
+
+    def test_contains_does_not_repeat_products(self):
+        index = BarcodeIndex([("x11x11x", 1, "A"), ("11", 2, "B")])
+        results = index.search("1", limit=10)
+        assert sorted(r.product_id for r in results) == [1, 2]
+
+    def test_index_is_rebuilt_after_product_changes(self, db_session):
+        tenant = models.Tenant(name="Farmacia Índice")
+        db_session.add(tenant)
+        db_session.flush()
+        db_session.add(models.Product(tenant_id=tenant.id, name="Paracetamol", barcode="7501000000017"))
+        db_session.commit()
+
+        assert [p.name for p in crud_products.search_products_by_barcode(db_session, "0017", tenant.id)] == [
+            "Paracetamol"
+        ]
+
+        other = models.Product(tenant_id=tenant.id, name="Ibuprofeno", barcode="7501000000024")
+        db_session.add(other)
+        db_session.commit()
+        crud_products.invalidate_barcode_cache(tenant.id)
+        assert [p.name for p in crud_products.search_products_by_barcode(db_session, "0024", tenant.id)] == [
+            "Ibuprofeno"
+        ]
+
+        crud_products.delete_product(db_session, other.id, tenant.id)
+        results = crud_products.search_products_by_barcode(db_session, "750100", tenant.id)
+        assert [p.name for p in results] == ["Paracetamol"]
@@ -0,0 +1,110 @@
+"""
+Tests for FEFO batch allocation on sales
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_batches, crud_sale
+
+
+@pytest.fixture
+def pharmacy(db_session, make_store):
+    tenant, user, client, products = make_store("Farmacia Lotes", product_count=30, stock=100)
+    today = date.today()
+    for product in products:
+        for number, days, quantity in (("EXP", -1, 50), ("LATE", 90, 20), ("SOON", 10, 3)):
+            db_session.add(
+                models.ProductBatch(
+                    product_id=product.id,
+                    batch_number=f"{number}-{product.id}",
+                    expiration_date=today + timedelta(days=days),
+                    quantity_received=quantity,
+                    quantity_remaining=quantity,
+                    received_date=datetime.now(),
+                )
+            )
+    db_session.commit()
+    return tenant, user, client, products
+
+
+def _sale(user, client, products, quantity):
+    items = [schemas.SaleItemCreate(product_id=p.id, quantity=quantity, unit_price=10) for p in products]
+    return schemas.SaleCreate(client_id=client.id, user_id=user.id, items=items)
+
+
+def _remaining(db_session, product):
+    db_session.expire_all()
+    batches = db_session.query(models.ProductBatch).filter(models.ProductBatch.product_id == product.id)
+    return {batch.batch_number.split("-")[0]: batch.quantity_remaining for batch in batches}
+
+
+class TestAllocateBatches:
+    def test_sale_takes_earliest_unexpired_batches_first(self, db_session, pharmacy):
+        tenant, user, client, products = pharmacy
+
+        sale = crud_sale.create_sale(db_session, _sale(user, client, products[:1], 5), tenant_id=tenant.id)
+
+        assert _remaining(db_session, products[0]) == {"EXP": 50, "LATE": 18, "SOON": 0}
+        movements = db_session.query(models.BatchStockMovement).order_by(models.BatchStockMovement.id).all()
+        assert [(m.quantity, m.previous_quantity, m.new_quantity) for m in movements] == [(3, 3, 0), (2, 20, 18)]
+        assert {(m.movement_type, m.reference_id, m.user_id) for m in movements} == {("out", str(sale.id), user.id)}
+
+    def test_statements_do_not_grow_with_line_count(self, db_session, pharmacy, capture_statements):
+        tenant, _, _, products = pharmacy
+        tenant_id = tenant.id
+
+        def allocate(lines):
+            demands = [crud_batches.BatchDemand(p.id, 4) for p in lines]
+            return len(capture_statements(lambda: crud_batches.allocate_batches(db_session, demands, tenant_id)))
+
+        # SELECT FOR UPDATE, INSERT de movimientos, INSERT de productos por conciliar y UPDATE CASE
+        assert allocate(products[:2]) == allocate(products[2:30]) == 4
+
+    def test_strict_shortage_writes_nothing(self, db_session, pharmacy):
+        _, user, _, products = pharmacy
+
+        with pytest.raises(ValueError):
+            crud_batches.allocate_batch_for_sale(db_session, products[0].id, 24, user.id)
+        db_session.rollback()
+
+        assert _remaining(db_session, products[0]) == {"EXP": 50, "LATE": 20, "SOON": 3}
+        assert db_session.query(models.BatchStockMovement).count() == 0
+
+
+class TestReleaseBatches:
+    def test_editing_a_sale_moves_its_batches(self, db_session, pharmacy):
+        tenant, user, client, products = pharmacy
+        sale = crud_sale.create_sale(db_session, _sale(user, client, products[:1], 5), tenant_id=tenant.id)
+        sale_id = sale.id
+
+        items = [schemas.SaleItemCreate(product_id=products[0].id, quantity=1, unit_price=10)]
+        crud_sale.update_sale(db_session, sale_id, schemas.SaleUpdate(items=items), tenant_id=tenant.id)
+
+        # Se devuelve primero al que caduca más tarde: lo vendido sigue en SOON
+        assert _remaining(db_session, products[0]) == {"EXP": 50, "LATE": 20, "SOON": 2}
+
+        items = [schemas.SaleItemCreate(product_id=products[0].id, quantity=8, unit_price=10)]
+        crud_sale.update_sale(db_session, sale_id, schemas.SaleUpdate(items=items), tenant_id=tenant.id)
+
+        assert _remaining(db_session, products[0]) == {"EXP": 50, "LATE": 15, "SOON": 0}
+        assert products[0].inventory.quantity == 92
+
+    def test_deleting_a_sale_returns_its_batches(self, db_session, pharmacy):
+        tenant, user, client, products = pharmacy
+        sale = crud_sale.create_sale(db_session, _sale(user, client, products[:2], 5), tenant_id=tenant.id)
+        sale_id = sale.id
+        items = [schemas.SaleItemCreate(product_id=p.id, quantity=2, unit_price=10) for p in products[:2]]
+        crud_sale.update_sale(db_session, sale_id, schemas.SaleUpdate(items=items), tenant_id=tenant.id)
+
+        crud_sale.delete_sale(db_session, sale_id, tenant_id=tenant.id)
+
+        for product in products[:2]:
+            assert _remaining(db_session, product) == {"EXP": 50, "LATE": 20, "SOON": 3}
+            assert product.inventory.quantity == 100
+        returns = db_session.query(models.BatchStockMovement).filter(models.BatchStockMovement.movement_type == "in")
+        assert {(m.reason, m.reference_id) for m in returns} == {
+            ("sale_update", str(sale_id)),
+            ("sale_delete", str(sale_id)),
+        }
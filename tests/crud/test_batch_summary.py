@@ -0,0 +1,137 @@
+"""
+Tests for the batch inventory summary, valuation and expiring batches
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_batches
+
+
+@pytest.fixture
+def stock(db_session):
+    tenants = [models.Tenant(name="Farmacia A"), models.Tenant(name="Farmacia B")]
+    db_session.add_all(tenants)
+    db_session.flush()
+    supplier = models.Supplier(name="Distribuidora")
+    db_session.add(supplier)
+    products = [
+        models.Product(tenant_id=tenant.id, name=f"P{i}", barcode=f"99{i}", sale_price=10)
+        for i, tenant in enumerate([tenants[0], tenants[0], tenants[1]])
+    ]
+    db_session.add_all(products)
+    db_session.flush()
+    today = date.today()
+    # (producto, días a la caducidad, existencia, costo, proveedor)
+    for product, days, quantity, cost, supplier_id in [
+        (products[0], -5, 2, 1.0, None),
+        (products[0], 20, 10, 2.0, supplier.id),
+        (products[0], 100, 0, 2.0, supplier.id),  # agotado
+        (products[1], 60, 5, None, supplier.id),  # sin costo
+        (products[1], 400, 4, 3.0, None),
+        (products[2], 10, 50, 1.0, None),  # otro tenant
+    ]:
+        db_session.add(
+            models.ProductBatch(
+                tenant_id=product.tenant_id,
+                product_id=product.id,
+                batch_number=f"L{days}",
+                expiration_date=today + timedelta(days=days),
+                quantity_received=quantity,
+                quantity_remaining=quantity,
+                unit_cost=cost,
+                supplier_id=supplier_id,
+                received_date=datetime.now(),
+            )
+        )
+    db_session.commit()
+    return tenants, products, supplier
+
+
+class TestBatchInventorySummary:
+    def test_totals_are_scoped_to_tenant(self, db_session, stock):
+        (tenant, _), (first, second, _), _ = stock
+
+        summary = crud_batches.get_batch_inventory_summary(db_session, tenant_id=tenant.id)
+
+        assert summary["total_active_batches"] == 4
+        assert summary["expiring_within_30_days"] == 2  # incluye el caducado
+        assert summary["total_inventory_value"] == 2 + 20 + 0 + 12
+        assert summary["products_with_batches"] == 2
+        assert sorted((row["product_id"], row["total_quantity"]) for row in summary["batch_distribution"]) == [
+            (first.id, 12),
+            (second.id, 9),
+        ]
+
+    def test_cached_until_a_batch_moves(self, db_session, stock):
+        (tenant, other), (first, _, _), _ = stock
+        crud_batches.get_batch_inventory_summary(db_session, tenant_id=tenant.id)
+        crud_batches.get_batch_inventory_summary(db_session, tenant_id=other.id)
+        hits = crud_batches._batch_summary_cache.hits
+
+        batch = db_session.query(models.ProductBatch).filter_by(product_id=first.id, batch_number="L20").one()
+        crud_batches.update_product_batch(db_session, batch.id, schemas.ProductBatchUpdate(quantity_remaining=6), 1)
+        summary = crud_batches.get_batch_inventory_summary(db_session, tenant_id=tenant.id)
+
+        assert summary["total_inventory_value"] == 2 + 12 + 12
+        assert crud_batches._batch_summary_cache.hits == hits
+        # Sólo se descarta el resumen del tenant del lote
+        crud_batches.get_batch_inventory_summary(db_session, tenant_id=other.id)
+        assert crud_batches._batch_summary_cache.hits == hits + 1
+
+    def test_allocation_invalidates_only_after_commit(self, db_session, stock):
+        (tenant, _), (first, _, _), _ = stock
+        crud_batches.get_batch_inventory_summary(db_session, tenant_id=tenant.id)
+        hits = crud_batches._batch_summary_cache.hits
+
+        # Sin commit la asignación no toca la caché: otra petición aún leería lo confirmado
+        crud_batches.allocate_batches(db_session, [crud_batches.BatchDemand(first.id, 4)], tenant_id=tenant.id)
+        crud_batches.get_batch_inventory_summary(db_session, tenant_id=tenant.id)
+
+        assert crud_batches._batch_summary_cache.hits == hits + 1
+
+
+class TestBatchValuation:
+    def test_by_supplier(self, db_session, stock):
+        (tenant, _), _, _ = stock
+
+        groups = crud_batches.get_batch_valuation(db_session, tenant_id=tenant.id, group_by="supplier")
+
+        assert [(group["name"], group["batch_count"], group["total_value"]) for group in groups] == [
+            ("Distribuidora", 2, 20),
+            (None, 2, 14),
+        ]
+
+    def test_by_expiry_bucket(self, db_session, stock):
+        (tenant, _), _, _ = stock
+
+        groups = crud_batches.get_batch_valuation(db_session, tenant_id=tenant.id, group_by="expiry")
+
+        assert {group["key"]: group["total_quantity"] for group in groups} == {
+            "expired": 2,
+            "8-30": 10,
+            "31-90": 5,
+            "91+": 4,
+        }
+
+
+class TestExpiringBatches:
+    def test_pages_by_expiration_date(self, db_session, stock):
+        (tenant, _), _, _ = stock
+
+        first_page = crud_batches.get_expiring_batches_by_cursor(db_session, tenant_id=tenant.id, page_size=1)
+        second_page = crud_batches.get_expiring_batches_by_cursor(
+            db_session, tenant_id=tenant.id, cursor=first_page["next_cursor"], page_size=1
+        )
+
+        assert [(row["product_name"], row["days_until_expiry"]) for row in first_page["items"]] == [("P0", -5)]
+        assert [(row["batch_number"], row["stock_value"]) for row in second_page["items"]] == [("L20", 20)]
+        assert second_page["has_more"] is False
+
+    def test_list_is_scoped_to_tenant(self, db_session, stock):
+        (_, other), _, _ = stock
+
+        batches = crud_batches.get_expiring_batches(db_session, days_ahead=30, tenant_id=other.id)
+
+        assert [(batch.batch_number, batch.product.name) for batch in batches] == [("L10", "P2")]
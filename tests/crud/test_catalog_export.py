@@ -0,0 +1,76 @@
+"""
+Tests for the streaming catalog export
+"""
+import csv
+import io
+import json
+
+import pytest
+from openpyxl import load_workbook
+
+from backend.core import catalog_export, models
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def catalog(db_session):
+    tenant = models.Tenant(name="Farmacia Catálogo")
+    other = models.Tenant(name="Otra Farmacia")
+    db_session.add_all([tenant, other])
+    db_session.flush()
+    db_session.add_all(
+        [
+            models.Product(tenant_id=tenant.id, name="Paracetamol", barcode="7501", sale_price=25.456, iva_rate=0.0),
+            models.Product(tenant_id=tenant.id, name="Loratadina", laboratory="Genérico", sale_price=40, iva_rate=0.16),
+            models.Product(tenant_id=tenant.id, name="Sin precio"),
+            models.Product(tenant_id=other.id, name="De otro tenant", sale_price=1),
+        ]
+    )
+    db_session.commit()
+    return tenant
+
+
+EXPECTED_ROWS = [
+    ("7501", "Paracetamol", "", "", 25.46, "Exento"),
+    ("", "Loratadina", "", "Genérico", 40, "16%"),
+    ("", "Sin precio", "", "", 0, "Exento"),
+]
+
+
+class TestCatalogExport:
+    def test_chunks_are_read_incrementally(self, db_session, catalog):
+        chunks = list(catalog_export.iter_catalog_chunks(db_session, catalog.id, chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert [row for chunk in chunks for row in chunk] == EXPECTED_ROWS
+
+    def test_xlsx_export(self, db_session, catalog):
+        data = b"".join(catalog_export.stream_catalog_xlsx(db_session, catalog.id))
+        sheet = load_workbook(io.BytesIO(data))[catalog_export.EXPORT_SHEET_NAME]
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == catalog_export.EXPORT_HEADERS
+        assert [(row[1], row[4], row[5]) for row in rows[1:]] == [(row[1], row[4], row[5]) for row in EXPECTED_ROWS]
+
+    def test_csv_and_ndjson_exports(self, db_session, catalog):
+        text = b"".join(catalog_export.stream_catalog_csv(db_session, catalog.id)).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(text)))
+        assert rows[0] == list(catalog_export.EXPORT_HEADERS)
+        assert [row[1] for row in rows[1:]] == ["Paracetamol", "Loratadina", "Sin precio"]
+
+        lines = b"".join(catalog_export.stream_catalog_ndjson(db_session, catalog.id)).decode().splitlines()
+        assert [json.loads(line)["PRECIO"] for line in lines] == [25.46, 40, 0]
+
+    def test_stream_uses_its_own_session(self, db_session, catalog):
+        sessions = []
+
+        def session_factory():
+            sessions.append(TestingSessionLocal())
+            return sessions[-1]
+
+        stream = catalog_export.stream_catalog("ndjson", catalog.id, session_factory)
+        assert sessions == []  # la sesión se abre al empezar a transmitir
+
+        lines = b"".join(stream).decode().splitlines()
+
+        assert [json.loads(line)["NOMBRE"] for line in lines] == ["Paracetamol", "Loratadina", "Sin precio"]
+        assert len(sessions) == 1
+        assert not sessions[0].in_transaction()  # cerrada al terminar la respuesta
@@ -0,0 +1,102 @@
+"""
+Tests for the vectorized Excel import preview and the bulk confirm
+"""
+import pandas as pd
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_products
+from backend.core.excel_import import ExcelImportError, build_import_preview, confirm_import, normalize_import_sheet
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Importadora")
+    db_session.add(tenant)
+    db_session.flush()
+    db_session.add_all(
+        [
+            models.Product(tenant_id=tenant.id, name="Paracetamol", barcode="7501", purchase_price=10, sale_price=17),
+            models.Product(tenant_id=tenant.id, name="Loratadina", barcode="7502", purchase_price=30, sale_price=45),
+        ]
+    )
+    db_session.commit()
+    return tenant
+
+
+class TestExcelImportPreview:
+    def test_preview_merges_existing_products_and_prices(self, db_session, tenant):
+        df = pd.DataFrame(
+            {
+                " Codigo de Barras ": ["7501", "7502.0", "7503", None],
+                "Descripcion": ["Paracetamol 500", "Loratadina", "Nuevo", "Sin código"],
+                "Delta": ["$12.00", "30", "1,200.50", "5"],
+                "IVA": ["s/IVA", "IVA", "16%", None],
+                "INV": ["3", None, "10", "1"],
+            },
+            dtype=str,
+        )
+
+        preview = build_import_preview(db_session, normalize_import_sheet(df), tenant_id=tenant.id)
+
+        assert (preview.total_items, preview.new_products, preview.existing_products) == (3, 1, 2)
+        assert preview.price_changes == 1
+        first, second, third = preview.items
+        assert (first.exists, first.price_change, first.purchase_price_old, first.sale_price_suggested) == (
+            True,
+            "up",
+            10,
+            19.2,
+        )
+        assert first.price_difference["formatted"] == "↑ $2.00 (20.0%)"
+        assert (second.barcode, second.price_change, second.iva_rate) == ("7502", "same", 0.16)
+        assert second.inventory_to_add == 0
+        assert (third.exists, third.product_id, third.purchase_price_new, third.iva_rate) == (False, None, 1200.5, 0.16)
+        assert third.price_range == "> $500.00 (25% margen)"
+        assert third.price_difference is None
+
+    def test_invalid_prices_are_reported_by_row(self):
+        df = pd.DataFrame({"CODIGO": ["1", "2"], "NOMBRE": ["A", "B"], "COSTO": ["abc", "3"]}, dtype=str)
+        with pytest.raises(ExcelImportError, match="filas 2"):
+            normalize_import_sheet(df)
+
+
+class TestExcelImportConfirm:
+    def test_confirm_upserts_and_adds_inventory(self, db_session, tenant):
+        existing = crud_products.get_product_by_barcode(db_session, "7501", tenant_id=tenant.id)
+        existing.laboratory = "Lab Original"
+        db_session.add(models.Inventory(product_id=existing.id, tenant_id=tenant.id, quantity=4))
+        db_session.commit()
+
+        items = [
+            schemas.ExcelImportConfirmItem(
+                barcode="7501",
+                name="Paracetamol 500mg",
+                laboratory="Otro Lab",
+                purchase_price=12,
+                sale_price=20,
+                iva_rate=0,
+                inventory_to_add=6,
+                exists=True,
+            ),
+            schemas.ExcelImportConfirmItem(
+                barcode="7509",
+                name="Omeprazol",
+                laboratory="Genérico",
+                purchase_price=8,
+                sale_price=13.6,
+                iva_rate=0.16,
+                inventory_to_add=10,
+                exists=False,
+            ),
+        ]
+
+        result = confirm_import(db_session, items, tenant_id=tenant.id)
+
+        assert (result.created, result.updated, result.errors, result.total_processed) == (1, 1, [], 2)
+        db_session.refresh(existing)
+        assert (existing.name, existing.sale_price, existing.inventory.quantity) == ("Paracetamol 500mg", 20, 10)
+        # La confirmación sólo actualiza nombre y precios de los existentes
+        assert existing.laboratory == "Lab Original"
+        created = crud_products.get_product_by_barcode(db_session, "7509", tenant_id=tenant.id)
+        assert (created.laboratory, created.iva_rate, created.inventory.quantity) == ("Genérico", 0.16, 10)
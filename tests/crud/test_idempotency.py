@@ -0,0 +1,90 @@
+"""
+Tests for idempotency keys on create endpoints
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.core import models, schemas
+from backend.core.idempotency import REPLAYED_HEADER, purge_idempotency_keys, run_idempotent
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Ruta")
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+def _create_category(db_session, tenant, payload, calls):
+    def create():
+        calls.append(payload)
+        category = models.ExpenseCategory(tenant_id=tenant.id, **payload.model_dump())
+        db_session.add(category)
+        db_session.commit()
+        return category
+
+    return run_idempotent(
+        db_session, tenant.id, "expenses.categories", "key-1", payload, create, schemas.ExpenseCategory
+    )
+
+
+class TestRunIdempotent:
+    def test_retry_replays_original_response(self, db_session, tenant):
+        payload = schemas.ExpenseCategoryCreate(name="Gasolina")
+        calls = []
+
+        first = _create_category(db_session, tenant, payload, calls)
+        retry = _create_category(db_session, tenant, payload, calls)
+
+        assert len(calls) == 1
+        assert db_session.query(models.ExpenseCategory).count() == 1
+        assert json.loads(retry.body) == json.loads(first.body)
+        assert retry.headers[REPLAYED_HEADER] == "true"
+
+    def test_reused_key_with_other_payload_is_rejected(self, db_session, tenant):
+        _create_category(db_session, tenant, schemas.ExpenseCategoryCreate(name="Gasolina"), [])
+
+        with pytest.raises(HTTPException) as error:
+            _create_category(db_session, tenant, schemas.ExpenseCategoryCreate(name="Casetas"), [])
+
+        assert error.value.status_code == 422
+
+    def test_failed_action_releases_key(self, db_session, tenant):
+        payload = schemas.ExpenseCategoryCreate(name="Gasolina")
+
+        def fail():
+            raise HTTPException(status_code=400, detail="Sin conexión con el PAC")
+
+        with pytest.raises(HTTPException):
+            run_idempotent(db_session, tenant.id, "expenses.categories", "key-1", payload, fail, schemas.ExpenseCategory)
+        calls = []
+        _create_category(db_session, tenant, payload, calls)
+
+        assert len(calls) == 1
+
+    def test_without_key_always_runs(self, db_session, tenant):
+        calls = []
+        for _ in range(2):
+            run_idempotent(db_session, tenant.id, "expenses.categories", None, {}, lambda: calls.append(1), None)
+
+        assert calls == [1, 1]
+        assert db_session.query(models.IdempotencyKey).count() == 0
+
+    def test_expired_keys_run_again_and_are_purged(self, db_session, tenant):
+        payload = schemas.ExpenseCategoryCreate(name="Gasolina")
+        calls = []
+        _create_category(db_session, tenant, payload, calls)
+        db_session.query(models.IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db_session.commit()
+
+        _create_category(db_session, tenant, payload, calls)
+        db_session.query(models.IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db_session.commit()
+
+        assert len(calls) == 2
+        assert purge_idempotency_keys(db_session) == 1
+        assert db_session.query(models.IdempotencyKey).count() == 0
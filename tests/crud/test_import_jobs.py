@@ -0,0 +1,102 @@
+"""
+Tests for background Excel import jobs
+"""
+import io
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from backend.core import import_jobs, models
+from backend.core.config import settings
+from backend.core.crud import crud_products
+from tests.conftest import TestingSessionLocal
+
+
+def _excel(rows):
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _wait(db_session, status, tenant_id, timeout=10):
+    """Consulta el job en la base de datos hasta que termine"""
+    deadline = time.monotonic() + timeout
+    while True:
+        db_session.expire_all()
+        job = import_jobs.get_import_job(db_session, status.id, tenant_id)
+        if job.status not in ("pending", "running"):
+            return job
+        assert time.monotonic() < deadline, "El job no terminó a tiempo"
+        time.sleep(0.01)
+
+
+class TestImportJobs:
+    def test_auto_confirm_job_imports_and_reports_progress(self, db_session):
+        tenant = models.Tenant(name="Farmacia Jobs")
+        db_session.add(tenant)
+        db_session.commit()
+        contents = _excel(
+            {"CODIGO DE BARRAS": ["8801", "8802"], "DESCRIPCION": ["Ambroxol", "Naproxeno"], "DELTA": [10, 40]}
+        )
+
+        submitted = import_jobs.submit_excel_job(contents, tenant.id, TestingSessionLocal, auto_confirm=True)
+        assert (submitted.status, submitted.kind) == ("pending", "import")
+        job = _wait(db_session, submitted, tenant.id)
+
+        status = import_jobs.to_status(job)
+        assert (status.status, status.kind, status.processed_rows, status.total_rows) == ("completed", "import", 2, 2)
+        assert status.result_available and status.eta_seconds is None
+        result = import_jobs.load_result(job)
+        assert (result["created"], result["updated"]) == (2, 0)
+        product = crud_products.get_product_by_barcode(db_session, "8802", tenant_id=tenant.id)
+        assert product.sale_price == 60.0
+        assert import_jobs.get_import_job(db_session, job.id, tenant.id + 1) is None
+
+    def test_invalid_file_marks_job_failed(self, db_session):
+        tenant = models.Tenant(name="Farmacia Fallida")
+        db_session.add(tenant)
+        db_session.commit()
+
+        submitted = import_jobs.submit_excel_job(b"no es excel", tenant.id, TestingSessionLocal)
+        job = _wait(db_session, submitted, tenant.id)
+
+        assert job.status == "failed"
+        assert job.error and import_jobs.load_result(job) is None
+
+    def test_expired_jobs_are_hidden_and_purged(self, db_session):
+        tenant = models.Tenant(name="Farmacia Vencida")
+        db_session.add(tenant)
+        db_session.commit()
+        submitted = import_jobs.submit_excel_job(b"no es excel", tenant.id, TestingSessionLocal)
+        job = _wait(db_session, submitted, tenant.id)
+        job.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+
+        assert import_jobs.get_import_job(db_session, job.id, tenant.id) is None
+        assert import_jobs.purge_import_jobs(db_session, dry_run=True) == 1
+        assert import_jobs.purge_import_jobs(db_session) == 1
+        assert db_session.query(models.ImportJob).count() == 0
+
+    def test_interrupted_jobs_are_failed_and_expire(self, db_session):
+        tenant = models.Tenant(name="Farmacia Reiniciada")
+        db_session.add(tenant)
+        db_session.flush()
+        started = datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS + 60)
+        stale = models.ImportJob(
+            id="stale", tenant_id=tenant.id, kind="import", status="running", created_at=started, started_at=started
+        )
+        recent = models.ImportJob(id="recent", tenant_id=tenant.id, kind="import", status="running")
+        db_session.add_all([stale, recent])
+        db_session.commit()
+
+        assert import_jobs.purge_import_jobs(db_session) == 0
+        db_session.expire_all()
+        assert (stale.status, stale.error is not None, stale.expires_at is not None) == ("failed", True, True)
+        assert import_jobs.to_status(stale).eta_seconds is None
+        assert (recent.status, recent.expires_at) == ("running", None)
+
+        stale.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        assert import_jobs.purge_import_jobs(db_session) == 1
+        assert db_session.query(models.ImportJob.id).all() == [("recent",)]
@@ -0,0 +1,68 @@
+"""
+Tests for keyset (cursor) pagination
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.core import models
+from backend.core.crud import crud_products, crud_sale
+from backend.core.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Paginada")
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+class TestCursorPagination:
+    def test_walks_all_products_without_gaps_or_duplicates(self, db_session, tenant):
+        db_session.add_all(
+            [models.Product(tenant_id=tenant.id, name=f"Producto {i}", sale_price=10.0) for i in range(7)]
+        )
+        db_session.commit()
+
+        seen, cursor = [], None
+        while True:
+            page = crud_products.get_products_by_cursor(db_session, tenant_id=tenant.id, cursor=cursor, page_size=3)
+            seen.extend(product.id for product in page["items"])
+            if not page["has_more"]:
+                break
+            cursor = page["next_cursor"]
+
+        assert seen == sorted(seen)
+        assert len(seen) == len(set(seen)) == 7
+        assert page["total_estimate"] == 7
+
+    def test_sales_are_paged_newest_first_and_stable_under_inserts(self, db_session, tenant, sample_user):
+        client = models.Client(tenant_id=tenant.id, name="Cliente", contact="")
+        db_session.add(client)
+        db_session.flush()
+        base = datetime(2026, 1, 1, 12, 0)
+        for i in range(5):
+            db_session.add(
+                models.Sale(tenant_id=tenant.id, client_id=client.id, user_id=sample_user.id, sale_date=base + timedelta(days=i))
+            )
+        db_session.commit()
+
+        first = crud_sale.get_sales_by_cursor(db_session, tenant_id=tenant.id, page_size=2)
+        # A newer sale arriving between pages must not shift the next page
+        db_session.add(
+            models.Sale(tenant_id=tenant.id, client_id=client.id, user_id=sample_user.id, sale_date=base + timedelta(days=30))
+        )
+        db_session.commit()
+        second = crud_sale.get_sales_by_cursor(db_session, tenant_id=tenant.id, cursor=first["next_cursor"], page_size=2)
+
+        assert [sale.sale_date.day for sale in first["items"]] == [5, 4]
+        assert [sale.sale_date.day for sale in second["items"]] == [3, 2]
+
+    def test_cursor_round_trip_and_rejects_garbage(self):
+        columns = [models.Sale.sale_date, models.Sale.id]
+        cursor = encode_cursor([datetime(2026, 3, 1, 8, 30), 42])
+
+        assert decode_cursor(cursor, columns) == [datetime(2026, 3, 1, 8, 30), 42]
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor", columns)
@@ -0,0 +1,63 @@
+"""
+Tests for per-tenant pricing tier tables
+"""
+import pandas as pd
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_pricing, crud_products
+from backend.core.crud.crud_product_bulk import bulk_upsert_products
+from backend.core.excel_import import build_import_preview, normalize_import_sheet
+from backend.utils.pricing_formula import DEFAULT_PRICING_TABLE
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Márgenes")
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+def _tiers():
+    return [
+        schemas.PricingTierBase(max_purchase_price=100, multiplier=2, round_to=0.5, round_mode="up"),
+        schemas.PricingTierBase(multiplier=1.5),
+    ]
+
+
+class TestPricingRules:
+    def test_tenant_table_is_cached_and_invalidated_on_change(self, db_session, tenant):
+        assert crud_pricing.get_pricing_table(db_session, tenant.id) is DEFAULT_PRICING_TABLE
+
+        crud_pricing.replace_pricing_tiers(db_session, _tiers(), tenant_id=tenant.id)
+        table = crud_pricing.get_pricing_table(db_session, tenant.id)
+
+        assert table is crud_pricing.get_pricing_table(db_session, tenant.id)
+        assert table.sale_price(10.1) == 20.5
+        assert table.price_range(150) == "> $100.00 (50% margen)"
+        crud_pricing.reset_pricing_tiers(db_session, tenant_id=tenant.id)
+        assert crud_pricing.get_pricing_table(db_session, tenant.id) is DEFAULT_PRICING_TABLE
+
+    def test_invalid_tables_are_rejected(self, db_session, tenant):
+        unbounded_middle = [schemas.PricingTierBase(multiplier=2), schemas.PricingTierBase(multiplier=1.5)]
+        with pytest.raises(crud_pricing.InvalidPricingTableError):
+            crud_pricing.replace_pricing_tiers(db_session, unbounded_middle, tenant_id=tenant.id)
+        with pytest.raises(crud_pricing.InvalidPricingTableError):
+            crud_pricing.replace_pricing_tiers(db_session, [], tenant_id=tenant.id)
+
+    def test_preview_and_product_creation_use_tenant_table(self, db_session, tenant):
+        crud_pricing.replace_pricing_tiers(db_session, _tiers(), tenant_id=tenant.id)
+
+        sheet = normalize_import_sheet(pd.DataFrame({"CODIGO": ["1"], "NOMBRE": ["A"], "COSTO": ["10.1"]}, dtype=str))
+        preview = build_import_preview(db_session, sheet, tenant_id=tenant.id)
+        assert preview.items[0].sale_price_suggested == 20.5
+
+        product = schemas.ProductCreate(name="B", barcode="2", purchase_price=200)
+        assert crud_products.create_product(db_session, product, tenant_id=tenant.id).sale_price == 300
+
+        result = bulk_upsert_products(
+            db_session, [{"name": "C", "barcode": "3", "purchase_price": 7}, {"name": "D", "barcode": "4"}], tenant.id
+        )
+        assert (result["created"], [e["index"] for e in result["errors"]]) == (1, [1])
+        assert crud_products.get_product_by_barcode(db_session, "3", tenant_id=tenant.id).sale_price == 14
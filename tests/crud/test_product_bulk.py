@@ -0,0 +1,77 @@
+"""
+Tests for the bulk product upsert engine
+"""
+import pytest
+
+from backend.core import models
+from backend.core.crud import crud_product_bulk, crud_products
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Mayorista")
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+@pytest.fixture
+def tag(db_session, tenant):
+    tag = models.ProductTag(tenant_id=tenant.id, name="Antibióticos")
+    db_session.add(tag)
+    db_session.commit()
+    return tag
+
+
+class TestBulkUpsertProducts:
+    def test_creates_products_with_inventory_and_tags_across_chunks(self, db_session, tenant, tag):
+        rows = [
+            {
+                "name": f"Amoxicilina {i}",
+                "barcode": f"75010{i:08d}",
+                "sale_price": 50.0 + i,
+                "inventory": {"quantity": i},
+                "tags": [tag.id] if i % 2 else [],
+            }
+            for i in range(25)
+        ]
+
+        result = crud_product_bulk.bulk_upsert_products(db_session, rows, tenant_id=tenant.id, chunk_size=10)
+
+        assert result == {"created": 25, "updated": 0, "errors": [], "total_processed": 25}
+        product = crud_products.get_product_by_barcode(db_session, "7501000000003", tenant_id=tenant.id)
+        assert product.inventory.quantity == 3
+        assert [t.name for t in product.tags] == ["Antibióticos"]
+        # search_text se calcula aunque el insert no pase por los eventos del ORM
+        assert product.id in [p.id for p in crud_products.search_products(db_session, "amoxicilina 3", tenant.id)]
+
+    def test_updates_existing_products_by_barcode_and_reports_row_errors(self, db_session, tenant, tag):
+        existing = models.Product(tenant_id=tenant.id, name="Ibuprofeno", barcode="7502000000001", sale_price=30.0)
+        existing.tags = [tag]
+        db_session.add(existing)
+        db_session.flush()
+        db_session.add(models.Inventory(product_id=existing.id, tenant_id=tenant.id, quantity=5))
+        db_session.commit()
+
+        rows = [
+            {
+                "name": "Ibuprofeno 400mg",
+                "barcode": " 7502000000001 ",
+                "sale_price": 35.0,
+                "inventory": {"quantity": 3},
+            },
+            {"name": "Sin precio", "barcode": "7502000000002"},
+            {"name": "Repetido", "barcode": "7502000000001", "sale_price": 1.0},
+            {"name": "Etiqueta ajena", "barcode": "7502000000003", "sale_price": 1.0, "tags": [9999]},
+            {"name": "Naproxeno", "barcode": "7502000000004", "sale_price": 40.0},
+        ]
+
+        result = crud_product_bulk.bulk_upsert_products(db_session, rows, tenant_id=tenant.id, inventory_mode="add")
+
+        assert (result["created"], result["updated"], result["total_processed"]) == (1, 1, 5)
+        assert [error["index"] for error in result["errors"]] == [1, 2, 3]
+        db_session.refresh(existing)
+        assert (existing.name, existing.sale_price, existing.inventory.quantity) == ("Ibuprofeno 400mg", 35.0, 8)
+        # "tags" no venía en la fila: las etiquetas se conservan
+        assert [t.id for t in existing.tags] == [tag.id]
+        assert crud_products.search_products_by_barcode(db_session, "7502000000004", tenant.id)[0].name == "Naproxeno"
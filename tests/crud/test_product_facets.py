@@ -0,0 +1,66 @@
+"""
+Tests for tag-filtered product listings and cached facet counts
+"""
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_product_tags, crud_products
+
+
+@pytest.fixture
+def catalog(db_session):
+    tenant = models.Tenant(name="Farmacia Facetas")
+    db_session.add(tenant)
+    db_session.commit()
+    tags = [
+        crud_product_tags.create_product_tag(db_session, schemas.ProductTagCreate(name=name), tenant_id=tenant.id)
+        for name in ("Antibiótico", "Genérico", "Refrigerado")
+    ]
+    antibiotic, generic, _ = tags
+    for name, lab, tag_ids, quantity in [
+        ("Amoxicilina", "Lab A", [antibiotic.id, generic.id], 5),
+        ("Ciprofloxacino", "Lab B", [antibiotic.id], 0),
+        ("Paracetamol", "Lab A", [generic.id], 10),
+    ]:
+        product = schemas.ProductCreate(
+            name=name, laboratory=lab, sale_price=10, tags=tag_ids, inventory={"quantity": quantity}
+        )
+        crud_products.create_product(db_session, product, tenant_id=tenant.id)
+    return tenant, tags
+
+
+class TestTagFilters:
+    def test_any_and_all_tag_filters(self, db_session, catalog):
+        tenant, (antibiotic, generic, _) = catalog
+
+        def names(**filters):
+            page = crud_products.get_products_paginated(db_session, tenant_id=tenant.id, **filters)
+            return sorted(p.name for p in page.items), page.total
+
+        assert names(tag_ids=[antibiotic.id, generic.id]) == (["Amoxicilina", "Ciprofloxacino", "Paracetamol"], 3)
+        assert names(tag_ids=[antibiotic.id, generic.id], tag_match="all") == (["Amoxicilina"], 1)
+        assert names(tag_ids=[antibiotic.id], stock_filter="in-stock") == (["Amoxicilina"], 1)
+
+
+class TestFacets:
+    def test_facet_counts_are_cached_and_invalidated(self, db_session, catalog):
+        tenant, (_antibiotic, _generic, cold) = catalog
+
+        page = crud_products.get_products_paginated(db_session, tenant_id=tenant.id, include_facets=True)
+        facets = page.facets
+        assert [(t.name, t.count) for t in facets.tags] == [("Antibiótico", 2), ("Genérico", 2), ("Refrigerado", 0)]
+        assert [(lab.value, lab.count) for lab in facets.laboratories] == [("Lab A", 2), ("Lab B", 1)]
+        assert (facets.in_stock, facets.out_of_stock) == (2, 1)
+
+        # Servido desde caché: una venta no recalcula los conteos en cada página
+        db_session.query(models.Inventory).update({"quantity": 0})
+        db_session.commit()
+        assert crud_products.get_product_facets(db_session, tenant.id)["in_stock"] == 2
+
+        product = db_session.query(models.Product).filter_by(name="Paracetamol").one()
+        crud_products.update_product(
+            db_session, product.id, schemas.ProductUpdate(name="Paracetamol", sale_price=10, tags=[cold.id]), tenant.id
+        )
+        facets = crud_products.get_product_facets(db_session, tenant.id)
+        assert [t["count"] for t in facets["tags"]] == [2, 1, 1]
+        assert (facets["in_stock"], facets["out_of_stock"]) == (0, 3)
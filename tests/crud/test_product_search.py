@@ -0,0 +1,104 @@
+"""
+Tests for the product search engine (normalized search_text + FTS5/trigram backends)
+"""
+import pytest
+
+from backend.core import models
+from backend.core.crud import crud_products
+from backend.core.product_search import LikeSearchBackend, SqliteFtsSearchBackend, normalize_search_text
+
+
+@pytest.fixture
+def catalog(db_session):
+    tenant = models.Tenant(name="Farmacia Uno")
+    other_tenant = models.Tenant(name="Farmacia Dos")
+    db_session.add_all([tenant, other_tenant])
+    db_session.flush()
+
+    db_session.add_all(
+        [
+            models.Product(
+                tenant_id=tenant.id,
+                name="Acetaminofén 500mg",
+                barcode="7501000000017",
+                laboratory="Genéricos MX",
+                active_substance="Paracetamol",
+                sale_price=20.0,
+            ),
+            models.Product(
+                tenant_id=tenant.id,
+                name="Ibuprofeno 400mg",
+                barcode="7501000000024",
+                laboratory="Bayer",
+                active_substance="Ibuprofeno",
+                sale_price=35.0,
+            ),
+            models.Product(
+                tenant_id=other_tenant.id,
+                name="Acetaminofen Infantil",
+                barcode="7501000000031",
+                laboratory="Otro Lab",
+                sale_price=40.0,
+            ),
+        ]
+    )
+    db_session.commit()
+    return tenant
+
+
+class TestProductSearch:
+    """Search must be accent/case-insensitive and scoped by tenant"""
+
+    def test_normalize_search_text_strips_accents_and_case(self):
+        assert normalize_search_text("  ACETAMINOFÉN   500mg ") == "acetaminofen 500mg"
+
+    @pytest.mark.parametrize("term", ["acetaminofen", "ACETAMINOFÉN", "aminof", "genericos"])
+    def test_search_ignores_accents_and_case(self, db_session, catalog, term):
+        results = crud_products.search_products(db_session, query=term, tenant_id=catalog.id)
+
+        assert [product.name for product in results] == ["Acetaminofén 500mg"]
+
+    def test_search_matches_barcode_fragment_and_every_token(self, db_session, catalog):
+        by_barcode = crud_products.search_products(db_session, query="000024", tenant_id=catalog.id)
+        by_tokens = crud_products.search_products(db_session, query="ibuprofeno bayer", tenant_id=catalog.id)
+        no_match = crud_products.search_products(db_session, query="ibuprofeno genericos", tenant_id=catalog.id)
+
+        assert [product.name for product in by_barcode] == ["Ibuprofeno 400mg"]
+        assert [product.name for product in by_tokens] == ["Ibuprofeno 400mg"]
+        assert no_match == []
+
+    @pytest.mark.parametrize(
+        ("backend", "expected"),
+        [
+            # FTS5 ordena por relevancia (coinciden el nombre y la sustancia activa); LIKE por nombre
+            (SqliteFtsSearchBackend(), ["Paracetamol Infantil", "Acetaminofén 500mg"]),
+            (LikeSearchBackend(), ["Acetaminofén 500mg", "Paracetamol Infantil"]),
+        ],
+    )
+    def test_backends_return_same_matches(self, db_session, catalog, backend, expected):
+        db_session.add(
+            models.Product(
+                tenant_id=catalog.id,
+                name="Paracetamol Infantil",
+                barcode="7501000000048",
+                laboratory="Pisa",
+                active_substance="Paracetamol",
+                sale_price=50.0,
+            )
+        )
+        db_session.commit()
+        query = db_session.query(models.Product).filter(models.Product.tenant_id == catalog.id)
+
+        # Término de al menos FTS_MIN_TOKEN_LENGTH caracteres: FTS5 usa MATCH, no el LIKE de respaldo
+        searched = backend.apply(query, "paracetamol")
+
+        assert ("MATCH" in str(searched.statement)) == isinstance(backend, SqliteFtsSearchBackend)
+        assert [product.name for product in searched.all()] == expected
+
+    def test_search_text_follows_updates(self, db_session, catalog):
+        product = crud_products.search_products(db_session, query="ibuprofeno", tenant_id=catalog.id)[0]
+        product.name = "Naproxeno 250mg"
+        db_session.commit()
+
+        assert crud_products.search_products(db_session, query="ibuprofeno 400", tenant_id=catalog.id) == []
+        assert len(crud_products.search_products(db_session, query="naproxeno", tenant_id=catalog.id)) == 1
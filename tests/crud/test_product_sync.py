@@ -0,0 +1,79 @@
+"""
+Tests for the incremental catalog sync feed
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.core import models, schemas
+from backend.core.config import settings
+from backend.core.crud import crud_product_sync, crud_products
+from backend.core.pagination import encode_cursor
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Terminales")
+    db_session.add(tenant)
+    db_session.commit()
+    return tenant
+
+
+def _create(db, tenant, name, barcode, quantity=5):
+    product = schemas.ProductCreate(name=name, barcode=barcode, sale_price=10, inventory={"quantity": quantity})
+    return crud_products.create_product(db, product, tenant_id=tenant.id)
+
+
+class TestProductChanges:
+    def test_incremental_sync_returns_only_changes_and_deletes(self, db_session, tenant, monkeypatch):
+        monkeypatch.setattr(settings, "PRODUCT_SYNC_OVERLAP_SECONDS", 0)  # sólo el keyset, sin repetidos
+        kept = _create(db_session, tenant, "Ibuprofeno", "1001")
+        removed = _create(db_session, tenant, "Aspirina", "1002")
+        full = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id)
+        assert [p.id for p in full["products"]] == [kept.id, removed.id]
+        assert (full["deleted"], full["has_more"], full["reset"]) == ([], False, False)
+
+        empty = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id, since=full["next_since"])
+        assert (empty["products"], empty["inventory"], empty["deleted"]) == ([], [], [])
+
+        kept.inventory.quantity = 2
+        db_session.commit()
+        crud_products.delete_product(db_session, removed.id, tenant_id=tenant.id)
+        added = _create(db_session, tenant, "Naproxeno", "1003")
+
+        changes = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id, since=empty["next_since"])
+        assert [p.id for p in changes["products"]] == [added.id]
+        assert [(i.product_id, i.quantity) for i in changes["inventory"]] == [(kept.id, 2), (added.id, 5)]
+        assert changes["deleted"] == [removed.id]
+
+    def test_pages_until_has_more_is_false(self, db_session, tenant):
+        for i in range(5):
+            _create(db_session, tenant, f"Producto {i}", f"20{i}")
+
+        seen, since, has_more = [], None, True
+        while has_more:
+            page = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id, since=since, limit=2)
+            seen.extend(p.barcode for p in page["products"])
+            since, has_more = page["next_since"], page["has_more"]
+        assert seen == ["200", "201", "202", "203", "204"]
+
+    def test_token_older_than_retention_forces_full_sync(self, db_session, tenant):
+        _create(db_session, tenant, "Ibuprofeno", "1001")
+        stale = encode_cursor([None] * 6 + [datetime.utcnow() - timedelta(days=365)])
+
+        changes = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id, since=stale)
+        assert changes["reset"] is True
+        assert len(changes["products"]) == 1
+
+    def test_late_commit_behind_the_cursor_is_resent(self, db_session, tenant):
+        synced = _create(db_session, tenant, "Ibuprofeno", "1001")
+        first = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id)
+        assert [p.id for p in first["products"]] == [synced.id]
+
+        # Otra transacción selló antes que el cursor pero confirmó después de la sincronización
+        late = _create(db_session, tenant, "Aspirina", "1002")
+        late.updated_at = synced.updated_at - timedelta(seconds=5)
+        db_session.commit()
+
+        changes = crud_product_sync.get_product_changes(db_session, tenant_id=tenant.id, since=first["next_since"])
+        assert [p.id for p in changes["products"]] == [late.id, synced.id]  # la ventana repite ``synced``
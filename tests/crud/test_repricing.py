@@ -0,0 +1,57 @@
+"""
+Tests for bulk repricing of the catalog
+"""
+import pytest
+
+from backend.core import models, schemas
+from backend.core.repricing import reprice_products
+from backend.utils.pricing_formula import calculate_sale_price
+
+
+@pytest.fixture
+def tenant(db_session):
+    tenant = models.Tenant(name="Farmacia Precios")
+    db_session.add(tenant)
+    db_session.flush()
+    db_session.add_all(
+        [
+            models.Product(tenant_id=tenant.id, name="A", barcode="1", purchase_price=10, sale_price=17, laboratory="X"),
+            models.Product(tenant_id=tenant.id, name="B", barcode="2", purchase_price=40, sale_price=50, laboratory="X"),
+            models.Product(tenant_id=tenant.id, name="C", barcode="3", purchase_price=333.33, sale_price=None),
+            models.Product(tenant_id=tenant.id, name="D", barcode="4", purchase_price=None, sale_price=5),
+        ]
+    )
+    db_session.commit()
+    return tenant
+
+
+class TestReprice:
+    def test_dry_run_reports_diff_without_writing(self, db_session, tenant):
+        result = reprice_products(db_session, schemas.ProductRepriceRequest(), tenant_id=tenant.id)
+
+        assert (result.total_products, result.changed, result.unchanged, result.skipped) == (4, 2, 1, 1)
+        b, c = result.items
+        assert (b.barcode, b.sale_price_current, b.sale_price_new, b.direction) == ("2", 50, 60, "up")
+        assert (c.barcode, c.sale_price_current, c.sale_price_new, c.direction) == ("3", None, 433.33, "new")
+        product = db_session.query(models.Product).filter_by(barcode="2").one()
+        assert product.sale_price == 50
+
+    def test_apply_matches_scalar_formula(self, db_session, tenant):
+        request = schemas.ProductRepriceRequest(dry_run=False)
+
+        result = reprice_products(db_session, request, tenant_id=tenant.id)
+
+        assert result.changed == 2
+        db_session.expire_all()
+        for product in db_session.query(models.Product).filter(models.Product.purchase_price.isnot(None)):
+            assert product.sale_price == calculate_sale_price(product.purchase_price)
+        # Sin precio de compra no se toca
+        assert db_session.query(models.Product).filter_by(barcode="4").one().sale_price == 5
+
+    def test_scope_by_laboratory(self, db_session, tenant):
+        request = schemas.ProductRepriceRequest(laboratory="X", dry_run=False)
+
+        result = reprice_products(db_session, request, tenant_id=tenant.id)
+
+        assert (result.total_products, result.changed) == (2, 1)
+        assert db_session.query(models.Product).filter_by(barcode="3").one().sale_price is None
@@ -0,0 +1,78 @@
+"""
+Tests for offline sales batch ingestion
+"""
+import pytest
+from sqlalchemy import update
+
+from backend.core import models, schemas
+from backend.core.crud import crud_sale_batch
+
+
+@pytest.fixture
+def route(make_store):
+    return make_store("Ruta Norte", stock=5, client_name="Farmacia Sol", iva_rate=0.16)
+
+
+def _sale(user, client, *lines):
+    items = [schemas.SaleItemCreate(product_id=product.id, quantity=quantity, unit_price=10) for product, quantity in lines]
+    return schemas.SaleCreate(client_id=client.id, user_id=user.id, document_type="remission", items=items)
+
+
+def _stock(db_session, products):
+    db_session.expire_all()
+    return [p.inventory.quantity for p in products]
+
+
+class TestCreateSalesBatch:
+    def test_applies_sales_in_order_and_reports_each(self, db_session, route):
+        tenant, user, client, (first, second, third) = route
+        other_client = schemas.SaleCreate(**{**_sale(user, client, (first, 1)).model_dump(), "client_id": 999})
+        sales = [
+            _sale(user, client, (first, 3), (second, 1)),
+            _sale(user, client, (first, 3)),  # sólo quedan 2
+            other_client,
+            _sale(user, client, (first, 2), (third, 5)),
+        ]
+
+        result = crud_sale_batch.create_sales_batch(db_session, sales, tenant_id=tenant.id)
+
+        assert (result["created"], result["failed"]) == (2, 2)
+        outcomes = result["results"]
+        assert [outcome["index"] for outcome in outcomes] == [0, 1, 2, 3]
+        assert outcomes[0]["total"] == 40 and outcomes[3]["total"] == 70
+        assert outcomes[1]["error"] == "Stock insuficiente"
+        assert outcomes[1]["issues"][0]["shortage"] == 1
+        assert outcomes[2]["error"] == "Client not found"
+        assert _stock(db_session, [first, second, third]) == [0, 4, 0]
+        assert db_session.query(models.SaleItem).count() == 4
+
+    def test_concurrent_sale_isolated_per_sale(self, db_session, route, monkeypatch):
+        """Otra caja vende después de la pre-carga: sólo la venta afectada se rechaza"""
+        tenant, user, client, (first, second, _) = route
+        load_sale_context = crud_sale_batch.load_sale_context
+
+        def load_then_sell(db, product_ids, tenant_id=None):
+            context = load_sale_context(db, product_ids, tenant_id)
+            inventory = models.Inventory.__table__
+            db.execute(update(inventory).where(inventory.c.product_id == first.id).values(quantity=1))
+            return context
+
+        monkeypatch.setattr(crud_sale_batch, "load_sale_context", load_then_sell)
+        sales = [_sale(user, client, (second, 2)), _sale(user, client, (first, 4)), _sale(user, client, (second, 1))]
+
+        result = crud_sale_batch.create_sales_batch(db_session, sales, tenant_id=tenant.id)
+
+        assert [outcome["sale_id"] is not None for outcome in result["results"]] == [True, False, True]
+        assert result["results"][1]["issues"] == [
+            {"product_id": first.id, "requested": 4, "available": 1, "shortage": 3}
+        ]
+        assert _stock(db_session, [first, second]) == [1, 2]
+
+    def test_auto_adjust_clamps_to_zero(self, db_session, route):
+        tenant, user, client, (first, _, _) = route
+        sales = [_sale(user, client, (first, 4)), _sale(user, client, (first, 4))]
+
+        result = crud_sale_batch.create_sales_batch(db_session, sales, tenant_id=tenant.id, auto_adjust_stock=True)
+
+        assert result["created"] == 2
+        assert _stock(db_session, [first]) == [0]
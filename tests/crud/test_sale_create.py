@@ -0,0 +1,50 @@
+"""
+Tests for the batched sale creation path
+"""
+import pytest
+
+from backend.core import schemas
+from backend.core.crud import crud_sale
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store("Farmacia Mayoreo", product_count=40, stock=100, iva_rate=0.16)
+
+
+def _sale(user, client, products, quantity=2):
+    items = [schemas.SaleItemCreate(product_id=p.id, quantity=quantity, unit_price=10) for p in products]
+    return schemas.SaleCreate(client_id=client.id, user_id=user.id, items=items)
+
+
+class TestCreateSale:
+    def test_round_trips_do_not_grow_with_line_count(self, db_session, store, capture_statements):
+        tenant, user, client, products = store
+
+        def create(lines):
+            sale = _sale(user, client, lines)
+            return lambda: crud_sale.create_sale(db_session, sale, tenant_id=tenant.id)
+
+        small = capture_statements(create(products[:2]))
+        large = capture_statements(create(products[2:]))
+
+        assert len(small) == len(large)
+
+    def test_totals_stock_and_items(self, db_session, store):
+        tenant, user, client, products = store
+
+        sale = crud_sale.create_sale(db_session, _sale(user, client, products[:3], quantity=4), tenant_id=tenant.id)
+
+        assert len(sale.items) == 3
+        assert (sale.subtotal, round(sale.iva_amount, 2), round(sale.total, 2)) == (120, 19.2, 139.2)
+        assert all(item.product.inventory.quantity == 96 for item in sale.items)
+
+    def test_stock_check_sums_repeated_lines(self, db_session, store):
+        tenant, _user, _client, products = store
+        items = [schemas.SaleItemCreate(product_id=products[0].id, quantity=60, unit_price=10)] * 2
+
+        result = crud_sale.check_stock_availability(db_session, items, tenant_id=tenant.id)
+
+        assert result["issues"] == [
+            {"product_id": products[0].id, "product_name": "P0", "requested": 120, "available": 100, "shortage": 20}
+        ]
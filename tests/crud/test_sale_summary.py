@@ -0,0 +1,93 @@
+"""
+Tests for the sales list summary projection
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_sale
+
+
+@pytest.fixture
+def history(db_session, make_store):
+    tenant, user, client, products = make_store("Farmacia Centro", stock=None, client_name="Hospital Norte")
+    start = datetime(2026, 1, 1)
+    statuses = [("paid", "entrega urgente"), ("pending", None), ("paid", "ruta norte")]
+    for day, (lines, (payment_status, notes)) in enumerate(zip([1, 3, 2], statuses, strict=True)):
+        sale = models.Sale(
+            tenant_id=tenant.id,
+            client_id=client.id,
+            user_id=user.id,
+            sale_date=start + timedelta(days=day, hours=18),
+            total=lines,
+            payment_status=payment_status,
+            notes=notes,
+        )
+        sale.items = [
+            models.SaleItem(tenant_id=tenant.id, product_id=p.id, quantity=1, unit_price=10, subtotal=10)
+            for p in products[:lines]
+        ]
+        db_session.add(sale)
+    db_session.commit()
+    return tenant, products
+
+
+class TestSaleSummaries:
+    def test_newest_first_with_client_name_and_item_count(self, db_session, history):
+        tenant, _ = history
+
+        rows = crud_sale.get_sale_summaries(db_session, tenant_id=tenant.id)
+        summaries = [schemas.SaleSummary.model_validate(row) for row in rows]
+
+        assert [(s.item_count, s.total) for s in summaries] == [(2, 2), (3, 3), (1, 1)]
+        assert {s.client_name for s in summaries} == {"Hospital Norte"}
+
+    def test_cursor_pages_cover_all_sales(self, db_session, history):
+        tenant, _ = history
+
+        first = crud_sale.get_sale_summaries_by_cursor(db_session, tenant_id=tenant.id, page_size=2)
+        second = crud_sale.get_sale_summaries_by_cursor(
+            db_session, tenant_id=tenant.id, cursor=first["next_cursor"], page_size=2
+        )
+
+        assert [row.item_count for row in first["items"] + second["items"]] == [2, 3, 1]
+        assert first["total_estimate"] == 3
+        assert not second["has_more"]
+
+    def test_sales_by_product_are_not_repeated(self, db_session, history):
+        tenant, products = history
+
+        sales = crud_sale.get_sales_by_product(db_session, products[0].id, tenant_id=tenant.id)
+
+        assert len(sales) == 3
+        assert [len(sale.items) for sale in sales] == [2, 3, 1]
+
+
+class TestSaleFilters:
+    def _totals(self, db_session, tenant, **filters):
+        rows = crud_sale.get_sale_summaries(db_session, tenant_id=tenant.id, filters=schemas.SaleFilters(**filters))
+        return [row.total for row in rows]
+
+    def test_date_range_includes_whole_end_day(self, db_session, history):
+        tenant, _ = history
+
+        assert self._totals(db_session, tenant, date_from=date(2026, 1, 2), date_to=date(2026, 1, 3)) == [2, 3]
+        assert self._totals(db_session, tenant, date_to=date(2026, 1, 1)) == [1]
+
+    def test_status_client_and_notes(self, db_session, history):
+        tenant, _ = history
+        client_id = db_session.query(models.Client.id).scalar()
+
+        assert self._totals(db_session, tenant, payment_status="paid") == [2, 1]
+        assert self._totals(db_session, tenant, payment_status="paid", notes="URGENTE") == [1]
+        assert self._totals(db_session, tenant, client_id=client_id, document_type="remission") == []
+
+    def test_filtered_cursor_counts_only_matches(self, db_session, history):
+        tenant, _ = history
+        filters = schemas.SaleFilters(payment_status="pending")
+
+        page = crud_sale.get_sales_by_cursor(db_session, tenant_id=tenant.id, filters=filters)
+
+        assert page["total_estimate"] == 1
+        assert [sale.total for sale in page["items"]] == [3]
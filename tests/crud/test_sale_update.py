@@ -0,0 +1,83 @@
+"""
+Tests for diff-based sale updates
+"""
+import pytest
+
+from backend.core import schemas
+from backend.core.crud import crud_sale
+from backend.core.crud.crud_stock import InsufficientStockError
+
+
+@pytest.fixture
+def order(db_session, make_store):
+    tenant, user, client, products = make_store("Farmacia Pedidos", product_count=52, iva_rate=0.16)
+    items = [schemas.SaleItemCreate(product_id=p.id, quantity=2, unit_price=10) for p in products[:50]]
+    sale = crud_sale.create_sale(
+        db_session, schemas.SaleCreate(client_id=client.id, user_id=user.id, items=items), tenant_id=tenant.id
+    )
+    return tenant, sale, products, items
+
+
+def _lines(items):
+    return [item.model_copy() for item in items]
+
+
+def _stock(db_session, products):
+    db_session.expire_all()
+    return [p.inventory.quantity for p in products]
+
+
+class TestUpdateSale:
+    def test_editing_one_line_only_touches_that_line(self, db_session, order, capture_statements):
+        tenant, sale, products, items = order
+        lines = _lines(items)
+        lines[10].quantity = 5
+        item_ids = sorted(item.id for item in sale.items)
+
+        statements = capture_statements(
+            lambda: crud_sale.update_sale(db_session, sale.id, schemas.SaleUpdate(items=lines), tenant_id=tenant.id)
+        )
+
+        writes = [s for s in statements if s.split()[0] in ("INSERT", "UPDATE", "DELETE")]
+        assert len(statements) < 20
+        assert sum(s.startswith("UPDATE sale_items") for s in writes) == 1
+        assert not any(s.startswith(("INSERT INTO sale_items", "DELETE FROM sale_items")) for s in writes)
+        updated = crud_sale.get_sale(db_session, sale.id, tenant_id=tenant.id)
+        assert sorted(item.id for item in updated.items) == item_ids
+        assert updated.subtotal == 1030
+        assert _stock(db_session, products[9:12]) == [8, 5, 8]
+
+    def test_added_removed_and_changed_lines_apply_net_stock(self, db_session, order):
+        tenant, sale, products, items = order
+        lines = _lines(items[1:])  # se elimina P0
+        lines[0].quantity = 1  # P1: 2 -> 1
+        lines.append(schemas.SaleItemCreate(product_id=products[50].id, quantity=4, unit_price=12))
+        lines.append(schemas.SaleItemCreate(product_id=products[2].id, quantity=3, unit_price=10))  # P2: 2 -> 5
+
+        updated = crud_sale.update_sale(db_session, sale.id, schemas.SaleUpdate(items=lines), tenant_id=tenant.id)
+
+        assert len(updated.items) == 51
+        assert _stock(db_session, products[:3] + products[50:51]) == [10, 9, 5, 6]
+        assert updated.subtotal == 2 * 10 * 49 - 10 + 48 + 30
+        assert updated.total == pytest.approx(updated.subtotal * 1.16)
+
+    def test_shortage_on_increase_raises(self, db_session, order):
+        tenant, sale, products, items = order
+        lines = _lines(items)
+        lines[0].quantity = 20
+
+        with pytest.raises(InsufficientStockError) as error:
+            crud_sale.update_sale(db_session, sale.id, schemas.SaleUpdate(items=lines), tenant_id=tenant.id)
+        db_session.rollback()
+
+        assert error.value.issues[0]["shortage"] == 10
+        assert _stock(db_session, products[:1]) == [8]
+
+    def test_document_type_change_recomputes_totals(self, db_session, order):
+        tenant, sale, _, _ = order
+
+        updated = crud_sale.update_sale(
+            db_session, sale.id, schemas.SaleUpdate(document_type="remission"), tenant_id=tenant.id
+        )
+
+        assert updated.total == updated.subtotal == 1000
@@ -0,0 +1,115 @@
+"""
+Tests for the atomic stock decrement
+"""
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.core import models, schemas
+from backend.core.crud import crud_sale
+from backend.core.crud.crud_stock import InsufficientStockError, decrement_stock, increment_stock
+from backend.core.database import Base
+
+
+@pytest.fixture
+def store(db_session):
+    tenant = models.Tenant(name="Farmacia Centro")
+    db_session.add(tenant)
+    db_session.flush()
+    products = [models.Product(tenant_id=tenant.id, name=f"P{i}", barcode=f"80{i}", sale_price=10) for i in range(2)]
+    db_session.add_all(products)
+    db_session.flush()
+    db_session.add_all(models.Inventory(product_id=p.id, tenant_id=tenant.id, quantity=5) for p in products)
+    db_session.commit()
+    return tenant, products
+
+
+def _quantities(db_session, products):
+    db_session.expire_all()
+    return [p.inventory.quantity for p in products]
+
+
+class TestDecrementStock:
+    def test_decrements_all_products(self, db_session, store):
+        tenant, (first, second) = store
+
+        decrement_stock(db_session, {first.id: 2, second.id: 5}, tenant.id)
+        db_session.commit()
+
+        assert _quantities(db_session, [first, second]) == [3, 0]
+
+    def test_shortage_raises_with_issues(self, db_session, store):
+        tenant, (first, second) = store
+
+        with pytest.raises(InsufficientStockError) as error:
+            decrement_stock(db_session, {first.id: 2, second.id: 6}, tenant.id)
+        db_session.rollback()
+
+        assert error.value.issues == [{"product_id": second.id, "requested": 6, "available": 5, "shortage": 1}]
+        assert _quantities(db_session, [first, second]) == [5, 5]
+
+    def test_clamp_stops_at_zero(self, db_session, store):
+        tenant, (first, second) = store
+
+        decrement_stock(db_session, {first.id: 9, second.id: 1}, tenant.id, clamp=True)
+        increment_stock(db_session, {second.id: 3}, tenant.id)
+        db_session.commit()
+
+        assert _quantities(db_session, [first, second]) == [0, 7]
+
+
+class TestConcurrentCheckout:
+    def test_no_oversell_with_50_concurrent_sales(self, tmp_path):
+        """50 cajas venden a la vez la misma pieza con 20 en existencia"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'stock.db'}", connect_args={"timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+        with Session() as db:
+            tenant = models.Tenant(name="Farmacia Ruta")
+            role = models.Role(name="vendedor")
+            db.add_all([tenant, role])
+            db.flush()
+            user = models.User(name="van", email="van@example.com", password="x", role_id=role.id, tenant_id=tenant.id)
+            client = models.Client(name="Mostrador", contact="x", tenant_id=tenant.id)
+            product = models.Product(tenant_id=tenant.id, name="Paracetamol", barcode="750", sale_price=10)
+            db.add_all([user, client, product])
+            db.flush()
+            db.add(models.Inventory(product_id=product.id, tenant_id=tenant.id, quantity=20))
+            db.commit()
+            sale = schemas.SaleCreate(
+                client_id=client.id,
+                user_id=user.id,
+                items=[schemas.SaleItemCreate(product_id=product.id, quantity=1, unit_price=10)],
+            )
+            tenant_id, product_id = tenant.id, product.id
+
+        outcomes = []
+        start = threading.Barrier(50)
+
+        def checkout():
+            with Session() as db:
+                start.wait()
+                try:
+                    crud_sale.create_sale(db, sale, tenant_id=tenant_id)
+                    outcomes.append("sold")
+                except InsufficientStockError:
+                    db.rollback()
+                    outcomes.append("conflict")
+
+        threads = [threading.Thread(target=checkout) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with Session() as db:
+            quantity = db.get(models.Inventory, product_id).quantity
+            sold = db.query(models.SaleItem).count()
+        engine.dispose()
+
+        assert outcomes.count("sold") == 20
+        assert outcomes.count("conflict") == 30
+        assert (quantity, sold) == (0, 20)
@@ -0,0 +1,100 @@
+"""
+Tests for the stock ledger and point-in-time stock queries
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from backend.core import models, schemas
+from backend.core.crud import crud_product_bulk, crud_sale, crud_stock_ledger
+
+
+@pytest.fixture
+def shop(make_store):
+    return make_store("Farmacia Libro", product_count=2, purchase_price=4)
+
+
+def _ledger(db_session, product):
+    rows = db_session.query(models.StockLedgerEntry).filter(models.StockLedgerEntry.product_id == product.id)
+    return [(row.source, row.quantity_change) for row in rows.order_by(models.StockLedgerEntry.id)]
+
+
+def _history(db_session, tenant, product, *entries):
+    for day, change in entries:
+        db_session.add(
+            models.StockLedgerEntry(
+                tenant_id=tenant.id,
+                product_id=product.id,
+                quantity_change=change,
+                source="sale",
+                created_at=datetime(2026, 1, day),
+            )
+        )
+    db_session.commit()
+
+
+class TestStockLedger:
+    def test_sale_lifecycle_is_recorded(self, db_session, shop):
+        tenant, user, client, (first, second) = shop
+        items = [schemas.SaleItemCreate(product_id=first.id, quantity=3, unit_price=10)]
+        sale = crud_sale.create_sale(
+            db_session, schemas.SaleCreate(client_id=client.id, user_id=user.id, items=items), tenant_id=tenant.id
+        )
+        sale_id = sale.id
+
+        items = [schemas.SaleItemCreate(product_id=second.id, quantity=4, unit_price=10)]
+        crud_sale.update_sale(db_session, sale_id, schemas.SaleUpdate(items=items), tenant_id=tenant.id)
+        crud_sale.delete_sale(db_session, sale_id, tenant_id=tenant.id)
+
+        assert _ledger(db_session, first) == [("sale", -3), ("sale_update", 3)]
+        assert _ledger(db_session, second) == [("sale_update", -4), ("sale_delete", 4)]
+        references = db_session.query(models.StockLedgerEntry.reference_id).distinct().all()
+        assert references == [(str(sale_id),)]
+
+    def test_import_records_net_change(self, db_session, shop):
+        tenant, _, _, (first, _) = shop
+        rows = [
+            {"barcode": first.barcode, "name": "P0", "sale_price": 10, "inventory": {"quantity": 25}},
+            {"barcode": "NEW-1", "name": "Nuevo", "sale_price": 10, "inventory": {"quantity": 6}},
+        ]
+
+        crud_product_bulk.bulk_upsert_products(db_session, rows, tenant_id=tenant.id)
+
+        changes = db_session.query(func.sum(models.StockLedgerEntry.quantity_change)).scalar()
+        assert _ledger(db_session, first) == [("import", 15)]
+        assert changes == 21
+
+
+class TestStockAsOf:
+    def test_without_snapshot_walks_back_from_current_stock(self, db_session, shop):
+        tenant, _, _, (first, second) = shop
+        _history(db_session, tenant, first, (5, -3), (10, -2))  # existencia actual: 10
+
+        stock = crud_stock_ledger.get_stock_as_of(db_session, datetime(2026, 1, 7), tenant_id=tenant.id)
+
+        assert stock == {first.id: 12, second.id: 10}
+
+    def test_snapshot_plus_ledger_tail(self, db_session, shop):
+        tenant, _, _, (first, second) = shop
+        _history(db_session, tenant, first, (5, -3), (10, -2), (20, -1))
+        crud_stock_ledger.take_stock_snapshot(db_session, tenant_id=tenant.id, taken_at=datetime(2026, 1, 15))
+        db_session.commit()
+
+        def stock_on(day):
+            return crud_stock_ledger.get_stock_as_of(db_session, datetime(2026, 1, day), tenant_id=tenant.id)
+
+        assert stock_on(25) == {first.id: 9, second.id: 10}
+        assert stock_on(16) == {first.id: 10, second.id: 10}
+        assert stock_on(7) == {first.id: 13, second.id: 10}  # anterior a la foto
+
+    def test_valuation_uses_purchase_price(self, db_session, shop):
+        tenant, _, _, (first, _) = shop
+        _history(db_session, tenant, first, (5, -3))
+
+        valuation = crud_stock_ledger.get_stock_valuation_as_of(
+            db_session, datetime(2026, 1, 1), tenant_id=tenant.id, product_ids=[first.id]
+        )
+
+        assert valuation["items"] == [{"product_id": first.id, "quantity": 13, "value": 52.0}]
+        assert valuation["total_value"] == 52.0
@@ -0,0 +1,97 @@
+"""
+Tests for the inventory vs batch stock reconciliation
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from backend.core import models, schemas
+from backend.core.crud import crud_batches, crud_sale, crud_stock_ledger, crud_stock_reconciliation
+
+
+@pytest.fixture
+def stock(db_session):
+    tenant = models.Tenant(name="Farmacia Conciliada")
+    db_session.add(tenant)
+    db_session.flush()
+    products = [models.Product(tenant_id=tenant.id, name=f"P{i}", barcode=f"97{i}", sale_price=10) for i in range(3)]
+    db_session.add_all(products)
+    db_session.flush()
+    db_session.add_all(models.Inventory(product_id=p.id, tenant_id=tenant.id, quantity=10) for p in products)
+    # El segundo ya está desfasado (7 en lotes) pero nadie lo ha movido; el tercero no tiene lotes
+    for product, quantity in [(products[0], 10), (products[1], 7)]:
+        db_session.add(
+            models.ProductBatch(
+                tenant_id=tenant.id,
+                product_id=product.id,
+                batch_number=f"L{product.id}",
+                expiration_date=date.today() + timedelta(days=90),
+                quantity_received=quantity,
+                quantity_remaining=quantity,
+                received_date=datetime.now(),
+            )
+        )
+    db_session.commit()
+    return tenant, products
+
+
+def _inventory(db_session, product):
+    return db_session.query(models.Inventory.quantity).filter(models.Inventory.product_id == product.id).scalar()
+
+
+class TestReconcileDirtyProducts:
+    def test_checks_only_products_that_moved(self, db_session, stock):
+        tenant, (first, _, unbatched) = stock
+        crud_batches.allocate_batches(db_session, [crud_batches.BatchDemand(first.id, 3)], tenant_id=tenant.id)
+        crud_stock_ledger.mark_products_dirty(db_session, [unbatched.id], tenant.id)
+        db_session.commit()
+
+        result = crud_stock_reconciliation.reconcile_dirty_products(db_session, tenant_id=tenant.id)
+        db_session.commit()
+
+        assert result == {"checked": 1, "discrepancies": 1, "corrected": 0}
+        discrepancies = crud_stock_reconciliation.get_stock_discrepancies(db_session, tenant_id=tenant.id)
+        assert [(d.product_id, d.inventory_quantity, d.batch_quantity, d.difference) for d in discrepancies] == [
+            (first.id, 10, 7, 3)
+        ]
+        assert db_session.query(models.StockDirtyProduct).count() == 0
+        assert _inventory(db_session, first) == 10
+
+    def test_auto_correct_sets_inventory_to_batches(self, db_session, stock):
+        tenant, (first, _, _) = stock
+        crud_batches.allocate_batches(db_session, [crud_batches.BatchDemand(first.id, 4)], tenant_id=tenant.id)
+        db_session.commit()
+
+        result = crud_stock_reconciliation.reconcile_dirty_products(db_session, tenant_id=tenant.id, auto_correct=True)
+        db_session.commit()
+
+        assert result["corrected"] == 1
+        assert _inventory(db_session, first) == 6
+        ledger = db_session.query(models.StockLedgerEntry.source, models.StockLedgerEntry.quantity_change).all()
+        assert ledger == [("reconciliation", -4)]
+        # El ajuste no deja el producto pendiente para la siguiente corrida
+        assert crud_stock_reconciliation.reconcile_dirty_products(db_session, tenant_id=tenant.id)["checked"] == 0
+
+    def test_edited_and_deleted_sale_leaves_nothing_to_correct(self, db_session, stock):
+        tenant, (first, _, _) = stock
+        role = models.Role(name="vendedor")
+        db_session.add(role)
+        db_session.flush()
+        user = models.User(name="caja", email="caja@example.com", password="x", role_id=role.id, tenant_id=tenant.id)
+        client = models.Client(name="Hospital", contact="x", tenant_id=tenant.id)
+        db_session.add_all([user, client])
+        db_session.commit()
+        items = [schemas.SaleItemCreate(product_id=first.id, quantity=3, unit_price=10)]
+        sale = crud_sale.create_sale(
+            db_session, schemas.SaleCreate(client_id=client.id, user_id=user.id, items=items), tenant_id=tenant.id
+        )
+        sale_id = sale.id
+        items = [schemas.SaleItemCreate(product_id=first.id, quantity=1, unit_price=10)]
+        crud_sale.update_sale(db_session, sale_id, schemas.SaleUpdate(items=items), tenant_id=tenant.id)
+        crud_sale.delete_sale(db_session, sale_id, tenant_id=tenant.id)
+
+        result = crud_stock_reconciliation.reconcile_dirty_products(db_session, tenant_id=tenant.id, auto_correct=True)
+        db_session.commit()
+
+        assert result == {"checked": 1, "discrepancies": 0, "corrected": 0}
+        assert _inventory(db_session, first) == 10
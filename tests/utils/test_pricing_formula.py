@@ -0,0 +1,53 @@
+"""
+Parity tests between the scalar and vectorized pricing formula
+"""
+import numpy as np
+
+from backend.utils import pricing_formula
+
+
+class TestVectorizedPricing:
+    def test_sale_prices_match_scalar_formula(self):
+        rng = np.random.default_rng(7)
+        prices = np.concatenate(
+            [
+                rng.uniform(0, 1000, 20000).round(2),
+                rng.uniform(0, 1000, 5000),
+                # Límites de cada rango y valores que caen justo a la mitad al redondear
+                [0, 10, 10.01, 25, 25.01, 50, 50.01, 100, 100.01, 200, 200.01, 500, 500.01, 2.5, 1.015, 0.005],
+            ]
+        )
+
+        vectorized = pricing_formula.calculate_sale_prices(prices)
+        ranges = pricing_formula.get_price_ranges(prices)
+
+        assert vectorized.tolist() == [pricing_formula.calculate_sale_price(p) for p in prices.tolist()]
+        assert ranges.tolist() == [pricing_formula.get_price_range(p) for p in prices.tolist()]
+
+    def test_price_differences_match_scalar_formula(self):
+        old = np.array([0, 10, 10, 20, 0])
+        new = np.array([5, 12, 8, 20, 0])
+
+        vectorized = pricing_formula.calculate_price_differences(old, new)
+
+        for i, (old_price, new_price) in enumerate(zip(old.tolist(), new.tolist(), strict=True)):
+            scalar = pricing_formula.calculate_price_difference(old_price, new_price)
+            assert vectorized["direction"][i] == scalar["direction"]
+            assert vectorized["difference"][i] == scalar["difference"]
+            assert vectorized["percentage_change"][i] == scalar["percentage_change"]
+
+
+class TestPricingTable:
+    def test_default_table_labels_match_generated_labels(self):
+        lowers = [None] + [limit for limit, _, _ in pricing_formula.PRICE_TIERS[:-1]]
+        uppers = [limit for limit, _, _ in pricing_formula.PRICE_TIERS[:-1]] + [None]
+        for lower, upper, (_, multiplier, label) in zip(lowers, uppers, pricing_formula.PRICE_TIERS, strict=True):
+            assert pricing_formula.format_tier_label(lower, upper, multiplier) == label
+
+    def test_rounding_rules(self):
+        table = pricing_formula.PricingTable(
+            ((10, 1.7, "a", 0.5, "up"), (float("inf"), 1.25, "b", 1, "nearest"))
+        )
+        # 1.70 -> 2.00, 3.40 -> 3.50, 17.00 se queda; 13.75 -> 14, 125.25 -> 125
+        assert table.sale_prices(np.array([1, 2, 10, 11, 100.2])).tolist() == [2.0, 3.5, 17.0, 14.0, 125.0]
+        assert table.price_range(11) == "b"